@@ -19,6 +19,13 @@ echo "🗄️  Running database migrations..."
 python manage.py migrate --noinput
 export FONTCONFIG_PATH=/etc/fonts
 export FONTCONFIG_FILE=/etc/fonts/fonts.conf
+# Worker des rapports PDF (file ReportJob en base), hors des workers gunicorn
+echo "🧾 Starting report worker..."
+python manage.py run_report_worker &
+# Boîte d'envoi WhatsApp (OutboxMessage) : les envois ne se font plus dans les requêtes
+echo "📤 Starting outbox worker..."
+python manage.py drain_outbox &
+
 # Démarrer Gunicorn
 echo "🚀 Starting Gunicorn server..."
 exec gunicorn support.wsgi:application \
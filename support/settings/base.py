@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -170,11 +171,11 @@ AUTH_USER_MODEL = "tcikets.User"
 
 ASGI_APPLICATION = "support.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
-}
+# En mémoire (un seul processus : dev, tests) sauf si CHANNEL_REDIS_URLS est défini.
+# La production y ajoute REDIS_URL, cf. support/channel_layers.py
+from support.channel_layers import channel_layers, parse_redis_urls
+
+CHANNEL_LAYERS = channel_layers(parse_redis_urls(os.getenv("CHANNEL_REDIS_URLS")))
 
 
 # ================================
@@ -193,7 +194,16 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
+    # Rapports PDF générés par le worker (run_report_worker). Instancié à l'import des
+    # modèles (ReportJob.file) : disque local ici, Cloudinary en production.
+    "reports": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
 }
+# Processus de rendu des archives PDF (support/utils/pdf_renderer.py), démarrés par
+# run_report_worker : chacun est un Django + WeasyPrint complet.
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 FILE_UPLOAD_PERMISSIONS = 0o644
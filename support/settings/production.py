@@ -84,6 +84,14 @@ else:
         }
     }
 
+# ------------------------------------------------------------------
+# CHANNELS (WebSocket)
+# Plusieurs workers ASGI : les group_send passent par Redis pub/sub.
+# CHANNEL_REDIS_URLS="redis://a:6379/1,redis://b:6379/1" répartit les salons
+# (groupes ticket_<id>) sur plusieurs instances ; à défaut, REDIS_URL.
+# ------------------------------------------------------------------
+CHANNEL_LAYERS = channel_layers(parse_redis_urls(os.getenv("CHANNEL_REDIS_URLS") or REDIS_URL))
+
 if DEBUG:
     REST_FRAMEWORK['EXCEPTION_HANDLER'] = 'rest_framework.views.exception_handler'
 # ------------------------------------------------------------------
@@ -122,6 +130,9 @@ CLOUDINARY_STORAGE = {
 }
 
 DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
+# Rapports PDF : fichiers bruts, pas des images. Nouveau dict : le package settings
+# importe ce module, base.STORAGES ne doit pas être modifié pour settings.local
+STORAGES = {**STORAGES, "reports": {"BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage"}}
 
 # ------------------------------------------------------------------
 # TWILIO
@@ -0,0 +1,35 @@
+# support/channel_layers.py
+"""
+Configuration de la couche de messages Channels (group_send du chat).
+
+- Sans Redis : InMemoryChannelLayer. Un seul processus (runserver, tests) : les
+  group_send n'atteignent que les sockets de ce processus.
+- Avec Redis : RedisPubSubChannelLayer. Chaque group_send est un PUBLISH reçu par
+  tous les workers ASGI abonnés au groupe. Avec plusieurs URLs, chaque groupe
+  (ticket_<id>) et chaque canal est attribué à une instance par hachage cohérent :
+  la charge des salons se répartit sur les instances.
+
+Ce module est importé par les settings : aucune dépendance à Django ni à channels_redis.
+"""
+IN_MEMORY_BACKEND = 'channels.layers.InMemoryChannelLayer'
+REDIS_PUBSUB_BACKEND = 'channels_redis.pubsub.RedisPubSubChannelLayer'
+
+
+def parse_redis_urls(value):
+    """'redis://a:6379/1, redis://b:6379/1' -> liste d'URLs (vide si non défini)."""
+    return [url.strip() for url in (value or '').split(',') if url.strip()]
+
+
+def channel_layers(redis_urls=None, prefix='support:chat'):
+    """Valeur de CHANNEL_LAYERS : Redis pub/sub si des URLs sont données, sinon en mémoire."""
+    if not redis_urls:
+        return {'default': {'BACKEND': IN_MEMORY_BACKEND}}
+    return {
+        'default': {
+            'BACKEND': REDIS_PUBSUB_BACKEND,
+            'CONFIG': {
+                'hosts': [{'address': url} for url in redis_urls],
+                'prefix': prefix,
+            },
+        }
+    }
@@ -32,7 +32,10 @@ class JWTAuthMiddleware:
 
     @staticmethod
     async def get_user(user_id):
+        # Profils chargés avec l'utilisateur : le consumer vérifie l'accès sans autre requête
         try:
-            return await sync_to_async(User.objects.get)(id=user_id)
+            return await sync_to_async(
+                User.objects.select_related('client_profile', 'technician_profile').get
+            )(id=user_id)
         except User.DoesNotExist:
             return AnonymousUser()
@@ -0,0 +1,84 @@
+# utils/bulk_export.py
+"""
+Exports en masse (BI) sans objets ORM.
+
+Les lignes sont lues avec values_list().iterator(chunk_size) : sur PostgreSQL,
+iterator() ouvre un curseur côté serveur, la mémoire reste bornée quelle que soit
+la taille de l'export.
+
+- CSV : chaque lot est encodé et envoyé aussitôt (StreamingHttpResponse).
+- Parquet : chaque lot devient un row group pyarrow écrit dans un fichier temporaire,
+  envoyé ensuite par morceaux. pyarrow est importé à la demande (cf. parquet_available).
+"""
+import csv
+import io
+import tempfile
+from itertools import islice
+
+EXPORT_CHUNK_SIZE = 5000
+# Lignes par row group Parquet
+ROW_GROUP_SIZE = 50_000
+
+
+def iter_chunks(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """Lots de tuples (un par ligne) pour les colonnes demandées."""
+    rows = queryset.values_list(*[lookup for _, lookup, *_ in columns]).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---------- CSV ----------
+def iter_csv(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Octets CSV (UTF-8 avec BOM pour Excel), un morceau par lot de lignes.
+    columns : [(en-tête, lookup)].
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data.encode('utf-8')
+
+    buffer.write('\ufeff')
+    writer.writerow([header for header, *_ in columns])
+    yield flush()
+    for chunk in iter_chunks(queryset, columns, chunk_size):
+        writer.writerows(chunk)
+        yield flush()
+
+
+# ---------- PARQUET ----------
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_parquet(queryset, columns, row_group_size=ROW_GROUP_SIZE):
+    """
+    Écrit l'export dans un fichier temporaire rembobiné.
+    columns : [(nom, lookup, type pyarrow, conversion ou None)].
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, arrow_type) for name, _, arrow_type, _ in columns])
+    temp = tempfile.TemporaryFile(suffix='.parquet')
+    with pq.ParquetWriter(temp, schema, compression='snappy') as writer:
+        for chunk in iter_chunks(queryset, columns, row_group_size):
+            arrays = []
+            for (name, _, arrow_type, convert), values in zip(columns, zip(*chunk)):
+                if convert is not None:
+                    values = [None if value is None else convert(value) for value in values]
+                arrays.append(pa.array(values, type=arrow_type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=row_group_size)
+    temp.seek(0)
+    return temp
@@ -0,0 +1,89 @@
+# utils/excel_stream.py
+"""
+Exports Excel en flux.
+
+Les classeurs sont créés en mode write_only : openpyxl écrit chaque ligne sur disque
+au fil de l'eau au lieu de garder toutes les cellules en mémoire. Le fichier final est
+un fichier temporaire envoyé par morceaux (StreamingHttpResponse), puis supprimé.
+"""
+import os
+import tempfile
+from copy import copy
+
+from django.http import StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Taille des lots lus en base (queryset.iterator) et des morceaux envoyés au client
+DB_CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def new_workbook(write_only=True):
+    return Workbook(write_only=write_only)
+
+
+def add_sheet(workbook, title):
+    if workbook.write_only:
+        return workbook.create_sheet(title)
+    sheet = workbook.active
+    sheet.title = title
+    return sheet
+
+
+def set_column_widths(sheet, widths):
+    """Largeurs fixes : en write_only, elles doivent être posées avant la première ligne."""
+    for index, width in enumerate(widths, 1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+
+
+def cell_style(sheet, **style):
+    """
+    Style (font, fill, border, alignment, number_format) résolu une seule fois :
+    l'affecter attribut par attribut à chaque cellule hache les objets de style à
+    chaque fois et domine le temps d'écriture des gros exports.
+    """
+    cell = WriteOnlyCell(sheet)
+    for attribute, setting in style.items():
+        setattr(cell, attribute, setting)
+    return cell._style
+
+
+def styled_cell(sheet, value, style):
+    cell = WriteOnlyCell(sheet, value=value)
+    cell._style = copy(style)
+    return cell
+
+
+def styled_row(sheet, values, **style):
+    """Ligne de cellules portant le même style."""
+    style = cell_style(sheet, **style)
+    return [styled_cell(sheet, value, style) for value in values]
+
+
+def save_to_tempfile(workbook):
+    """Enregistre le classeur dans un fichier temporaire, rembobiné, supprimé à la fermeture."""
+    temp = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(temp)
+    temp.seek(0)
+    return temp
+
+
+def iter_file(fileobj, chunk_size=FILE_CHUNK_SIZE):
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def excel_response(fileobj, filename):
+    response = StreamingHttpResponse(iter_file(fileobj), content_type=EXCEL_CONTENT_TYPE)
+    response['Content-Length'] = os.fstat(fileobj.fileno()).st_size
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
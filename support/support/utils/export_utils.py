@@ -1,132 +1,110 @@
 # utils/export_utils.py
-import io
-import base64
-from django.template.loader import render_to_string
-from weasyprint import HTML
-from weasyprint.text.fonts import FontConfiguration
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib import colors
-from openpyxl import Workbook
-import openpyxl
+import tempfile
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from openpyxl.styles import Font
 from django.utils import timezone
 
-def export_ticket_pdf(ticket):
-    """Exporte un ticket détaillé en PDF avec WeasyPrint"""
-    # Préparer les données pour le template
-    context = {
+from tcikets.models import Ticket
+from .excel_stream import DB_CHUNK_SIZE, add_sheet, new_workbook, save_to_tempfile, set_column_widths, styled_row
+from .pdf_renderer import renderer, render_pool, reset_render_pool
+
+# Nombre de tickets à partir duquel les PDF d'une archive sont rendus en parallèle
+PARALLEL_THRESHOLD = 8
+
+
+def ticket_pdf_queryset(tickets):
+    """Tout ce que le gabarit lit, chargé d'avance : aucune requête par ticket au rendu."""
+    return tickets.select_related('client__user', 'technician__user').prefetch_related('images')
+
+
+def ticket_pdf_context(ticket, now=None):
+    return {
         'ticket': ticket,
-        'now': timezone.now(),
+        'now': now or timezone.now(),
        # 'interventions': ticket.interventions.all().order_by('intervention_date', 'start_time'),
         'images': ticket.images.all()
     }
-    
-    # Rendre le template HTML
-    html_string = render_to_string('ticket_pdf_template.html', context)
-    
-    # Configurer les polices
-    font_config = FontConfiguration()
-    
-    # Créer le PDF
-    buffer = io.BytesIO()
-    HTML(string=html_string).write_pdf(buffer, font_config=font_config)
-    buffer.seek(0)
-    
-    return buffer
-
-
-def export_tickets_pdf(tickets, filename="tickets_report.pdf"):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    
-    # Title
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1  # Center
+
+
+def export_ticket_pdf(ticket):
+    """Exporte un ticket détaillé en PDF avec WeasyPrint"""
+    # Polices et CSS partagées, initialisées une fois par processus (cf. pdf_renderer)
+    return renderer.render('ticket_pdf_template.html', ticket_pdf_context(ticket))
+
+
+def export_tickets_pdf(tickets):
+    """Plusieurs tickets dans un seul PDF (un ticket = une suite de pages)."""
+    now = timezone.now()
+    return renderer.render_many(
+        'ticket_pdf_template.html', [ticket_pdf_context(ticket, now) for ticket in ticket_pdf_queryset(tickets)]
     )
-    title = Paragraph("Rapport des Tickets", title_style)
-    elements.append(title)
-    
-    # Table data
-    data = [['ID', 'Titre', 'Statut', 'Priorité', 'Date de création', 'Client', 'Technicien']]
-    
-    for ticket in tickets:
-        data.append([
-            str(ticket.id)[:8] + '...',
-            ticket.title,
-            dict(ticket.STATUS_CHOICES).get(ticket.status, ticket.status),
-            dict(ticket.PRIORITY_CHOICES).get(ticket.priority, ticket.priority),
-            ticket.created_at.strftime('%d/%m/%Y %H:%M'),
-            f"{ticket.client.user.first_name} {ticket.client.user.last_name}",
-            f"{ticket.technician.user.first_name} {ticket.technician.user.last_name}" if ticket.technician else "Non assigné"
-        ])
-    
-    # Create table
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-def export_tickets_excel(tickets, filename="tickets_report.xlsx"):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Tickets"
-    
-    # Headers
-    headers = ['ID', 'Titre', 'Description', 'Statut', 'Priorité', 'Date de création', 'Client', 'Technicien', 'Coût (FCFA)']
-    for col_num, header in enumerate(headers, 1):
-        ws.cell(row=1, column=col_num, value=header)
-        ws.cell(row=1, column=col_num).font = openpyxl.styles.Font(bold=True)
-    
-    # Data
-    for row_num, ticket in enumerate(tickets, 2):
-        ws.cell(row=row_num, column=1, value=str(ticket.id))
-        ws.cell(row=row_num, column=2, value=ticket.title)
-        ws.cell(row=row_num, column=3, value=ticket.description)
-        ws.cell(row=row_num, column=4, value=dict(ticket.STATUS_CHOICES).get(ticket.status, ticket.status))
-        ws.cell(row=row_num, column=5, value=dict(ticket.PRIORITY_CHOICES).get(ticket.priority, ticket.priority))
-        ws.cell(row=row_num, column=6, value=ticket.created_at.strftime('%d/%m/%Y %H:%M'))
-        ws.cell(row=row_num, column=7, value=f"{ticket.client.user.first_name} {ticket.client.user.last_name}")
-        ws.cell(row=row_num, column=8, value=f"{ticket.technician.user.first_name} {ticket.technician.user.last_name}" if ticket.technician else "Non assigné")
-       # ws.cell(row=row_num, column=9, value=f"{ticket.cost if ticket.cost else '0'} FCFA")
-    
-    # Adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
+
+
+def ticket_pdf_filename(ticket):
+    return f"ticket_{ticket.code or ticket.id}.pdf"
+
+
+def _render_ticket_pdf(ticket):
+    # Exécuté dans un processus du pool : le ticket arrive avec ses relations préchargées
+    return ticket_pdf_filename(ticket), export_ticket_pdf(ticket).getvalue()
+
+
+def export_tickets_pdf_zip(tickets):
+    """
+    Un PDF par ticket, rendus en parallèle dans le pool de processus, réunis dans une
+    archive zip (fichier temporaire rembobiné). En dessous de PARALLEL_THRESHOLD
+    tickets, démarrer les processus coûte plus que le rendu : tout se fait ici.
+    """
+    tickets = list(ticket_pdf_queryset(tickets))
+    archive = tempfile.TemporaryFile(suffix='.zip')
+    # Les PDF sont déjà compressés
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+        if len(tickets) < PARALLEL_THRESHOLD:
+            results = map(_render_ticket_pdf, tickets)
+        else:
             try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column_letter].width = adjusted_width
-        
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+                results = list(render_pool().map(_render_ticket_pdf, tickets, chunksize=4))
+            except BrokenProcessPool:
+                reset_render_pool()
+                raise
+        for filename, content in results:
+            zf.writestr(filename, content)
+    archive.seek(0)
+    return archive
+
+
+def export_tickets_excel(tickets, write_only=True):
+    """
+    Exporte les tickets en Excel (classeur write_only, lignes lues par lots avec
+    iterator()). Renvoie un fichier temporaire à envoyer avec excel_response().
+    """
+    wb = new_workbook(write_only)
+    ws = add_sheet(wb, "Tickets")
+
+    headers = ['ID', 'Titre', 'Description', 'Statut', 'Priorité', 'Date de création', 'Client', 'Technicien', 'Coût (FCFA)']
+    # Largeurs fixes : plus de second passage sur toutes les cellules
+    set_column_widths(ws, [38, 40, 60, 12, 10, 18, 25, 25, 14])
+    ws.append(styled_row(ws, headers, font=Font(bold=True)))
+
+    status_labels = dict(Ticket.STATUS_CHOICES)
+    priority_labels = dict(Ticket.PRIORITY_CHOICES)
+    rows = tickets.order_by('created_at').values_list(
+        'id', 'title', 'description', 'status', 'priority', 'created_at',
+        'client__user__first_name', 'client__user__last_name',
+        'technician_id', 'technician__user__first_name', 'technician__user__last_name',
+    )
+    for (ticket_id, title, description, status, priority, created_at,
+         client_first, client_last, technician_id, tech_first, tech_last) in rows.iterator(chunk_size=DB_CHUNK_SIZE):
+        ws.append([
+            str(ticket_id),
+            title,
+            description,
+            status_labels.get(status, status),
+            priority_labels.get(priority, priority),
+            created_at.strftime('%d/%m/%Y %H:%M'),
+            f"{client_first} {client_last}",
+            f"{tech_first} {tech_last}" if technician_id else "Non assigné",
+        ])
+
+    return save_to_tempfile(wb)
@@ -0,0 +1,202 @@
+# utils/pdf_renderer.py
+"""
+Moteur WeasyPrint partagé par tout le processus.
+
+Initialiser fontconfig et analyser les feuilles de style coûte plus cher que la mise
+en page d'un petit rapport : on le fait une seule fois (warm_up() au démarrage du
+worker / de gunicorn) puis chaque rendu réutilise la FontConfiguration et les CSS
+déjà analysées. Les durées de chaque étape (gabarit, mise en page, écriture PDF)
+sont cumulées dans `renderer.stats()`.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+
+logger = logging.getLogger(__name__)
+
+# Gabarit HTML -> feuille de style analysée une fois (extraite des <style> des gabarits)
+STYLESHEETS = {
+    'reports/intervention_report.html': 'reports/intervention_report.css',
+    'ticket_pdf_template.html': 'ticket_pdf_template.css',
+}
+
+PHASES = ('template', 'layout', 'write')
+
+
+class PDFRenderer:
+    def __init__(self, stylesheets=None):
+        self.stylesheet_names = dict(stylesheets or STYLESHEETS)
+        self.font_config = None
+        self.stylesheets = {}
+        self.warm_up_ms = None
+        self._timings = {phase: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0} for phase in PHASES}
+        # WeasyPrint n'est pas thread-safe : un rendu à la fois par processus
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.font_config is not None
+
+    def warm_up(self):
+        """Charge WeasyPrint, initialise les polices et analyse les CSS. Idempotent."""
+        with self._lock:
+            if self.ready:
+                return self
+            start = time.perf_counter()
+            from weasyprint import CSS, HTML, __version__
+            from weasyprint.text.fonts import FontConfiguration
+
+            font_config = FontConfiguration()
+            for template_name, css_name in self.stylesheet_names.items():
+                with open(get_template(css_name).origin.name, encoding='utf-8') as f:
+                    self.stylesheets[template_name] = CSS(string=f.read(), font_config=font_config)
+            # Un premier rendu charge pango et le cache fontconfig
+            HTML(string="<p>warm-up</p>").render(font_config=font_config)
+            self.font_config = font_config
+            self.warm_up_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"Moteur PDF prêt (WeasyPrint {__version__}) en {self.warm_up_ms:.0f} ms")
+        return self
+
+    def render(self, template_name, context, base_url=None):
+        """Rend un gabarit en PDF et renvoie un BytesIO positionné au début."""
+        from weasyprint import HTML
+
+        self.warm_up()
+        start = time.perf_counter()
+        html_string = render_to_string(template_name, context)
+        rendered = time.perf_counter()
+
+        stylesheets = [self.stylesheets[template_name]] if template_name in self.stylesheets else []
+        buffer = BytesIO()
+        with self._lock:
+            document = HTML(string=html_string, base_url=base_url or default_base_url()).render(
+                stylesheets=stylesheets, font_config=self.font_config
+            )
+            laid_out = time.perf_counter()
+            document.write_pdf(buffer)
+        written = time.perf_counter()
+
+        self._record('template', rendered - start)
+        self._record('layout', laid_out - rendered)
+        self._record('write', written - laid_out)
+        logger.debug(
+            f"PDF {template_name}: gabarit {(rendered - start) * 1000:.0f} ms, "
+            f"mise en page {(laid_out - rendered) * 1000:.0f} ms, écriture {(written - laid_out) * 1000:.0f} ms"
+        )
+        buffer.seek(0)
+        return buffer
+
+    def render_many(self, template_name, contexts, base_url=None):
+        """
+        Plusieurs rendus du même gabarit dans un seul PDF : chaque contexte est mis en
+        page séparément, puis les pages sont concaténées.
+        """
+        from weasyprint import HTML
+
+        self.warm_up()
+        stylesheets = [self.stylesheets[template_name]] if template_name in self.stylesheets else []
+        base_url = base_url or default_base_url()
+        documents = []
+        for context in contexts:
+            start = time.perf_counter()
+            html_string = render_to_string(template_name, context)
+            rendered = time.perf_counter()
+            with self._lock:
+                documents.append(HTML(string=html_string, base_url=base_url).render(
+                    stylesheets=stylesheets, font_config=self.font_config
+                ))
+            self._record('template', rendered - start)
+            self._record('layout', time.perf_counter() - rendered)
+
+        buffer = BytesIO()
+        start = time.perf_counter()
+        with self._lock:
+            pages = [page for document in documents for page in document.pages]
+            documents[0].copy(pages).write_pdf(buffer)
+        self._record('write', time.perf_counter() - start)
+        buffer.seek(0)
+        return buffer
+
+    def _record(self, phase, seconds):
+        ms = seconds * 1000
+        timing = self._timings[phase]
+        timing['count'] += 1
+        timing['total_ms'] += ms
+        timing['max_ms'] = max(timing['max_ms'], ms)
+
+    def stats(self):
+        """Durées cumulées par étape depuis le démarrage du processus."""
+        result = {'warm_up_ms': self.warm_up_ms}
+        for phase, timing in self._timings.items():
+            count = timing['count']
+            result[phase] = {
+                'count': count,
+                'total_ms': round(timing['total_ms'], 1),
+                'avg_ms': round(timing['total_ms'] / count, 1) if count else 0.0,
+                'max_ms': round(timing['max_ms'], 1),
+            }
+        return result
+
+
+def default_base_url():
+    # Permet à WeasyPrint de résoudre les fichiers locaux (logos, images statiques)
+    return getattr(settings, 'STATIC_ROOT', None) or str(settings.BASE_DIR)
+
+
+renderer = PDFRenderer()
+
+
+def warm_up_renderer():
+    """Au démarrage d'un processus : ne bloque pas le boot si WeasyPrint est indisponible."""
+    try:
+        renderer.warm_up()
+    except (ImportError, OSError) as e:
+        logger.warning(f"Moteur PDF indisponible, rendu désactivé: {e}")
+
+
+# ---------- POOL DE PROCESSUS ----------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_render_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+
+    django.setup()
+    warm_up_renderer()
+
+
+def render_pool():
+    """
+    Pool de processus partagé pour les rendus en parallèle (mise en page WeasyPrint
+    liée au CPU). Processus "spawn" : aucune connexion à la base héritée du parent ;
+    chaque processus initialise son propre moteur au démarrage. Utilisé par le worker
+    des rapports (run_report_worker), jamais dans une requête web.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=min(getattr(settings, 'PDF_RENDER_WORKERS', None) or 2, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_render_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),),
+            )
+        return _pool
+
+
+def reset_render_pool():
+    """Après un BrokenProcessPool (processus tué), le prochain appel recrée le pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
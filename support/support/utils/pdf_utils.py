@@ -1,30 +1,16 @@
 # utils/pdf_utils.py
-from django.template.loader import render_to_string
-from django.conf import settings
 from io import BytesIO
 from datetime import datetime
-import os
 import logging
 
+from .pdf_renderer import renderer
+
 logger = logging.getLogger(__name__)
 
 def intervention_to_pdf_buffer(intervention, logo_url=None):
     """
     Render the HTML template and return a BytesIO buffer containing the PDF.
     """
-    # Test WeasyPrint import with detailed error logging
-    try:
-        from weasyprint import HTML, CSS, __version__
-        logger.info(f"WeasyPrint successfully imported. Version: {__version__}")
-    except ImportError as e:
-        logger.error(f"WeasyPrint import failed: {str(e)}")
-        logger.error("Please ensure system dependencies are installed:")
-        logger.error("libpango, libcairo, libgdk-pixbuf, etc.")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error importing WeasyPrint: {str(e)}")
-        raise
-
     # Build context (safe getattr usage)
     ticket = getattr(intervention, 'ticket', None)
     client = getattr(ticket, 'client', None)
@@ -94,44 +80,8 @@ def intervention_to_pdf_buffer(intervention, logo_url=None):
         'status_display': status_display
     }
 
-    try:
-        html_string = render_to_string('reports/intervention_report.html', context)
-        logger.info("HTML template rendered successfully")
-    except Exception as e:
-        logger.error(f"Template rendering failed: {str(e)}")
-        raise
-
-    # Generate PDF
-    pdf_io = BytesIO()
-    
-    try:
-        # Use base_url to allow WeasyPrint to access local files (like logos)
-        # For Railway/production, use STATIC_URL if STATIC_ROOT is not accessible
-        if settings.DEBUG:
-            base_url = settings.STATIC_ROOT or str(settings.BASE_DIR)
-        else:
-            # In production, use the full static URL or a file path if mounted
-            base_url = getattr(settings, 'STATIC_ROOT', None) or str(settings.BASE_DIR)
-        
-        logger.info(f"Using base_url: {base_url}")
-        
-        # Create HTML object
-        html_doc = HTML(string=html_string, base_url=base_url)
-        logger.info("HTML object created successfully")
-        
-        # Write PDF
-        html_doc.write_pdf(pdf_io)
-        logger.info("PDF generated successfully")
-        
-    except Exception as e:
-        logger.error(f"PDF generation failed: {str(e)}")
-        logger.error(f"Error type: {type(e).__name__}")
-        import traceback
-        logger.error(traceback.format_exc())
-        raise
-    
-    pdf_io.seek(0)
-    return pdf_io
+    # Polices et CSS partagées, initialisées une fois par processus (cf. pdf_renderer)
+    return renderer.render('reports/intervention_report.html', context)
 
 
 def test_weasyprint_dependencies():
@@ -16,220 +16,210 @@ from datetime import datetime, timedelta
 
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from datetime import datetime
-import pandas as pd
 from io import BytesIO
 from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
 import calendar
 
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 
+from tcikets.models import Intervention
+from .excel_stream import (
+    DB_CHUNK_SIZE, add_sheet, cell_style, new_workbook, save_to_tempfile, set_column_widths, styled_cell, styled_row,
+)
 
 
 
 
-def export_monthly_report_excel(interventions, month, year):
+# Temps total (travail + déplacement) calculé en base, comme Intervention.calculate_total_time
+TOTAL_TIME = ExpressionWrapper(
+    F('hours_worked') + F('travel_time'), output_field=DecimalField(max_digits=6, decimal_places=2)
+)
+ZERO_HOURS = Value(0, output_field=DecimalField(max_digits=6, decimal_places=2))
+ZERO_COST = Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def monthly_summary(interventions):
+    """
+    Résumé du rapport mensuel calculé en base : totaux, moyennes et répartition par
+    statut en un seul aggregate(), puis la répartition par technicien (annotate).
+    """
+    statuses = [value for value, _ in Intervention.INTERVENTION_STATUS]
+    summary = interventions.order_by().aggregate(
+        count=Count('id'),
+        total_time=Coalesce(Sum(TOTAL_TIME), ZERO_HOURS),
+        avg_time=Coalesce(Avg(TOTAL_TIME), ZERO_HOURS),
+        transport=Coalesce(Sum('transport_cost'), ZERO_COST),
+        additional=Coalesce(Sum('additional_costs'), ZERO_COST),
+        revenue=Coalesce(Sum('total_cost'), ZERO_COST),
+        avg_revenue=Coalesce(Avg('total_cost'), ZERO_COST),
+        **{f"status_{value}": Count('id', filter=Q(status=value)) for value in statuses},
+    )
+    summary['statuses'] = {value: summary.pop(f"status_{value}") for value in statuses}
+    summary['technicians'] = list(
+        interventions.order_by().values(
+            'technician_id', 'technician__user__first_name', 'technician__user__last_name'
+        ).annotate(
+            count=Count('id'),
+            total_time=Coalesce(Sum(TOTAL_TIME), ZERO_HOURS),
+            revenue=Coalesce(Sum('total_cost'), ZERO_COST),
+        ).order_by('-count')
+    )
+    return summary
+
+
+def export_monthly_report_excel(interventions, month, year, write_only=True):
     """
     Generate a professional Excel monthly report with detailed intervention data
-    using FCFA currency and French date formats
+    using FCFA currency and French date formats.
+
+    Classeur write_only alimenté ligne par ligne (iterator + values_list, temps total
+    calculé en base) ; le résumé vient de monthly_summary(), sans objets ORM en mémoire.
+    Renvoie un fichier temporaire à envoyer avec excel_response().
     """
-    # Create a workbook and get the active worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"Rapport {month}-{year}"
-    
+    month_name = [
+        "Janvier", "Février", "Mars", "Avril", "Mai", "Juin",
+        "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"
+    ][month-1]
+
+    wb = new_workbook(write_only)
+    ws = add_sheet(wb, f"Rapport {month}-{year}")
+
     # Define styles
     header_font = Font(bold=True, color="FFFFFF", size=12)
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_alignment = Alignment(horizontal="center", vertical="center")
-    
+
     title_font = Font(bold=True, size=14, color="366092")
     subtitle_font = Font(bold=True, italic=True, size=10)
-    
+
     # Use FCFA currency format
     currency_format = '#,##0.00 "FCFA"'
-    
-    # French date and time formats
-    date_format = "DD/MM/YYYY"
-    time_format = "HH:MM"
-    
+    hours_format = '0.00" heures"'
+
     thin_border = Border(
-        left=Side(style='thin'), 
-        right=Side(style='thin'), 
-        top=Side(style='thin'), 
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
         bottom=Side(style='thin')
     )
-    
+
+    # Define column order, headers in French and fixed widths
+    columns = [
+        ('Date', 12), ('Client', 25), ('Technicien', 20), ('ID Ticket', 12), ('Type service', 15),
+        ('Priorité', 10), ('Heure début', 10), ('Heure fin', 10), ('Heures travaillées', 12),
+        ('Temps déplacement', 12), ('Temps total', 12), ('Frais transport', 15),
+        ('Frais supplémentaires', 15), ('Coût total', 15), ('Statut', 12), ('Localisation', 30),
+        ('Contact', 15),
+    ]
+    currency_columns = {'Frais transport', 'Frais supplémentaires', 'Coût total'}
+    hours_columns = {'Heures travaillées', 'Temps déplacement', 'Temps total'}
+
+    # En write_only, largeurs et volets figés sont posés avant la première ligne
+    set_column_widths(ws, [width for _, width in columns])
+    ws.freeze_panes = "A5"
+
     # Add title and metadata in French
-    month_name = [
-        "Janvier", "Février", "Mars", "Avril", "Mai", "Juin",
-        "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"
-    ][month-1]
-    
-    ws.merge_cells('A1:L1')
-    ws['A1'] = f"RAPPORT MENSUEL D'INTERVENTIONS - {month_name.upper()} {year}"
-    ws['A1'].font = title_font
-    ws['A1'].alignment = Alignment(horizontal="center")
-    
-    ws.merge_cells('A2:L2')
-    ws['A2'] = f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-    ws['A2'].font = subtitle_font
-    ws['A2'].alignment = Alignment(horizontal="center")
-    
-    # Prepare data for the table
-    data = []
-    for intervention in interventions:
-        # Get related objects safely
-        ticket = getattr(intervention, 'ticket', None)
-        client = getattr(ticket, 'client', None) if ticket else None
-        technician = getattr(intervention, 'technician', None)
-        tech_user = getattr(technician, 'user', None) if technician else None
-        
-        # Format times in French format
-        start_time = intervention.start_time.strftime('%H:%M') if intervention.start_time else "N/A"
-        end_time = intervention.end_time.strftime('%H:%M') if intervention.end_time else "N/A"
-        
-        # Calculate total time if not already available
-        total_time = getattr(intervention, 'calculate_total_time', None)
-        if total_time and callable(total_time):
-            total_time = total_time()
+    ws.append(styled_row(ws, [f"RAPPORT MENSUEL D'INTERVENTIONS - {month_name.upper()} {year}"],
+                         font=title_font, alignment=Alignment(horizontal="center")))
+    ws.append(styled_row(ws, [f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"],
+                         font=subtitle_font, alignment=Alignment(horizontal="center")))
+    ws.merged_cells.add('A1:L1')
+    ws.merged_cells.add('A2:L2')
+    ws.append([])
+
+    ws.append(styled_row(ws, [name for name, _ in columns],
+                         font=header_font, fill=header_fill, alignment=header_alignment, border=thin_border))
+
+    # Cellules de données : un style par colonne, construit une fois
+    column_styles = []
+    for name, _ in columns:
+        if name in currency_columns:
+            column_styles.append(cell_style(ws, border=thin_border, number_format=currency_format))
+        elif name in hours_columns:
+            column_styles.append(cell_style(ws, border=thin_border, number_format=hours_format))
         else:
-            total_time = (intervention.hours_worked or 0) + (intervention.travel_time or 0)
-        
-        # Get client and technician names
-        client_name = "N/A"
-        if client:
-            client_name = getattr(client, 'company', None) or f"{getattr(getattr(client, 'user', None), 'first_name', '')} {getattr(getattr(client, 'user', None), 'last_name', '')}".strip()
-        
-        tech_name = "N/A"
-        if tech_user:
-            tech_name = f"{getattr(tech_user, 'first_name', '')} {getattr(tech_user, 'last_name', '')}".strip()
-        
-        # Add row data with French date format
-        data.append({
-            'Date': intervention.intervention_date.strftime('%d/%m/%Y') if intervention.intervention_date else "N/A",
-            'Client': client_name,
-            'Technicien': tech_name,
-            'ID Ticket': f"TKT-{ticket.id}" if ticket else "N/A",
-            'Heure début': start_time,
-            'Heure fin': end_time,
-            'Heures travaillées': intervention.hours_worked or 0,
-            'Temps déplacement': intervention.travel_time or 0,
-            'Temps total': total_time,
-            'Frais transport': intervention.transport_cost or 0,
-            'Frais supplémentaires': intervention.additional_costs or 0,
-            'Coût total': intervention.total_cost or 0,
-            'Statut': getattr(intervention, 'status', 'N/A').capitalize(),
-            'Type service': getattr(ticket, 'service_type', 'N/A') if ticket else 'N/A',
-            'Priorité': getattr(ticket, 'priority', 'N/A').capitalize() if ticket else 'N/A',
-            'Localisation': getattr(client, 'address', 'N/A') if client else 'N/A',
-            'Contact': getattr(client, 'phone', 'N/A') if client else 'N/A',
-        })
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Define column order and headers in French
-    column_order = [
-        'Date', 'Client', 'Technicien', 'ID Ticket', 'Type service', 'Priorité',
-        'Heure début', 'Heure fin', 'Heures travaillées', 'Temps déplacement', 'Temps total',
-        'Frais transport', 'Frais supplémentaires', 'Coût total', 'Statut', 'Localisation', 'Contact'
-    ]
-    
-    # Reorder columns
-    df = df[column_order]
-    
-    # Write headers
-    for col_idx, column_name in enumerate(column_order, 1):
-        cell = ws.cell(row=4, column=col_idx, value=column_name)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
-    
-    # Write data rows
-    for row_idx, row_data in enumerate(dataframe_to_rows(df, index=False, header=False), 5):
-        for col_idx, value in enumerate(row_data, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.border = thin_border
-            
-            # Apply number formatting for currency and time columns
-            if column_order[col_idx-1] in ['Frais transport', 'Frais supplémentaires', 'Coût total']:
-                cell.number_format = currency_format
-            elif column_order[col_idx-1] in ['Heures travaillées', 'Temps déplacement', 'Temps total']:
-                cell.number_format = '0.00" heures"'
-    
-    # Adjust column widths
-    column_widths = {
-        'Date': 12,
-        'Client': 25,
-        'Technicien': 20,
-        'ID Ticket': 12,
-        'Type service': 15,
-        'Priorité': 10,
-        'Heure début': 10,
-        'Heure fin': 10,
-        'Heures travaillées': 12,
-        'Temps déplacement': 12,
-        'Temps total': 12,
-        'Frais transport': 15,
-        'Frais supplémentaires': 15,
-        'Coût total': 15,
-        'Statut': 12,
-        'Localisation': 30,
-        'Contact': 15
-    }
-    
-    for col_idx, column_name in enumerate(column_order, 1):
-        column_letter = ws.cell(row=4, column=col_idx).column_letter
-        ws.column_dimensions[column_letter].width = column_widths[column_name]
-    
+            column_styles.append(cell_style(ws, border=thin_border))
+
+    rows = interventions.annotate(total_time=TOTAL_TIME).values_list(
+        'intervention_date', 'start_time', 'end_time', 'hours_worked', 'travel_time', 'total_time',
+        'transport_cost', 'additional_costs', 'total_cost', 'status',
+        'ticket_id', 'ticket__priority', 'ticket__client__company',
+        'ticket__client__user__first_name', 'ticket__client__user__last_name',
+        'technician__user__first_name', 'technician__user__last_name',
+    )
+
+    for (intervention_date, start_time, end_time, hours_worked, travel_time, total_time,
+         transport_cost, additional_costs, total_cost, status,
+         ticket_id, priority, company, client_first, client_last,
+         tech_first, tech_last) in rows.iterator(chunk_size=DB_CHUNK_SIZE):
+        values = [
+            intervention_date.strftime('%d/%m/%Y') if intervention_date else "N/A",
+            company or f"{client_first or ''} {client_last or ''}".strip() or "N/A",
+            f"{tech_first or ''} {tech_last or ''}".strip() or "N/A",
+            f"TKT-{ticket_id}" if ticket_id else "N/A",
+            # Ni type de service sur Ticket, ni adresse / téléphone sur Client
+            'N/A',
+            priority.capitalize() if priority else 'N/A',
+            start_time.strftime('%H:%M') if start_time else "N/A",
+            end_time.strftime('%H:%M') if end_time else "N/A",
+            hours_worked or 0,
+            travel_time or 0,
+            total_time or 0,
+            transport_cost or 0,
+            additional_costs or 0,
+            total_cost or 0,
+            (status or 'N/A').capitalize(),
+            'N/A',
+            'N/A',
+        ]
+        ws.append([styled_cell(ws, value, style) for value, style in zip(values, column_styles)])
+
+    summary = monthly_summary(interventions)
+
     # Add summary section in French
-    summary_row = len(data) + 6
-    
-    # Add summary headers
-    ws.cell(row=summary_row, column=1, value="RÉSUMÉ").font = title_font
-    summary_row += 1
-    
-    # Add summary data
+    ws.append([])
+    ws.append(styled_row(ws, ["RÉSUMÉ"], font=title_font))
     summary_data = [
-        ["Total Interventions", len(interventions)],
-        ["Heures totales", df['Temps total'].sum()],
-        ["Total Frais Transport", df['Frais transport'].sum()],
-        ["Total Frais Supplémentaires", df['Frais supplémentaires'].sum()],
-        ["Revenu Total", df['Coût total'].sum()],
-        ["Temps moyen par intervention", df['Temps total'].mean() if len(interventions) > 0 else 0],
-        ["Revenu moyen par intervention", df['Coût total'].mean() if len(interventions) > 0 else 0],
+        ("Total Interventions", summary['count'], None),
+        ("Heures totales", summary['total_time'], hours_format),
+        ("Total Frais Transport", summary['transport'], currency_format),
+        ("Total Frais Supplémentaires", summary['additional'], currency_format),
+        ("Revenu Total", summary['revenue'], currency_format),
+        ("Temps moyen par intervention", summary['avg_time'], hours_format),
+        ("Revenu moyen par intervention", summary['avg_revenue'], currency_format),
     ]
-    
-    for i, (label, value) in enumerate(summary_data, summary_row):
-        ws.cell(row=i, column=1, value=label).font = Font(bold=True)
-        cell = ws.cell(row=i, column=2, value=value)
-        
-        if "Frais" in label or "Revenu" in label or "Coût" in label:
-            cell.number_format = currency_format
-        elif "Heures" in label or "Temps" in label:
-            cell.number_format = '0.00" heures"'
-    
+    label_style = cell_style(ws, font=Font(bold=True))
+    for label, value, number_format in summary_data:
+        value_cell = WriteOnlyCell(ws, value=value)
+        if number_format:
+            value_cell.number_format = number_format
+        ws.append([styled_cell(ws, label, label_style), value_cell])
+
     # Add status breakdown in French
-    status_row = summary_row + len(summary_data) + 2
-    ws.cell(row=status_row, column=1, value="RÉPARTITION PAR STATUT").font = title_font
-    status_row += 1
-    
-    status_counts = df['Statut'].value_counts()
-    for i, (status, count) in enumerate(status_counts.items(), status_row):
-        ws.cell(row=i, column=1, value=status)
-        ws.cell(row=i, column=2, value=count)
-    
-    # Freeze panes for easy navigation
-    ws.freeze_panes = "A5"
-    
-    # Save to BytesIO buffer
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    return buffer
+    ws.append([])
+    ws.append(styled_row(ws, ["RÉPARTITION PAR STATUT"], font=title_font))
+    for status, status_count in sorted(summary['statuses'].items(), key=lambda item: -item[1]):
+        if status_count:
+            ws.append([status.capitalize(), status_count])
+
+    # Breakdown per technician
+    ws.append([])
+    ws.append(styled_row(ws, ["RÉPARTITION PAR TECHNICIEN"], font=title_font))
+    ws.append(styled_row(ws, ["Technicien", "Interventions", "Temps total", "Revenu"], font=Font(bold=True)))
+    hours_style = cell_style(ws, number_format=hours_format)
+    currency_style = cell_style(ws, number_format=currency_format)
+    for technician in summary['technicians']:
+        name = f"{technician['technician__user__first_name'] or ''} {technician['technician__user__last_name'] or ''}".strip()
+        ws.append([
+            name or ("Non assigné" if technician['technician_id'] is None else "N/A"),
+            technician['count'],
+            styled_cell(ws, technician['total_time'], hours_style),
+            styled_cell(ws, technician['revenue'], currency_style),
+        ])
+
+    return save_to_tempfile(wb)
 
 def export_intervention_pdf(intervention):
     """Generate a professional PDF report for an intervention with FCFA currency and French format"""
@@ -16,3 +16,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings.production')
 
 
 application = get_wsgi_application()
+
+# Polices et CSS des rapports PDF initialisées au démarrage du worker, pas à la première requête
+from support.utils.pdf_renderer import warm_up_renderer  # noqa: E402
+
+warm_up_renderer()
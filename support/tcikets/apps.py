@@ -7,4 +7,6 @@ class TciketsConfig(AppConfig):
     
     def ready(self):
         import tcikets.signals
+        from tcikets import cache_registry
+        cache_registry.register()
     
@@ -0,0 +1,194 @@
+# cache_registry.py
+"""
+Registre central d'invalidation du cache.
+
+Chaque modèle déclare les namespaces de cache qu'il affecte ; toute écriture
+(post_save, post_delete, m2m_changed) incrémente leur version après le commit
+(cf. response_cache.invalidate). Les entrées en cache peuvent donc vivre longtemps :
+elles deviennent inaccessibles dès que la donnée change, quelle que soit la vue
+ou l'admin à l'origine de l'écriture.
+
+Un namespace est soit une chaîne, soit une fonction(instance) -> chaîne(s) pour les
+namespaces propres à un utilisateur ou à un périmètre.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from .response_cache import invalidate
+
+TICKETS_ADMIN_SCOPE = "tickets:admin"
+
+# Champs de User affichés dans les listes (UserSerializer, noms des tickets, auteurs des procédures)
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name', 'email', 'userType', 'phone', 'bio', 'avatar')
+
+
+def notifications_namespace(user_id):
+    return f"notifications:{user_id}"
+
+
+def ticket_user_namespace(user_id):
+    return f"tickets:user:{user_id}"
+
+
+def ticket_scope_namespace(user):
+    """Génération de la liste de tickets vue par `user` (même règle que views.visible_tickets)."""
+    if user.userType in ("client", "technician"):
+        return ticket_user_namespace(user.pk)
+    return TICKETS_ADMIN_SCOPE
+
+
+def ticket_namespaces(ticket):
+    """Périmètres qui voient ce ticket : admin, son client, son technicien (actuels et précédents)."""
+    from .models import Client, Technician
+
+    client_ids = {ticket.client_id, getattr(ticket, '_previous_client_id', None)} - {None}
+    user_ids = set(Client.objects.filter(pk__in=client_ids).values_list('user_id', flat=True))
+    technician_ids = {ticket.technician_id, getattr(ticket, '_previous_technician_id', None)} - {None}
+    if technician_ids:
+        user_ids.update(Technician.objects.filter(pk__in=technician_ids).values_list('user_id', flat=True))
+    return [TICKETS_ADMIN_SCOPE, *(ticket_user_namespace(user_id) for user_id in user_ids)]
+
+
+def ticket_child_namespaces(instance):
+    """Images / messages : la liste affiche miniature et nombre de messages du ticket parent."""
+    from .models import Ticket
+
+    # Les messages du chat arrivent avec les utilisateurs du ticket, déjà connus du consumer
+    row = getattr(instance, '_ticket_user_ids', None)
+    if row is None:
+        row = Ticket.objects.filter(pk=instance.ticket_id).values_list(
+            'client__user_id', 'technician__user_id'
+        ).first()
+    user_ids = set(row or ()) - {None}
+    return [TICKETS_ADMIN_SCOPE, *(ticket_user_namespace(user_id) for user_id in user_ids)]
+
+
+def user_ticket_namespaces(user_id):
+    """
+    Listes de tickets qui affichent cet utilisateur (nom du client / du technicien) :
+    admin, lui-même et l'autre partie de chacun de ses tickets.
+    """
+    from .models import Ticket
+
+    user_ids = {user_id}
+    rows = Ticket.objects.filter(
+        Q(client__user_id=user_id) | Q(technician__user_id=user_id)
+    ).values_list('client__user_id', 'technician__user_id').distinct()
+    for row in rows:
+        user_ids.update(row)
+    user_ids.discard(None)
+    return ['tickets', TICKETS_ADMIN_SCOPE, *(ticket_user_namespace(uid) for uid in user_ids)]
+
+
+def user_namespaces(user):
+    """
+    Rien à invalider si aucun champ affiché n'a changé : la connexion (last_login) et
+    les autres écritures techniques ne vident plus les listes.
+    """
+    if not getattr(user, '_display_changed', True):
+        return []
+    return ['users', 'procedures', *user_ticket_namespaces(user.pk)]
+
+
+def remember_user_display(sender, instance, update_fields=None, **kwargs):
+    """Détermine avant l'écriture si un champ de USER_DISPLAY_FIELDS change."""
+    if instance._state.adding:
+        instance._display_changed = True
+    elif update_fields is not None and not set(update_fields) & set(USER_DISPLAY_FIELDS):
+        instance._display_changed = False
+    else:
+        previous = sender.objects.filter(pk=instance.pk).values(*USER_DISPLAY_FIELDS).first() or {}
+        current = {field: getattr(instance, field) for field in USER_DISPLAY_FIELDS}
+        # FieldFile -> nom stocké, vide = None des deux côtés
+        current['avatar'] = current['avatar'].name or None
+        previous['avatar'] = previous.get('avatar') or None
+        instance._display_changed = previous != current
+
+
+def remember_ticket_assignment(sender, instance, **kwargs):
+    """
+    Mémorise l'ancien client / technicien : une réassignation invalide aussi le périmètre
+    de l'ancien client ou technicien (et fait revérifier l'accès au chat, cf. signals).
+    """
+    instance._previous_client_id = instance._previous_technician_id = None
+    if not instance._state.adding:
+        instance._previous_client_id, instance._previous_technician_id = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('client_id', 'technician_id').first() or (None, None)
+
+
+CACHE_DEPENDENCIES = {
+    'tcikets.Ticket': ('tickets', ticket_namespaces),
+    'tcikets.TicketImage': ('tickets', ticket_child_namespaces),
+    'tcikets.Message': ('tickets', ticket_child_namespaces),
+    # TicketSerializer embarque les interventions du ticket
+    'tcikets.Intervention': ('interventions', 'tickets'),
+    'tcikets.InterventionImage': ('interventions',),
+    'tcikets.InterventionMaterial': ('interventions',),
+    'tcikets.InterventionExpense': ('interventions',),
+    'tcikets.Notification': (lambda notification: notifications_namespace(notification.user_id),),
+    'tcikets.Procedure': ('procedures',),
+    'tcikets.ProcedureImage': ('procedures',),
+    'tcikets.ProcedureAttachment': ('procedures',),
+    'tcikets.ProcedureTag': ('procedures',),
+    # Noms affichés dans les listes d'utilisateurs, de tickets et de procédures (auteur)
+    'tcikets.User': (user_namespaces,),
+    # TicketSerializer embarque les profils client / technicien ; 'users' : la société /
+    # spécialité fait partie du compte affiché (MeSerializer.get_profile)
+    'tcikets.Client': ('users', lambda client: user_ticket_namespaces(client.user_id)),
+    'tcikets.Technician': ('users', lambda technician: user_ticket_namespaces(technician.user_id)),
+}
+
+# Relations many-to-many : (modèle, champ) -> namespaces
+M2M_DEPENDENCIES = {
+    ('tcikets.Procedure', 'tags'): ('procedures',),
+    ('tcikets.Procedure', 'related_procedures'): ('procedures',),
+}
+
+
+def namespaces_for(instance, namespaces):
+    resolved = []
+    for namespace in namespaces:
+        if callable(namespace):
+            namespace = namespace(instance)
+        resolved.extend([namespace] if isinstance(namespace, str) else namespace)
+    return resolved
+
+
+def invalidate_on_commit(*namespaces):
+    """Invalide après le commit : une lecture concurrente ne peut pas remettre en cache l'ancien état."""
+    if namespaces:
+        transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+def register():
+    """Branche les signaux pour tous les modèles du registre (appelé depuis TciketsConfig.ready)."""
+    from django.apps import apps
+
+    pre_save.connect(
+        remember_ticket_assignment, sender=apps.get_model('tcikets.Ticket'),
+        dispatch_uid="cache_registry_ticket_assignment",
+    )
+    pre_save.connect(
+        remember_user_display, sender=apps.get_model('tcikets.User'),
+        dispatch_uid="cache_registry_user_display",
+    )
+
+    for label, namespaces in CACHE_DEPENDENCIES.items():
+        model = apps.get_model(label)
+
+        def on_write(sender, instance, namespaces=namespaces, **kwargs):
+            invalidate_on_commit(*namespaces_for(instance, namespaces))
+
+        post_save.connect(on_write, sender=model, weak=False, dispatch_uid=f"cache_registry_save_{label}")
+        post_delete.connect(on_write, sender=model, weak=False, dispatch_uid=f"cache_registry_delete_{label}")
+
+    for (label, field), namespaces in M2M_DEPENDENCIES.items():
+        through = getattr(apps.get_model(label), field).through
+
+        def on_m2m(sender, action, namespaces=namespaces, **kwargs):
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                invalidate_on_commit(*namespaces)
+
+        m2m_changed.connect(on_m2m, sender=through, weak=False, dispatch_uid=f"cache_registry_m2m_{label}_{field}")
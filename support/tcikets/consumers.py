@@ -3,21 +3,28 @@ import json
 import time
 import uuid
 import asyncio
-import base64
-import os
-from collections import defaultdict
 from datetime import datetime
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 from django.core.cache import cache
-from .models import Ticket, Message
+from .models import Ticket, Message, ChatAttachment
+from .serializers import ChatAttachmentSerializer
+from . import presence
 from django.contrib.auth.models import AnonymousUser
 
 # For rate limiting events
 TYPING_THROTTLE = 0.5  # seconds
-ONLINE_THROTTLE = 5.0  # seconds
-MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+# Resume after reconnect (?since=<timestamp>&since_id=<message id>)
+RESUME_BATCH_SIZE = 100
+RESUME_MAX_MESSAGES = 1000  # beyond this, the client reloads the thread over HTTP
+
+def room_group_name(ticket_id):
+    return f'ticket_{ticket_id}'
+
 
 def json_serialize(obj):
     """Convert UUID and datetime to JSON-serializable formats."""
@@ -28,9 +35,7 @@ def json_serialize(obj):
     raise TypeError(f"Type {type(obj)} not serializable")
 
 class TicketChatConsumer(AsyncWebsocketConsumer):
-    # Use Redis for distributed tracking in production
-    CACHE_PREFIX = "ticket_chat_"
-    CACHE_TIMEOUT = 86400  # 24 hours
+    # Presence is shared between workers through the cache, see presence.py
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -38,22 +43,13 @@ class TicketChatConsumer(AsyncWebsocketConsumer):
         self.ticket_id = None
         self.room_group_name = None
         self.last_typing_time = 0
-        self.last_online_time = 0
-
-    active_connections = defaultdict(set)  # ticket_id -> set of channel_names
-    user_channels = defaultdict(dict)  # user_id -> {ticket_id: channel_name}
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.user_id = None
-        self.ticket_id = None
-        self.room_group_name = None
-        self.last_typing_time = 0
-        self.last_online_time = 0
+        self.present = False
+        # (client user id, technician user id) of the ticket, set by the access check
+        self.ticket_user_ids = None
 
     async def connect(self):
         self.ticket_id = self.scope['url_route']['kwargs']['ticket_id']
-        self.room_group_name = f'ticket_{self.ticket_id}'
+        self.room_group_name = room_group_name(self.ticket_id)
         user = self.scope["user"]
 
         if isinstance(user, AnonymousUser):
@@ -62,11 +58,8 @@ class TicketChatConsumer(AsyncWebsocketConsumer):
 
         self.user_id = str(user.id)
 
+        # Decided once for the connection; re-checked only when the ticket is reassigned
         if await self.has_permission(user, self.ticket_id):
-            # Add to active connections
-            self.active_connections[self.ticket_id].add(self.channel_name)
-            self.user_channels[self.user_id][self.ticket_id] = self.channel_name
-
             # Join room group
             await self.channel_layer.group_add(
                 self.room_group_name,
@@ -74,26 +67,27 @@ class TicketChatConsumer(AsyncWebsocketConsumer):
             )
             
             await self.accept()
-            
-            # Notify others that this user is online
-            await self.notify_online(user)
+
+            # Register presence, send who is here, announce the change (coalesced)
+            await presence.touch(self.ticket_id, self.channel_name, user)
+            self.present = True
+            await self.send(text_data=json.dumps({
+                "type": "presence",
+                "users": await presence.snapshot(self.ticket_id),
+            }, default=json_serialize))
+            await presence.schedule_broadcast(self.channel_layer, self.ticket_id, self.room_group_name)
+
+            # Already in the group: nothing sent from now on is missed (duplicates share an id)
+            await self.send_missed_messages()
         else:
             await self.close()
 
     async def disconnect(self, close_code):
-        # Remove from active connections
-        if self.ticket_id and self.channel_name in self.active_connections.get(self.ticket_id, set()):
-            self.active_connections[self.ticket_id].discard(self.channel_name)
-            
-        if self.user_id and self.ticket_id in self.user_channels.get(self.user_id, {}):
-            del self.user_channels[self.user_id][self.ticket_id]
-            if not self.user_channels[self.user_id]:
-                del self.user_channels[self.user_id]
-        
-        # Notify others that this user is offline
-        user = self.scope["user"]
-        if not isinstance(user, AnonymousUser):
-            await self.notify_offline(user)
+        # Remove presence; others are notified only if this was the user's last connection
+        if self.present:
+            self.present = False
+            await presence.leave(self.ticket_id, self.channel_name)
+            await presence.schedule_broadcast(self.channel_layer, self.ticket_id, self.room_group_name)
             
         # Leave room group
         if self.room_group_name:
@@ -111,26 +105,36 @@ class TicketChatConsumer(AsyncWebsocketConsumer):
             if msg_type == "chat":
                 message = data.get("message", "")
                 message_id = data.get("id")
-                image_data = data.get("image")  # Base64 encoded image
+                # Images are uploaded over HTTP first (chat-attachments/), only the id comes here
+                attachment_id = data.get("attachment_id")
                 
                 # Save message to database
-                saved_message = await self.save_message(message, image_data, message_id)
-                
+                try:
+                    saved_message, attachment = await self.save_message(message, attachment_id, message_id)
+                except ChatAttachment.DoesNotExist:
+                    await self.send_error(message_id, "Attachment not found or already sent")
+                    saved_message = None
+                except Exception as e:
+                    print(f"Error saving message: {e}")
+                    await self.send_error(message_id, "Message could not be saved")
+                    saved_message = None
+
                 if saved_message:
                     # Prepare event data
                     event_data = {
                         "type": "chat_message",
                         "user_id": str(user.id),
                         "user_type": getattr(user, 'userType', 'client'),
-                        "message_id": message_id,
+                        "message_id": str(saved_message.id),
                         "timestamp": saved_message.timestamp.isoformat() if saved_message.timestamp else datetime.now().isoformat()
                     }
                     
                     # Add content or image URL to event data
                     if saved_message.content:
                         event_data["message"] = saved_message.content
-                    if saved_message.image:
-                        event_data["image_url"] = saved_message.image.url
+                    if attachment:
+                        event_data["attachment"] = attachment
+                        event_data["image_url"] = attachment["image_url"]
                     
                     await self.channel_layer.group_send(
                         self.room_group_name,
@@ -151,6 +155,10 @@ class TicketChatConsumer(AsyncWebsocketConsumer):
                         }
                     )
             elif msg_type == "ping":
+                # Heartbeat: refresh presence TTL (expired connections are announced as left)
+                if self.present:
+                    await presence.touch(self.ticket_id, self.channel_name, user)
+                    await presence.schedule_broadcast(self.channel_layer, self.ticket_id, self.room_group_name)
                 # Respond to ping with pong to keep connection alive
                 await self.send(text_data=json.dumps({"type": "pong", "timestamp": time.time()}))
         except json.JSONDecodeError:
@@ -173,141 +181,150 @@ class TicketChatConsumer(AsyncWebsocketConsumer):
             response_data["message"] = event["message"]
         if "image_url" in event:
             response_data["image_url"] = event["image_url"]
+        if "attachment" in event:
+            response_data["attachment"] = event["attachment"]
         
         await self.send(text_data=json.dumps(response_data, default=json_serialize))
        
     
-    async def user_online(self, event):
-        # Skip sending to the excluded channel (the user who went online)
-        if self.channel_name == event.get("exclude_channel"):
-            return
+    async def send_error(self, message_id, error):
+        """Tell the sender only; the client keeps its unsent text and can retry"""
+        await self.send(text_data=json.dumps({"type": "error", "id": message_id, "error": error}))
 
-        await self.send(text_data=json.dumps({
-            "type": "user_online",
-            "user_id": event["user_id"],
-            "user_name": event["user_name"],
-            "user_type": event["user_type"]
-        }, default=json_serialize))
-        
-    async def user_offline(self, event):
-        # Skip sending to the excluded channel (the user who went offline)
-        if self.channel_name == event.get("exclude_channel"):
+    async def send_missed_messages(self):
+        """Stream messages after the client's cursor, oldest first, in batches"""
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        since = query.get("since", [None])[0]
+        if not since:
+            return
+        since_id = query.get("since_id", [None])[0]
+        try:
+            # A "+" in the offset arrives as a space when the client did not encode it
+            since = parse_datetime(since.replace(" ", "+"))
+            since_id = uuid.UUID(since_id) if since_id else None
+        except ValueError:
+            # Well-formed but impossible date (month 13...) or bad id: invalid cursor
+            since = None
+        if since is None:
+            await self.send(text_data=json.dumps({"type": "history", "messages": [], "has_more": False, "reset": True}))
             return
 
-        await self.send(text_data=json.dumps({
-            "type": "user_offline",
-            "user_id": event["user_id"],
-            "user_name": event["user_name"],
-            "user_type": event["user_type"]
-        }, default=json_serialize))
+        sent = 0
+        while True:
+            batch = await self.get_messages_since(since, since_id, RESUME_BATCH_SIZE + 1)
+            has_more = len(batch) > RESUME_BATCH_SIZE
+            batch = batch[:RESUME_BATCH_SIZE]
+            sent += len(batch)
+            reset = has_more and sent >= RESUME_MAX_MESSAGES
+            await self.send(text_data=json.dumps({
+                "type": "history",
+                "messages": batch,
+                "has_more": has_more and not reset,
+                "reset": reset,
+            }, default=json_serialize))
+            if not has_more or reset:
+                return
+            since, since_id = batch[-1]["timestamp"], batch[-1]["id"]
 
-    # -----------------------------
-    # Helper methods
-    # -----------------------------
-    async def notify_online(self, user):
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "user_online",
-                "user_id": str(user.id),
-                "user_name": f"{user.first_name} {user.last_name}",
-                "user_type": getattr(user, 'userType', 'client'),
-                # Exclude self from online notification
-                "exclude_channel": self.channel_name
-            }
-        )
+    async def ticket_access_changed(self, event):
+        # Sent by signals.revalidate_chat_access when the ticket's client or technician changes
+        if not await self.has_permission(self.scope["user"], self.ticket_id):
+            await self.close(code=4403)
 
-    async def notify_offline(self, user):
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "user_offline",
-                "user_id": str(user.id),
-                "user_name": f"{user.first_name} {user.last_name}",
-                "user_type": getattr(user, 'userType', 'client'),
-                # Exclude self from offline notification
-                "exclude_channel": self.channel_name
-            }
-        )
+    async def presence_update(self, event):
+        # One coalesced event per room; sent as the user_online / user_offline frames clients know
+        for event_type, members in (("user_online", event["joined"]), ("user_offline", event["left"])):
+            for member in members:
+                if member["user_id"] == self.user_id:
+                    continue
+                await self.send(text_data=json.dumps({"type": event_type, **member}, default=json_serialize))
 
     # -----------------------------
     # Permissions
     # -----------------------------
     @database_sync_to_async
     def has_permission(self, user, ticket_id):
+        """
+        One query: profiles come preloaded with the user (JWTAuthMiddleware.get_user).
+        Also keeps the ticket's user ids for the cache invalidation of saved messages.
+        """
         try:
-            ticket = Ticket.objects.select_related(
-                'client', 'technician'
-            ).get(id=ticket_id)
-            
+            tickets = Ticket.objects.filter(id=ticket_id)
+
             # Admin users have access to all tickets
-            if getattr(user, 'is_staff', False) or getattr(user, 'userType', '') == 'admin':
-                return True
-                
-            # Client can access their own tickets
-            if hasattr(user, 'client_profile') and user.client_profile == ticket.client:
-                return True
-                
-            # Technician can access assigned tickets
-            if hasattr(user, 'technician_profile') and user.technician_profile == ticket.technician:
-                return True
-                
-            return False
-        except Ticket.DoesNotExist:
-            return False
+            if not (getattr(user, 'is_staff', False) or getattr(user, 'userType', '') == 'admin'):
+                # Client can access their own tickets, technician the assigned ones
+                client = getattr(user, 'client_profile', None)
+                technician = getattr(user, 'technician_profile', None)
+                if client is None and technician is None:
+                    return False
+                access = Q()
+                if client is not None:
+                    access |= Q(client_id=client.pk)
+                if technician is not None:
+                    access |= Q(technician_id=technician.pk)
+                tickets = tickets.filter(access)
+
+            self.ticket_user_ids = tickets.values_list('client__user_id', 'technician__user_id').first()
+            return self.ticket_user_ids is not None
         except Exception as e:
             print(f"Permission check error: {e}")
             return False
         
         
     @database_sync_to_async
-    def save_message(self, content, image_data=None, message_id=None):
-        """Save message to database, handling images if provided"""
+    def save_message(self, content, attachment_id=None, message_id=None):
+        """Save message to database, linking an uploaded attachment if referenced (rolled back if it is unavailable)"""
+        user = self.scope["user"]
+        # Access was checked on connect: written by ticket_id, no ticket reload
+        message = Message(id=message_id or uuid.uuid4(), ticket_id=self.ticket_id, user=user, content=content)
+        # Spares cache_registry a ticket lookup to find whose lists to invalidate
+        message._ticket_user_ids = self.ticket_user_ids
+        if not attachment_id:
+            message.save(force_insert=True)
+            return message, None
+
         try:
-            user = self.scope["user"]
-            ticket = Ticket.objects.get(id=self.ticket_id)
-            
-            message = Message(
-                id=message_id or uuid.uuid4(),
-                ticket=ticket,
-                user=user,
-                content=content
+            attachment_id = uuid.UUID(str(attachment_id))
+        except ValueError:
+            raise ChatAttachment.DoesNotExist(f"Invalid attachment id {attachment_id!r}")
+        with transaction.atomic():
+            message.save(force_insert=True)
+            # Only the uploader's own, not yet sent attachments of this ticket
+            attachment = ChatAttachment.objects.select_for_update().get(
+                id=attachment_id, ticket_id=self.ticket_id, uploaded_by=user, message__isnull=True
             )
-            
-            # Handle image data if provided
-            if image_data:
-                # Check if image data is a base64 string
-                if isinstance(image_data, str) and image_data.startswith('data:image'):
-                    format, imgstr = image_data.split(';base64,') 
-                    ext = format.split('/')[-1] 
-                    
-                    # Validate image size
-                    if len(imgstr) > MAX_IMAGE_SIZE * 1.37:  # Account for base64 overhead
-                        raise ValueError("Image too large")
-                    
-                    # Create ContentFile from base64 data
-                    data = ContentFile(
-                        base64.b64decode(imgstr), 
-                        name=f"{message.id}.{ext}"
-                    )
-                    message.image.save(f"{message.id}.{ext}", data, save=False)
-            
-            message.save()
-            return message
-        except Exception as e:
-            print(f"Error saving message: {e}")
-            return None
+            attachment.message = message
+            attachment.save(update_fields=['message'])
+        return message, dict(ChatAttachmentSerializer(attachment).data)
 
     @database_sync_to_async
-    def get_recent_messages(self, limit=50):
-        """Retrieve recent messages for the ticket"""
-        try:
-            messages = Message.objects.filter(
-                ticket_id=self.ticket_id
-            ).select_related('user').order_by('-timestamp')[:limit]
-            
-            # Convert to list in reverse order (oldest first)
-            return list(reversed(messages))
-        except Exception as e:
-            print(f"Error retrieving messages: {e}")
-            return []
+    def get_messages_since(self, since, since_id=None, limit=RESUME_BATCH_SIZE):
+        """Keyset page after (since, since_id) in (timestamp, id) order, uses the (ticket, timestamp) index"""
+        after = Q(timestamp__gt=since)
+        if since_id:
+            after |= Q(timestamp=since, id__gt=since_id)
+        messages = Message.objects.filter(after, ticket_id=self.ticket_id).select_related(
+            'user'
+        ).prefetch_related('attachments').order_by('timestamp', 'id')[:limit]
+        return [self.message_frame(message) for message in messages]
+
+    @staticmethod
+    def message_frame(message):
+        """Same shape as the live "chat" frames"""
+        frame = {
+            "type": "chat",
+            "id": message.id,
+            "user_id": str(message.user_id) if message.user_id else None,
+            "user_type": getattr(message.user, 'userType', None),
+            "timestamp": message.timestamp,
+        }
+        if message.content:
+            frame["message"] = message.content
+        attachments = list(message.attachments.all())
+        if attachments:
+            frame["attachment"] = dict(ChatAttachmentSerializer(attachments[0]).data)
+            frame["image_url"] = frame["attachment"]["image_url"]
+        elif message.image:
+            frame["image_url"] = message.image.url
+        return frame
@@ -12,6 +12,7 @@ from .serializers import (
     InterventionSerializer, InterventionCreateSerializer,
     UserSerializer,
     ProcedureSerializer,
+    ProcedureListSerializer,
     NotificationSerializer
 
 )
@@ -58,14 +59,20 @@ from django.shortcuts import get_object_or_404
 from .models import Ticket, Message
 from .serializers import TicketSerializer, MessageSerializer
 from .permissions import IsAdminOrOwner
+from .pagination import TicketCursorPagination, NotificationCursorPagination, MessageCursorPagination
+from . import view_counter
+from .response_cache import CachedResponseMixin, invalidate
+from .cache_registry import notifications_namespace
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TicketCursorPagination
+    cache_namespaces = ('tickets', 'interventions')
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -74,18 +81,13 @@ class TicketViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        cache_key = f"tickets_user_{user.id}_{getattr(user, 'userType', 'admin')}"
-
-        cached_qs = cache.get(cache_key)
-        if cached_qs is not None:
-            return cached_qs
-
         base_queryset = Ticket.objects.select_related(
             'client__user', 'technician__user'
         ).prefetch_related(
             'images',
             'interventions__technician__user',
-            'messages__user'
+            'messages__user',
+            'messages__attachments'
         )
 
         if getattr(user, 'userType', 'admin') == 'admin' or user.is_staff:
@@ -101,16 +103,7 @@ class TicketViewSet(viewsets.ModelViewSet):
                 except Technician.DoesNotExist:
                     qs = Ticket.objects.none()
 
-        cache.set(cache_key, qs, 300)  # 5 min
         return qs
-
-    def perform_create(self, serializer):
-        ticket = serializer.save()
-        # Invalider le cache
-        user = self.request.user
-        cache_key = f"tickets_user_{user.id}_{getattr(user, 'userType', 'admin')}"
-        cache.delete(cache_key)
-        return ticket
     
     
     @action(detail=True, methods=['get', 'post'])
@@ -130,11 +123,13 @@ class TicketViewSet(viewsets.ModelViewSet):
         if not has_permission:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
 
-        # ---------- GET messages ----------
+        # ---------- GET messages (paginés par curseur) ----------
         if request.method == 'GET':
-            messages = Message.objects.filter(ticket=ticket).order_by('timestamp')
-            serializer = MessageSerializer(messages, many=True, context={'request': request})
-            return Response(serializer.data)
+            messages = Message.objects.filter(ticket=ticket).select_related('user').prefetch_related('attachments')
+            paginator = MessageCursorPagination()
+            page = paginator.paginate_queryset(messages, request, view=self)
+            serializer = MessageSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
 
         # ---------- POST créer message ----------
         elif request.method == 'POST':
@@ -151,39 +146,49 @@ class TicketViewSet(viewsets.ModelViewSet):
             serializer = MessageSerializer(message, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class ProcedureListCreateView(generics.ListCreateAPIView):
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    serializer_class = ProcedureSerializer
+def visible_procedures(user, queryset=None):
+    """Procédures actives visibles : publiées, celles de l'auteur, et brouillons admin."""
+    queryset = Procedure.objects.filter(is_active=True) if queryset is None else queryset
+    if user.is_authenticated:
+        return queryset.filter(
+            Q(status='published') |
+            Q(author=user) |
+            (Q(status='draft') & Q(author__userType='admin'))
+        )
+    return queryset.filter(status='published')
 
-    def get_queryset(self):
-        cache_key = f"procedures_list_{self.request.user.id}_{self.request.user.is_authenticated}"
 
-        cached_qs = cache.get(cache_key)
-        if cached_qs is not None:
-            return cached_qs
+def procedure_list_queryset():
+    """
+    Queryset de la liste : colonnes lourdes différées (HTML, texte brut, vecteur),
+    une seule image de couverture par procédure, compteurs agrégés en SQL.
+    """
+    return Procedure.objects.filter(is_active=True).select_related(
+        'author'
+    ).defer(
+        'content', 'plain_text', 'search_vector'
+    ).prefetch_related(
+        'tags',
+        Prefetch(
+            'images',
+            queryset=ProcedureImage.objects.order_by('order', 'uploaded_at')[:1],
+            to_attr='cover_images'
+        ),
+    ).annotate(
+        images_count=Count('images', distinct=True),
+        attachments_count=Count('attachments', distinct=True)
+    )
 
-        queryset = Procedure.objects.filter(is_active=True).select_related(
-            'author'
-        ).prefetch_related(
-            'tags',
-            Prefetch('images', queryset=ProcedureImage.objects.order_by('order')),
-            'attachments'
-        ).annotate(
-            images_count=Count('images'),
-            attachments_count=Count('attachments')
-        )
 
-        if self.request.user.is_authenticated:
-            qs = queryset.filter(
-                Q(status='published') |
-                Q(author=self.request.user) |
-                (Q(status='draft') & Q(author__userType='admin'))
-            ).order_by('-created_at')
-        else:
-            qs = queryset.filter(status='published').order_by('-created_at')
+class ProcedureListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_namespaces = ('procedures',)
 
-        cache.set(cache_key, qs, 300)
-        return qs
+    def get_serializer_class(self):
+        return ProcedureSerializer if self.request.method == 'POST' else ProcedureListSerializer
+
+    def get_queryset(self):
+        return visible_procedures(self.request.user, procedure_list_queryset()).order_by('-created_at')
 
 
     def perform_create(self, serializer):
@@ -199,7 +204,6 @@ class ProcedureListCreateView(generics.ListCreateAPIView):
                     image.save()
                 except ProcedureImage.DoesNotExist:
                     continue
-                cache.delete(f"procedures_list_{self.request.user.id}_{self.request.user.is_authenticated}")
         return procedure
 
 class ProcedureRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
@@ -220,10 +224,9 @@ class ProcedureRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_object(self):
         obj = super().get_object()
-        # Incrémenter les vues de manière efficace
+        # Vue comptée dans un tampon (cf. view_counter), reportée en base par lots
         if self.request.method == 'GET':
-            Procedure.objects.filter(pk=obj.pk).update(views=F('views') + 1)
-            obj.refresh_from_db()
+            obj.views += view_counter.record_view(obj.pk, self.request)
         return obj
 
     def update(self, request, *args, **kwargs):
@@ -700,33 +703,27 @@ def procedure_interaction(request, procedure_id):
 
 
   
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(CachedResponseMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
 
-    def get_queryset(self):
-        cache_key = f"notifications_{self.request.user.id}_all"
-        cached_qs = cache.get(cache_key)
-        if cached_qs is not None:
-            return cached_qs
+    def get_cache_namespaces(self):
+        return (notifications_namespace(self.request.user.pk),)
 
-        qs = Notification.objects.filter(user=self.request.user).order_by('-created_at')
-        cache.set(cache_key, qs, 120)  # 2 min
-        return qs
+    def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
 
-class UnreadNotificationListView(generics.ListAPIView):
+class UnreadNotificationListView(CachedResponseMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
 
-    def get_queryset(self):
-        cache_key = f"notifications_{self.request.user.id}_unread"
-        cached_qs = cache.get(cache_key)
-        if cached_qs is not None:
-            return cached_qs
+    def get_cache_namespaces(self):
+        return (notifications_namespace(self.request.user.pk),)
 
-        qs = Notification.objects.filter(user=self.request.user, is_read=False).order_by('-created_at')
-        cache.set(cache_key, qs, 120)
-        return qs
+    def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user, is_read=False).order_by('-created_at')
     
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -736,10 +733,6 @@ def mark_notification_read(request, pk):
         notification.is_read = True
         notification.save()
 
-        # Invalider les caches
-        cache.delete(f"notifications_{request.user.id}_all")
-        cache.delete(f"notifications_{request.user.id}_unread")
-
         return Response({"message": "Notification marquée comme lue"}, status=status.HTTP_200_OK)
     except Notification.DoesNotExist:
         return Response({"error": "Notification non trouvée"}, status=status.HTTP_404_NOT_FOUND)
@@ -781,6 +774,8 @@ def mark_all_notifications_read(request):
         user=request.user, 
         is_read=False
     ).update(is_read=True)
+    # update() n'émet pas de signal : invalidation explicite
+    invalidate(notifications_namespace(request.user.pk))
     
     return Response({
         "message": f"{updated_count} notifications marquées comme lues"
@@ -823,6 +818,7 @@ class TechnicianViewSet(viewsets.ModelViewSet):
 class TicketViewSet(viewsets.ModelViewSet):
     queryset = Ticket.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TicketCursorPagination
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
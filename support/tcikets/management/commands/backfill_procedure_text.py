@@ -0,0 +1,32 @@
+# management/commands/backfill_procedure_text.py
+from django.core.management.base import BaseCommand
+from tcikets.models import Procedure, refresh_search_vector
+
+
+class Command(BaseCommand):
+    help = "Recalculer plain_text, aperçu, nombre de mots et temps de lecture des procédures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch, total = [], 0
+
+        for procedure in Procedure.objects.only('id', 'content').iterator(chunk_size=batch_size):
+            procedure.refresh_text_fields()
+            batch.append(procedure)
+            if len(batch) >= batch_size:
+                total += self._flush(batch)
+                batch = []
+        total += self._flush(batch)
+
+        # plain_text fait partie du vecteur de recherche
+        refresh_search_vector(Procedure)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} procédures mises à jour"))
+
+    def _flush(self, batch):
+        if batch:
+            Procedure.objects.bulk_update(batch, Procedure.TEXT_FIELDS)
+        return len(batch)
@@ -0,0 +1,75 @@
+# management/commands/benchmark_excel_export.py
+import os
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from support.utils.report_utils import export_monthly_report_excel
+from tcikets.models import Client, Intervention, Technician, Ticket, User
+
+
+class Command(BaseCommand):
+    help = "Mesurer la mémoire du rapport mensuel Excel (classeur en mémoire vs write_only) sur des interventions générées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+        parser.add_argument('--per-ticket', type=int, default=20, help="Interventions par ticket")
+
+    def handle(self, *args, **options):
+        # Tout est annulé à la fin : la base n'est pas modifiée
+        with transaction.atomic():
+            self.seed(options['count'], options['per_ticket'])
+            today = timezone.localdate()
+            interventions = Intervention.objects.filter(
+                intervention_date__year=today.year, intervention_date__month=today.month
+            ).order_by('intervention_date', 'start_time')
+            for label, write_only in (("classeur en mémoire", False), ("write_only (flux)", True)):
+                self.measure(label, interventions, today, write_only)
+            transaction.set_rollback(True)
+
+    def seed(self, count, per_ticket):
+        client = Client.objects.get(user=User.objects.create_user(
+            username='bench_client', email='bench_client@example.com', password='bench', userType='client'
+        ))
+        technician = Technician.objects.get(user=User.objects.create_user(
+            username='bench_tech', email='bench_tech@example.com', password='bench', userType='technician'
+        ))
+
+        tickets = Ticket.objects.bulk_create([
+            Ticket(code=f"BENCH-T{i}", title=f"Ticket {i}", description="Panne réseau",
+                   client=client, technician=technician)
+            for i in range(max(1, count // per_ticket))
+        ], batch_size=1000)
+
+        batch = []
+        for i in range(count):
+            batch.append(Intervention(
+                code=f"BENCH-I{i}", ticket=tickets[i % len(tickets)], technician=technician,
+                report="Remplacement du switch et tests de connectivité.",
+                hours_worked=Decimal('2.50'), travel_time=Decimal('0.75'),
+                transport_cost=Decimal('5000'), additional_costs=Decimal('1500'), total_cost=Decimal('42000'),
+                status='completed',
+            ))
+            if len(batch) == 5000:
+                Intervention.objects.bulk_create(batch)
+                batch = []
+        Intervention.objects.bulk_create(batch)
+        self.stdout.write(f"{count} interventions générées sur {len(tickets)} tickets")
+
+    def measure(self, label, interventions, today, write_only):
+        tracemalloc.start()
+        start = time.perf_counter()
+        report_file = export_monthly_report_excel(interventions, today.month, today.year, write_only=write_only)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        size = os.fstat(report_file.fileno()).st_size
+        report_file.close()
+        self.stdout.write(
+            f"{label:<22} pic {peak / 1024 / 1024:>8.1f} Mo  {elapsed:>7.1f} s  fichier {size / 1024:>8.0f} Ko"
+        )
@@ -0,0 +1,77 @@
+# management/commands/benchmark_procedure_list.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Prefetch
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from tcikets.extend_views import procedure_list_queryset
+from tcikets.models import Procedure, ProcedureImage, User
+from tcikets.serializers import ProcedureSerializer, ProcedureListSerializer
+
+
+def full_list_queryset():
+    """Ancienne liste : contenu complet, toutes les images / pièces jointes, procédures liées."""
+    return Procedure.objects.filter(is_active=True).select_related('author').prefetch_related(
+        'tags',
+        Prefetch('images', queryset=ProcedureImage.objects.order_by('order')),
+        'attachments',
+        'related_procedures__author',
+        'related_procedures__tags',
+    ).annotate(images_count=Count('images'), attachments_count=Count('attachments'))
+
+
+class Command(BaseCommand):
+    help = "Comparer taille et latence de la liste des procédures (complète vs allégée) sur des données générées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument('--content-kb', type=int, default=50)
+        parser.add_argument('--images', type=int, default=3)
+
+    def handle(self, *args, **options):
+        # Tout est annulé à la fin : la base n'est pas modifiée
+        with transaction.atomic():
+            self.seed(options['count'], options['content_kb'], options['images'])
+            for label, queryset, serializer_class in (
+                ("complète (ProcedureSerializer)", full_list_queryset(), ProcedureSerializer),
+                ("allégée (ProcedureListSerializer)", procedure_list_queryset(), ProcedureListSerializer),
+            ):
+                self.measure(label, queryset.order_by('-created_at'), serializer_class)
+            transaction.set_rollback(True)
+
+    def seed(self, count, content_kb, images):
+        author = User.objects.create_user(
+            username='bench_author', email='bench_author@example.com', password='bench', userType='admin'
+        )
+        paragraph = "<p>Redémarrer le routeur puis vérifier la configuration réseau.</p>"
+        content = paragraph * max(1, content_kb * 1024 // len(paragraph))
+
+        procedures = []
+        for i in range(count):
+            procedure = Procedure(
+                title=f"Procédure {i}", slug=f"bench-procedure-{i}", description="Description courte",
+                content=content, estimated_time="10 min", status='published', author=author,
+            )
+            procedure.refresh_text_fields()
+            procedures.append(procedure)
+        Procedure.objects.bulk_create(procedures, batch_size=200)
+
+        ProcedureImage.objects.bulk_create([
+            ProcedureImage(procedure=procedure, image=f"procedures/bench/{procedure.slug}-{n}.jpg", order=n)
+            for procedure in procedures for n in range(images)
+        ], batch_size=500)
+        self.stdout.write(f"{count} procédures générées ({content_kb} Ko de contenu, {images} images chacune)")
+
+    def measure(self, label, queryset, serializer_class):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            payload = JSONRenderer().render(serializer_class(queryset, many=True).data)
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{label:<36} {len(payload) / 1024:>10.0f} Ko  {elapsed * 1000:>8.0f} ms  "
+            f"{len(ctx.captured_queries):>4} requêtes"
+        )
@@ -0,0 +1,50 @@
+# management/commands/drain_outbox.py
+import select
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from tcikets import outbox
+
+
+class Command(BaseCommand):
+    help = "Worker de la boîte d'envoi : envoie les messages WhatsApp en attente, avec reprises"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Vider la file puis s'arrêter")
+        parser.add_argument('--sleep', type=float, default=5.0, help="Attente (s) maximale quand la file est vide")
+        parser.add_argument('--workers', type=int, default=None, help="Envois simultanés")
+
+    def handle(self, *args, **options):
+        self.stdout.write("📤 Worker de la boîte d'envoi démarré")
+        self.listening_on = None
+        while True:
+            close_old_connections()
+            requeued = outbox.requeue_stale_messages()
+            if requeued:
+                self.stdout.write(f"↩️ {requeued} message(s) abandonné(s) remis en file")
+
+            messages = outbox.drain(options['workers'])
+            if messages:
+                sent = sum(message.status == message.STATUS_SENT for message in messages)
+                self.stdout.write(f"{sent}/{len(messages)} message(s) envoyé(s)")
+                continue
+
+            if options['once']:
+                return
+            self.wait(options['sleep'])
+
+    def wait(self, timeout):
+        """Attend un NOTIFY (envoyé après le commit, cf. outbox.wake_worker) ou l'expiration."""
+        if connection.vendor != 'postgresql':
+            time.sleep(timeout)
+            return
+        connection.ensure_connection()
+        pg_connection = connection.connection
+        if self.listening_on is not pg_connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {outbox.NOTIFY_CHANNEL}")
+            self.listening_on = pg_connection
+        if select.select([pg_connection], [], [], timeout)[0]:
+            pg_connection.poll()
+            pg_connection.notifies.clear()
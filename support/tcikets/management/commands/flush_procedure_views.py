@@ -0,0 +1,11 @@
+# management/commands/flush_procedure_views.py
+from django.core.management.base import BaseCommand
+from tcikets import view_counter
+
+
+class Command(BaseCommand):
+    help = "Reporter les vues de procédures en tampon (Redis / mémoire) dans Procedure.views"
+
+    def handle(self, *args, **options):
+        flushed = view_counter.flush()
+        self.stdout.write(self.style.SUCCESS(f"✅ {flushed} vues reportées"))
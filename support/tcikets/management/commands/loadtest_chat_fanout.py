@@ -0,0 +1,138 @@
+# management/commands/loadtest_chat_fanout.py
+import asyncio
+import math
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _listen(settings_module, group, expected, timeout, ready, results):
+    """Processus "worker ASGI" : s'abonne au groupe et mesure le délai de chaque message reçu."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+
+    django.setup()
+
+    async def run():
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add(group, channel)
+        ready.put(os.getpid())
+        latencies = []
+        deadline = time.monotonic() + timeout
+        try:
+            while len(latencies) < expected:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(layer.receive(channel), remaining)
+                except asyncio.TimeoutError:
+                    break
+                latencies.append((time.time() - message['sent_at']) * 1000)
+        finally:
+            await layer.group_discard(group, channel)
+        return latencies
+
+    results.put((os.getpid(), asyncio.run(run())))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * pct / 100) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge du chat : plusieurs processus abonnés au même salon via la couche "
+        "de messages configurée, mesure du délai de diffusion des group_send"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Processus abonnés (workers ASGI simulés)")
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--rate', type=float, default=200.0, help="Messages envoyés par seconde")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Attente maximale (s) côté abonnés")
+        parser.add_argument('--max-p95-ms', type=float, default=None, help="Échec si le p95 dépasse ce seuil")
+
+    def handle(self, *args, **options):
+        if isinstance(get_channel_layer(), InMemoryChannelLayer):
+            raise CommandError(
+                "Couche en mémoire : aucune diffusion entre processus. Définir CHANNEL_REDIS_URLS (ou REDIS_URL en production)."
+            )
+
+        workers, count = options['workers'], options['messages']
+        # Groupe propre au test, au même format que les salons (cf. TicketChatConsumer)
+        group = f"ticket_loadtest_{uuid.uuid4().hex[:8]}"
+        context = multiprocessing.get_context('spawn')
+        ready, results = context.Queue(), context.Queue()
+        processes = [
+            context.Process(
+                target=_listen,
+                args=(os.environ['DJANGO_SETTINGS_MODULE'], group, count, options['timeout'], ready, results),
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            for _ in processes:
+                ready.get(timeout=60)
+            self.stdout.write(f"{workers} abonné(s) au groupe {group}, envoi de {count} messages...")
+            sent_in = asyncio.run(self.publish(group, count, options['rate']))
+
+            received = {}
+            for _ in processes:
+                pid, latencies = results.get(timeout=options['timeout'] + 30)
+                received[pid] = latencies
+        except queue.Empty:
+            raise CommandError("Un processus abonné n'a pas répondu à temps")
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+        self.report(received, count, sent_in, options['max_p95_ms'])
+
+    async def publish(self, group, count, rate):
+        layer = get_channel_layer()
+        interval = 1 / rate if rate > 0 else 0
+        start = time.monotonic()
+        for seq in range(count):
+            await layer.group_send(group, {'type': 'chat_message', 'seq': seq, 'sent_at': time.time()})
+            delay = start + (seq + 1) * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return time.monotonic() - start
+
+    def report(self, received, count, sent_in, max_p95_ms):
+        self.stdout.write(f"Envoi terminé en {sent_in:.2f} s ({count / sent_in:.0f} msg/s)")
+        all_latencies = []
+        missing = 0
+        for pid, latencies in sorted(received.items()):
+            missing += count - len(latencies)
+            all_latencies.extend(latencies)
+            line = f"  processus {pid}: {len(latencies)}/{count} reçus"
+            if latencies:
+                line += f", p50 {percentile(latencies, 50):.1f} ms, p95 {percentile(latencies, 95):.1f} ms"
+            self.stdout.write(line)
+
+        if not all_latencies:
+            raise CommandError("Aucun message reçu")
+        p95 = percentile(all_latencies, 95)
+        self.stdout.write(
+            f"Diffusion : p50 {percentile(all_latencies, 50):.1f} ms, p95 {p95:.1f} ms, "
+            f"p99 {percentile(all_latencies, 99):.1f} ms, max {max(all_latencies):.1f} ms"
+        )
+        if missing:
+            raise CommandError(f"{missing} message(s) non reçu(s)")
+        if max_p95_ms is not None and p95 > max_p95_ms:
+            raise CommandError(f"p95 {p95:.1f} ms > seuil {max_p95_ms:.0f} ms")
+        self.stdout.write(self.style.SUCCESS("Tous les abonnés ont reçu tous les messages"))
@@ -0,0 +1,31 @@
+# management/commands/purge_chat_attachments.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tcikets.models import ChatAttachment
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprimer les images du chat téléversées mais jamais envoyées dans un message "
+        "(onglet fermé, envoi refusé) : fichier et ligne"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help="Âge minimal (h) d'une image non envoyée")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        orphans = ChatAttachment.objects.filter(message__isnull=True, uploaded_at__lt=cutoff)
+        deleted = 0
+        for attachment in orphans.iterator():
+            # Ligne d'abord, et seulement si elle n'a pas été envoyée entre-temps
+            if not ChatAttachment.objects.filter(pk=attachment.pk, message__isnull=True).delete()[0]:
+                continue
+            deleted += 1
+            try:
+                attachment.image.delete(save=False)
+            except Exception as e:
+                self.stderr.write(f"Suppression du fichier de {attachment.id} impossible: {e}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {deleted} image(s) non envoyée(s) supprimée(s)"))
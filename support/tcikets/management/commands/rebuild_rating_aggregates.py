@@ -0,0 +1,34 @@
+# management/commands/rebuild_rating_aggregates.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from tcikets.models import Client, Technician, ClientRating, TechnicianRating
+
+
+def rebuild_rating_aggregates(profile_model, rating_model, fk_name):
+    """Recalcule rating_sum / rating_count de tous les profils en un seul UPDATE."""
+    ratings = rating_model.objects.filter(**{fk_name: OuterRef('pk')}).order_by().values(fk_name)
+    return profile_model.objects.update(
+        rating_sum=Coalesce(
+            Subquery(ratings.annotate(total=Sum('rating')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ),
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = "Recalculer les agrégats de notes (rating_sum / rating_count) des techniciens et clients"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            technicians = rebuild_rating_aggregates(Technician, TechnicianRating, 'technician')
+            clients = rebuild_rating_aggregates(Client, ClientRating, 'client')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Agrégats recalculés : {technicians} techniciens, {clients} clients"
+        ))
@@ -0,0 +1,22 @@
+# management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from django.db import connection
+from tcikets.models import Ticket, Procedure, refresh_search_vector
+
+
+class Command(BaseCommand):
+    help = "Recalculer les colonnes search_vector (tickets, procédures) — PostgreSQL uniquement"
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                "⚠️ Base non PostgreSQL : la recherche utilise icontains, rien à reconstruire"
+            ))
+            return
+
+        tickets = refresh_search_vector(Ticket)
+        procedures = refresh_search_vector(Procedure)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Index de recherche reconstruit : {tickets} tickets, {procedures} procédures"
+        ))
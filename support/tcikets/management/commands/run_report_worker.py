@@ -0,0 +1,46 @@
+# management/commands/run_report_worker.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from support.utils.pdf_renderer import renderer, warm_up_renderer
+from tcikets import report_jobs
+
+
+class Command(BaseCommand):
+    help = "Worker des rapports PDF : traite la file ReportJob en dehors des workers gunicorn"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Vider la file puis s'arrêter")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Attente (s) quand la file est vide")
+
+    def handle(self, *args, **options):
+        self.stdout.write("🧾 Worker des rapports démarré")
+        # Polices et CSS prêtes avant la première tâche
+        warm_up_renderer()
+        while True:
+            close_old_connections()
+            requeued = report_jobs.requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"↩️ {requeued} tâche(s) abandonnée(s) remise(s) en file")
+
+            job = report_jobs.process_next_job()
+            if job is not None:
+                self.stdout.write(f"{job.kind} {job.object_id} → {job.status}")
+                continue
+
+            if options['once']:
+                self.write_stats()
+                return
+            time.sleep(options['sleep'])
+
+    def write_stats(self):
+        stats = renderer.stats()
+        if stats['warm_up_ms'] is not None:
+            self.stdout.write(f"Initialisation du moteur PDF: {stats['warm_up_ms']:.0f} ms")
+        for phase in ('template', 'layout', 'write'):
+            timing = stats[phase]
+            if timing['count']:
+                self.stdout.write(
+                    f"{phase:<9} {timing['count']:>5} rendus  moy. {timing['avg_ms']:>7.1f} ms  max {timing['max_ms']:>7.1f} ms"
+                )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0010_alter_user_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='intervention',
+            index=models.Index(fields=['-created_at', 'id'], name='tcikets_int_created_8e33f7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='tcikets_not_user_id_28e197_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-created_at', 'id'], name='tcikets_tic_created_9c2bc5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['client', '-created_at'], name='tcikets_tic_client__e1f106_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['technician', '-created_at'], name='tcikets_tic_technic_b1309f_idx'),
+        ),
+    ]
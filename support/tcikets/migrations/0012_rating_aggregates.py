@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:06
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    for profile_name, rating_name, fk_name in (
+        ('Technician', 'TechnicianRating', 'technician'),
+        ('Client', 'ClientRating', 'client'),
+    ):
+        profile_model = apps.get_model('tcikets', profile_name)
+        rating_model = apps.get_model('tcikets', rating_name)
+        ratings = rating_model.objects.filter(**{fk_name: OuterRef('pk')}).order_by().values(fk_name)
+        profile_model.objects.update(
+            rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total'), output_field=IntegerField()), Value(0)),
+            rating_count=Coalesce(Subquery(ratings.annotate(total=Count('id')).values('total'), output_field=IntegerField()), Value(0)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0011_ticket_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='technician',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='technician',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
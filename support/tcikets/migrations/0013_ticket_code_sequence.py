@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:06
+
+import re
+
+from django.db import migrations, models
+
+
+def seed_sequences_from_codes(apps, schema_editor):
+    """Initialise chaque compteur annuel au plus grand numéro déjà attribué."""
+    Ticket = apps.get_model('tcikets', 'Ticket')
+    TicketCodeSequence = apps.get_model('tcikets', 'TicketCodeSequence')
+    pattern = re.compile(r'^TKT-N(\d+)-(\d{4})$')
+    last_values = {}
+    for code in Ticket.objects.values_list('code', flat=True).iterator():
+        match = pattern.match(code or '')
+        if match:
+            number, year = int(match.group(1)), int(match.group(2))
+            last_values[year] = max(number, last_values.get(year, 0))
+    TicketCodeSequence.objects.bulk_create([
+        TicketCodeSequence(year=year, last_value=last_value)
+        for year, last_value in last_values.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0012_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketCodeSequence',
+            fields=[
+                ('year', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences_from_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:09
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Index spécifiques PostgreSQL : créés hors Meta.indexes pour que SQLite (dev) migre sans erreur.
+SEARCH_INDEXES = [
+    # Plein texte
+    ("tcikets_ticket_search_gin", "tcikets_ticket USING gin (search_vector)"),
+    ("tcikets_procedure_search_gin", "tcikets_procedure USING gin (search_vector)"),
+    # Préfixes (istartswith => UPPER(col::text) LIKE UPPER('q%'))
+    ("tcikets_ticket_code_trgm", "tcikets_ticket USING gin (UPPER(code::text) gin_trgm_ops)"),
+    ("tcikets_intervention_code_trgm", "tcikets_intervention USING gin (UPPER(code::text) gin_trgm_ops)"),
+    ("tcikets_user_username_trgm", "tcikets_user USING gin (UPPER(username::text) gin_trgm_ops)"),
+    ("tcikets_user_email_trgm", "tcikets_user USING gin (UPPER(email::text) gin_trgm_ops)"),
+]
+
+BACKFILL = [
+    """
+    UPDATE tcikets_ticket SET search_vector =
+        setweight(to_tsvector('french', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('french', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('french', coalesce(tags, '')), 'C')
+    """,
+    """
+    UPDATE tcikets_procedure SET search_vector =
+        setweight(to_tsvector('french', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('french', coalesce(description, '')), 'B')
+    """,
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for statement in BACKFILL:
+        schema_editor.execute(statement)
+    for name, definition in SEARCH_INDEXES:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0013_ticket_code_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procedure',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:30
+
+from django.db import migrations
+
+# Typeahead (search/suggest/) : icontains => UPPER(col::text) LIKE UPPER('%q%'), servi par pg_trgm.
+# Le code ticket/intervention est déjà indexé par 0014.
+TITLE_INDEXES = [
+    ("tcikets_ticket_title_trgm", "tcikets_ticket USING gin (UPPER(title::text) gin_trgm_ops)"),
+    ("tcikets_procedure_title_trgm", "tcikets_procedure USING gin (UPPER(title::text) gin_trgm_ops)"),
+]
+
+
+def create_title_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, definition in TITLE_INDEXES:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def drop_title_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TITLE_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0014_ticket_procedure_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_indexes, drop_title_indexes),
+    ]
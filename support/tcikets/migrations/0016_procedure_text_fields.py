@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:12
+
+from html import unescape
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+def backfill_text_fields(apps, schema_editor):
+    """Calcule plain_text / aperçu / mots / temps de lecture des procédures existantes."""
+    Procedure = apps.get_model('tcikets', 'Procedure')
+    batch = []
+    for procedure in Procedure.objects.only('id', 'content').iterator(chunk_size=500):
+        content = procedure.content or ''
+        plain_text = ' '.join(unescape(strip_tags(content)).split())
+        procedure.plain_text = plain_text
+        procedure.word_count = len(plain_text.split())
+        procedure.reading_time_minutes = max(1, round(procedure.word_count / 200)) if content else 0
+        procedure.content_preview = plain_text[:200] + "..." if len(plain_text) > 200 else plain_text
+        batch.append(procedure)
+    Procedure.objects.bulk_update(
+        batch, ['plain_text', 'content_preview', 'word_count', 'reading_time_minutes'], batch_size=500
+    )
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("""
+            UPDATE tcikets_procedure SET search_vector =
+                setweight(to_tsvector('french', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('french', coalesce(description, '')), 'B') ||
+                setweight(to_tsvector('french', coalesce(plain_text, '')), 'C')
+        """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0015_title_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procedure',
+            name='content_preview',
+            field=models.CharField(blank=True, default='', editable=False, max_length=205),
+        ),
+        migrations.AddField(
+            model_name='procedure',
+            name='plain_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='procedure',
+            name='reading_time_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='procedure',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_text_fields, migrations.RunPython.noop),
+    ]
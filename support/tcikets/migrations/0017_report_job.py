@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:19
+
+import django.db.models.deletion
+import tcikets.models
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0016_procedure_text_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('intervention_pdf', "Rapport d'intervention (PDF)")], max_length=30)),
+                ('object_id', models.UUIDField()),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='queued', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('file', models.FileField(blank=True, max_length=500, storage=tcikets.models.report_storage, upload_to=tcikets.models.report_file_path)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='tcikets_rep_status_27e6f8_idx'), models.Index(fields=['kind', 'object_id', '-created_at'], name='tcikets_rep_kind_45978c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0017_report_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
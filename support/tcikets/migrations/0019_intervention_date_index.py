@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0018_report_job_cache_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='intervention',
+            index=models.Index(fields=['intervention_date', 'start_time'], name='tcikets_int_interve_7c310a_idx'),
+        ),
+    ]
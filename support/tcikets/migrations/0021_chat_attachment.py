@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:54
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0020_outbox_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatAttachment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('image', models.ImageField(max_length=500, upload_to='chat_attachments/%Y/%m/%d/')),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('file_size', models.PositiveIntegerField(blank=True, null=True)),
+                ('file_extension', models.CharField(blank=True, default='', max_length=10)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='tcikets.message')),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_attachments', to='tcikets.ticket')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_attachments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tcikets', '0021_chat_attachment'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='kind',
+            field=models.CharField(choices=[('intervention_pdf', "Rapport d'intervention (PDF)"), ('tickets_pdf', 'Export de tickets (PDF)'), ('tickets_pdf_zip', 'Export de tickets (archive de PDF)')], max_length=30),
+        ),
+    ]
@@ -3,7 +3,8 @@ from io import BytesIO
 from PIL import Image as PILImage
 from io import BytesIO
 from django.core.files.base import ContentFile
-from django.db import models
+from django.db import connection, models
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
@@ -11,6 +12,8 @@ from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.text import slugify
+from django.utils.html import strip_tags
+from html import unescape
 from django_ckeditor_5.fields import CKEditor5Field
 from cloudinary import CloudinaryImage
 from decimal import Decimal
@@ -22,6 +25,42 @@ phone_regex = RegexValidator(
     message="Téléphone au format +242055506688 (8-15 chiffres)."
 )
 
+# ------------------------------------------------------------------
+# RECHERCHE PLEIN TEXTE (PostgreSQL uniquement, cf. search_backends.py)
+# ------------------------------------------------------------------
+SEARCH_CONFIG = 'french'
+
+
+def build_search_vector(weighted_fields):
+    vector = None
+    for field, weight in weighted_fields:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def refresh_search_vector(model, queryset=None):
+    """
+    Recalcule la colonne search_vector en un seul UPDATE.
+    Sans effet hors PostgreSQL : le backend SQLite se contente d'icontains.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    queryset = model.objects.all() if queryset is None else queryset
+    return queryset.update(search_vector=build_search_vector(model.SEARCH_FIELDS))
+
+
+def _touches_search_fields(model, update_fields):
+    return update_fields is None or any(field in update_fields for field, _ in model.SEARCH_FIELDS)
+
+
+def html_to_text(value):
+    """Texte brut d'un contenu HTML (balises retirées, entités décodées, espaces normalisés)."""
+    if not value:
+        return ''
+    return ' '.join(unescape(strip_tags(value)).split())
+
+
 # ------------------------------------------------------------------
 # PATHS CLOUDINARY
 # ------------------------------------------------------------------
@@ -129,15 +168,15 @@ class Client(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='client_profile')
     company = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Agrégats des notes reçues, maintenus par les signaux de ClientRating
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
 
     def average_rating(self):
-        from .models import ClientRating
-        ratings = ClientRating.objects.filter(client=self)
-        return (sum(r.rating for r in ratings) / ratings.count()) if ratings.exists() else 0
+        return self.rating_sum / self.rating_count if self.rating_count else 0
 
     def total_ratings(self):
-        from .models import ClientRating
-        return ClientRating.objects.filter(client=self).count()
+        return self.rating_count
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.company}"
@@ -154,15 +193,15 @@ class Technician(models.Model):
                  ('network', 'Réseau'), ('security', 'Sécurité')]
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Agrégats des notes reçues, maintenus par les signaux de TechnicianRating
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
 
     def average_rating(self):
-        from .models import TechnicianRating
-        ratings = TechnicianRating.objects.filter(technician=self)
-        return (sum(r.rating for r in ratings) / ratings.count()) if ratings.exists() else 0
+        return self.rating_sum / self.rating_count if self.rating_count else 0
 
     def total_ratings(self):
-        from .models import TechnicianRating
-        return TechnicianRating.objects.filter(technician=self).count()
+        return self.rating_count
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.get_specialty_display()}"
@@ -227,14 +266,32 @@ class Procedure(models.Model):
     featured = models.BooleanField(default=False, db_index=True)
     tags = models.ManyToManyField(ProcedureTag, related_name='procedures', blank=True)
     related_procedures = models.ManyToManyField('self', symmetrical=True, blank=True)
-    
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Dérivés de `content`, calculés à l'enregistrement (cf. refresh_text_fields)
+    plain_text = models.TextField(blank=True, default='', editable=False)
+    content_preview = models.CharField(max_length=205, blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time_minutes = models.PositiveIntegerField(default=0, editable=False)
+
+    SEARCH_FIELDS = (('title', 'A'), ('description', 'B'), ('plain_text', 'C'))
+    TEXT_FIELDS = ('plain_text', 'content_preview', 'word_count', 'reading_time_minutes')
+    PREVIEW_LENGTH = 200
+    WORDS_PER_MINUTE = 200
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = self._generate_unique_slug()
         if not self.meta_description and self.description:
             self.meta_description = self.description[:157] + "..."
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.refresh_text_fields()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.TEXT_FIELDS}
         super().save(*args, **kwargs)
+        if _touches_search_fields(Procedure, kwargs.get('update_fields')):
+            refresh_search_vector(Procedure, Procedure.objects.filter(pk=self.pk))
 
     def _generate_unique_slug(self):
         slug = slugify(self.title)
@@ -245,13 +302,17 @@ class Procedure(models.Model):
             counter += 1
         return slug
 
+    def refresh_text_fields(self):
+        """Extrait le texte brut du HTML CKEditor une fois pour toutes (aperçu, mots, lecture)."""
+        self.plain_text = html_to_text(self.content)
+        self.word_count = len(self.plain_text.split())
+        self.reading_time_minutes = max(1, round(self.word_count / self.WORDS_PER_MINUTE)) if self.content else 0
+        preview = self.plain_text[:self.PREVIEW_LENGTH]
+        self.content_preview = preview + "..." if len(self.plain_text) > self.PREVIEW_LENGTH else preview
+
     @property
     def reading_time(self):
-        import re
-        if not self.content:
-            return 1
-        plain_text = re.sub(r'<.*?>', '', self.content)
-        return max(1, round(len(plain_text.split()) / 200))
+        return max(1, self.reading_time_minutes)
 
     def __str__(self):
         return self.title
@@ -394,14 +455,29 @@ class Ticket(models.Model):
     tags = models.CharField(max_length=100, blank=True, null=True)
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='tickets')
     technician = models.ForeignKey(Technician, on_delete=models.SET_NULL, null=True, blank=True, related_name='tickets')
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    SEARCH_FIELDS = (('title', 'A'), ('description', 'B'), ('tags', 'C'))
 
     def save(self, *args, **kwargs):
         if not self.code:
-            year = timezone.now().year
-            last = Ticket.objects.filter(code__endswith=f"-{year}").order_by('created_at').last()
-            num = (int(last.code.split('-')[1][1:]) + 1) if last else 1
-            self.code = f"TKT-N{num:03d}-{year}"
+            self.code = Ticket.reserve_codes(1)[0]
         super().save(*args, **kwargs)
+        if _touches_search_fields(Ticket, kwargs.get('update_fields')):
+            refresh_search_vector(Ticket, Ticket.objects.filter(pk=self.pk))
+
+    @staticmethod
+    def format_code(number, year):
+        return f"TKT-N{number:03d}-{year}"
+
+    @classmethod
+    def reserve_codes(cls, count, year=None):
+        """
+        Réserve `count` codes consécutifs (ex. pour un import en bulk_create).
+        Une seule requête sur TicketCodeSequence (cf. reserve), sans parcourir la table des tickets.
+        """
+        year = year or timezone.now().year
+        return [cls.format_code(number, year) for number in TicketCodeSequence.reserve(year, count)]
 
     def __str__(self):
         return f"{self.title} ({self.status})"
@@ -412,11 +488,45 @@ class Ticket(models.Model):
             models.Index(fields=['client', 'status']),
             models.Index(fields=['technician', 'status']),
             models.Index(fields=['-created_at']),
+            # Pagination par curseur (keyset) sur (-created_at, id)
+            models.Index(fields=['-created_at', 'id']),
+            models.Index(fields=['client', '-created_at']),
+            models.Index(fields=['technician', '-created_at']),
         ]
         ordering = ['-created_at']
 
 
 
+class TicketCodeSequence(models.Model):
+    """Compteur annuel des codes ticket TKT-N###-YYYY (une ligne par année)."""
+    year = models.PositiveIntegerField(primary_key=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, year, count=1):
+        """
+        Incrémente le compteur de `count` et retourne les numéros réservés, en une seule
+        requête : INSERT ... ON CONFLICT DO UPDATE ... RETURNING (PostgreSQL, SQLite
+        >= 3.35) crée la ligne de l'année au besoin. La ligne reste verrouillée jusqu'au
+        commit : deux créations simultanées ne peuvent pas obtenir le même numéro.
+        """
+        if count < 1:
+            raise ValueError("count must be >= 1")
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (year, last_value) VALUES (%s, %s) "
+                f"ON CONFLICT (year) DO UPDATE SET last_value = {table}.last_value + EXCLUDED.last_value "
+                f"RETURNING last_value",
+                [year, count],
+            )
+            last = cursor.fetchone()[0]
+        return range(last - count + 1, last + 1)
+
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+
 '''class Message(models.Model):
     WHATSAPP_STATUS_CHOICES = [('pending', 'En attente'), ('sent', 'Envoyé'), ('delivered', 'Livré'), ('failed', 'Échec'), ('read', 'Lu')]
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -677,6 +787,9 @@ class Intervention(models.Model):
             models.Index(fields=['ticket', '-intervention_date']),
             models.Index(fields=['technician', 'status']),
             models.Index(fields=['status', '-intervention_date']),
+            models.Index(fields=['-created_at', 'id']),
+            # Rapport mensuel : plage de dates, dans l'ordre du rapport
+            models.Index(fields=['intervention_date', 'start_time']),
         ]
         ordering = ['-intervention_date', '-created_at']
     
@@ -822,7 +935,111 @@ class InterventionExpense(models.Model):
     
     def __str__(self):
         return f"{self.expense_type} - {self.amount}"
-    
+
+
+# ------------------------------------------------------------------
+# RAPPORTS GÉNÉRÉS EN ARRIÈRE-PLAN (cf. report_jobs.py)
+# ------------------------------------------------------------------
+def report_storage():
+    # Alias STORAGES["reports"], résolu dès l'import : ne doit pas exiger d'identifiants
+    # (disque local hors production, cf. settings)
+    from django.core.files.storage import storages
+    return storages["reports"]
+
+
+def report_file_path(instance, filename):
+    return f"reports/{instance.kind}/{timezone.now():%Y/%m}/{filename}"
+
+
+class ReportJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'En attente'), (STATUS_RUNNING, 'En cours'),
+        (STATUS_DONE, 'Terminé'), (STATUS_FAILED, 'Échec'),
+    ]
+    KIND_CHOICES = [
+        ('intervention_pdf', "Rapport d'intervention (PDF)"),
+        # Export de plusieurs tickets d'un client (object_id = utilisateur), cf. ExportTicketPDFView
+        ('tickets_pdf', "Export de tickets (PDF)"),
+        ('tickets_pdf_zip', "Export de tickets (archive de PDF)"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    object_id = models.UUIDField()
+    params = models.JSONField(default=dict, blank=True)
+    # Révision rendue (cf. report_jobs.intervention_revision) : sert d'ETag et de clé de cache
+    cache_key = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    file = models.FileField(upload_to=report_file_path, storage=report_storage, max_length=500, blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Prise de tâche par le worker : plus ancienne en attente
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['kind', 'object_id', '-created_at']),
+        ]
+        ordering = ['-created_at']
+
+
+class OutboxMessage(models.Model):
+    """
+    Message sortant (WhatsApp) écrit dans la même transaction que l'événement qui le
+    déclenche, envoyé ensuite par `manage.py drain_outbox` : la requête ne dépend plus
+    des fournisseurs externes.
+    """
+    CHANNEL_CALLMEBOT = 'callmebot'
+    CHANNEL_TWILIO_WHATSAPP = 'twilio_whatsapp'
+    CHANNEL_CHOICES = [
+        (CHANNEL_CALLMEBOT, 'WhatsApp (CallMeBot)'),
+        (CHANNEL_TWILIO_WHATSAPP, 'WhatsApp (Twilio)'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'), (STATUS_SENDING, 'En cours'),
+        (STATUS_SENT, 'Envoyé'), (STATUS_FAILED, 'Échec'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=30)
+    body = models.TextField()
+    ticket = models.ForeignKey(Ticket, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbox_messages')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.channel} -> {self.recipient} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Prise des messages par le worker : en attente et dus
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        ordering = ['-created_at']
+
 
 
 # models.py
@@ -859,6 +1076,83 @@ class Message(models.Model):
 
     def __str__(self):
         return f"{self.user}: {self.content[:50] if self.content else 'Image message'}"
+
+
+class ChatAttachment(models.Model):
+    """
+    Image du chat : téléversée en HTTP (ChatAttachmentUploadView) avant l'envoi du
+    message, la trame WebSocket ne porte que son id. Les miniatures sont des
+    transformations Cloudinary, calculées par Cloudinary à la première demande.
+    Les images jamais envoyées sont supprimées par `purge_chat_attachments`.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='chat_attachments')
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_attachments')
+    # Renseigné quand le message qui la référence est enregistré
+    message = models.ForeignKey(
+        Message, on_delete=models.CASCADE, related_name='attachments', null=True, blank=True
+    )
+    image = models.ImageField(upload_to='chat_attachments/%Y/%m/%d/', max_length=500)
+
+    # Métadonnées
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    file_size = models.PositiveIntegerField(null=True, blank=True)
+    file_extension = models.CharField(max_length=10, blank=True, default='')
+
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        if self.image and is_new:
+            try:
+                name = getattr(self.image, 'name', '')
+                _, ext = os.path.splitext(name)
+                self.file_extension = ext.lower() if ext else '.png'
+
+                # PIL ne lit que l'en-tête pour la taille
+                self.image.seek(0)
+                img = PILImage.open(self.image)
+                self.width, self.height = img.size
+                self.file_size = self.image.size
+                self.image.seek(0)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"ChatAttachment metadata error: {e}")
+        super().save(*args, **kwargs)
+
+    def _get_cloudinary_public_id(self):
+        if not self.image:
+            return None
+        path = str(self.image)
+        return re.sub(r'\.[^.]+$', '', path)
+
+    def _get_file_extension(self):
+        if self.file_extension:
+            return self.file_extension if self.file_extension.startswith('.') else f'.{self.file_extension}'
+        return '.png'
+
+    def get_image_url(self, **transformations):
+        if not self.image:
+            return None
+        public_id = self._get_cloudinary_public_id()
+        ext = self._get_file_extension()
+        try:
+            return CloudinaryImage(f"{public_id}{ext}").build_url(**transformations)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Cloudinary URL error: {e}")
+            return self.image.url
+
+    @property
+    def image_url(self):
+        return self.get_image_url()
+
+    @property
+    def thumbnail_url(self):
+        return self.get_image_url(width=320, height=320, crop='limit', quality='auto', fetch_format='auto')
+
+    def __str__(self):
+        return f"Attachment {self.id} ({self.ticket_id})"
     
     
     
@@ -907,6 +1201,9 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
         ordering = ['-created_at']
         
     def __str__(self):
@@ -0,0 +1,164 @@
+# outbox.py
+"""
+Boîte d'envoi des messages WhatsApp (CallMeBot, Twilio).
+
+Les signaux écrivent des OutboxMessage dans la transaction de l'événement (création
+de ticket...) : si la transaction est annulée, aucun message ne part. Après le commit,
+on réveille le worker (`manage.py drain_outbox`, NOTIFY sur PostgreSQL, sinon il
+interroge la table à intervalle régulier). Le worker prend les messages dus par lots,
+les envoie en parallèle (threads : appels HTTP) et replanifie les échecs avec un
+délai exponentiel.
+"""
+import logging
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+# Au-delà, un message "sending" est considéré comme abandonné (worker tué)
+STALE_AFTER = timedelta(minutes=5)
+BATCH_SIZE = 50
+NOTIFY_CHANNEL = 'tcikets_outbox'
+
+
+class DeliveryError(Exception):
+    pass
+
+
+# ---------- ENVOI ----------
+def send_callmebot(message):
+    from support.utils.callmebot import send_whatsapp_free
+
+    apikey = os.getenv("CALLMEBOT_APIKEY")
+    if not apikey:
+        raise DeliveryError("CALLMEBOT_APIKEY absent")
+    if not send_whatsapp_free(message.recipient, message.body, apikey):
+        raise DeliveryError("CallMeBot a refusé le message")
+
+
+@lru_cache(maxsize=None)
+def _whatsapp_service():
+    # Client Twilio créé une fois par processus worker, plus à l'import des signaux
+    from support.utils.whatsapp_service import WhatsAppService
+
+    return WhatsAppService()
+
+
+def send_twilio_whatsapp(message):
+    if not _whatsapp_service().send_message(message.recipient, message.body):
+        raise DeliveryError("Twilio a refusé le message")
+
+
+SENDERS = {
+    OutboxMessage.CHANNEL_CALLMEBOT: send_callmebot,
+    OutboxMessage.CHANNEL_TWILIO_WHATSAPP: send_twilio_whatsapp,
+}
+
+
+# ---------- ÉCRITURE ----------
+def enqueue(messages):
+    """
+    Ajoute des OutboxMessage (non sauvegardés) dans la transaction courante et réveille
+    le worker après le commit.
+    """
+    if not messages:
+        return []
+    created = OutboxMessage.objects.bulk_create(messages)
+    transaction.on_commit(wake_worker)
+    return created
+
+
+def wake_worker():
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"NOTIFY {NOTIFY_CHANNEL}")
+
+
+# ---------- WORKER ----------
+def backoff_delay(attempts):
+    """30 s, 1 min, 2 min... plafonné à 1 h, avec un peu d'aléa pour étaler les reprises."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def requeue_stale_messages():
+    return OutboxMessage.objects.filter(
+        status=OutboxMessage.STATUS_SENDING, locked_at__lt=timezone.now() - STALE_AFTER
+    ).update(status=OutboxMessage.STATUS_PENDING)
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """
+    Messages dus, passés de pending à sending par un UPDATE conditionnel : deux workers
+    ne peuvent pas prendre le même message.
+    """
+    now = timezone.now()
+    due = OutboxMessage.objects.filter(
+        status=OutboxMessage.STATUS_PENDING, next_attempt_at__lte=now
+    ).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    claimed = []
+    for message_id in list(due):
+        if OutboxMessage.objects.filter(pk=message_id, status=OutboxMessage.STATUS_PENDING).update(
+            status=OutboxMessage.STATUS_SENDING, locked_at=now
+        ):
+            claimed.append(message_id)
+    return list(OutboxMessage.objects.filter(pk__in=claimed))
+
+
+def _send(message):
+    """Appel au fournisseur (thread du pool) : renvoie l'erreur au lieu de la lever."""
+    try:
+        SENDERS[message.channel](message)
+    except Exception as e:
+        return e
+    return None
+
+
+def record_result(message, error):
+    message.attempts += 1
+    message.locked_at = None
+    if error is None:
+        message.status = OutboxMessage.STATUS_SENT
+        message.sent_at = timezone.now()
+        message.last_error = ''
+    else:
+        message.last_error = str(error)
+        if message.attempts >= MAX_ATTEMPTS:
+            message.status = OutboxMessage.STATUS_FAILED
+            logger.error(f"Message {message.channel} vers {message.recipient} abandonné: {error}")
+        else:
+            message.status = OutboxMessage.STATUS_PENDING
+            message.next_attempt_at = timezone.now() + backoff_delay(message.attempts)
+            logger.warning(
+                f"Message {message.channel} vers {message.recipient} échoué "
+                f"(tentative {message.attempts}), nouvel essai à {message.next_attempt_at:%H:%M:%S}: {error}"
+            )
+    message.save(update_fields=['attempts', 'locked_at', 'status', 'sent_at', 'last_error', 'next_attempt_at'])
+
+
+def drain(workers=None):
+    """
+    Envoie un lot de messages dus. Les appels HTTP se font en parallèle ; les écritures
+    en base restent dans le thread appelant (une seule connexion). Renvoie le lot traité.
+    """
+    messages = claim_batch()
+    if not messages:
+        return []
+    workers = workers or getattr(settings, 'OUTBOX_WORKERS', 4)
+    with ThreadPoolExecutor(max_workers=min(workers, len(messages))) as pool:
+        for message, error in zip(messages, pool.map(_send, messages)):
+            record_result(message, error)
+    return messages
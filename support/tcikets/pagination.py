@@ -0,0 +1,34 @@
+# pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) sur (-created_at, id).
+    Le curseur est opaque : le client se contente de suivre `next` / `previous`,
+    et chaque page coûte une seule requête indexée, quelle que soit la taille de la table.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', 'id')
+
+
+class TicketCursorPagination(CreatedAtCursorPagination):
+    """Liste des tickets : s'appuie sur l'index (-created_at, id) de Ticket."""
+
+
+class InterventionCursorPagination(CreatedAtCursorPagination):
+    """Liste des interventions."""
+
+
+class NotificationCursorPagination(CreatedAtCursorPagination):
+    """Liste des notifications d'un utilisateur."""
+
+
+class MessageCursorPagination(CursorPagination):
+    """Fil de discussion d'un ticket, du plus ancien au plus récent."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('timestamp', 'id')
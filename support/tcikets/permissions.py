@@ -30,3 +30,12 @@ class IsAdminOrOwner(BasePermission):
                 return True
 
         return False
+
+
+class IsAdminType(BasePermission):
+    """Admin (userType) ou staff uniquement."""
+    message = "Accès réservé aux administrateurs"
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_staff or getattr(user, 'userType', None) == 'admin'))
@@ -0,0 +1,159 @@
+# presence.py
+"""
+Présence dans les salons de chat (qui est connecté à quel ticket).
+
+L'état vit dans le cache Django (Redis en production), partagé par tous les workers
+ASGI :
+
+- une entrée par connexion WebSocket, avec une durée de vie (PRESENCE_TTL) rafraîchie
+  par le `ping` du client : une connexion perdue sans déconnexion propre (worker tué,
+  mobile hors réseau) disparaît d'elle-même ;
+- un index des connexions du salon, nettoyé des entrées expirées à chaque lecture.
+  Ses mises à jour (lecture-modification-écriture) se font sous un verrou par salon
+  (cache.add, atomique sur Redis) : deux workers ne peuvent pas s'écraser.
+
+Les arrivées/départs ne sont pas diffusés un par un : le premier changement d'un salon
+programme une diffusion après COALESCE_WINDOW secondes (un seul worker s'en charge,
+cf. _claim_broadcast). Elle compare les utilisateurs présents à ceux déjà annoncés et
+n'envoie que la différence : un mobile qui se reconnecte dans la fenêtre ne produit
+aucun événement, et un utilisateur avec plusieurs onglets n'est compté qu'une fois.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL = getattr(settings, 'CHAT_PRESENCE_TTL', 90)
+COALESCE_WINDOW = getattr(settings, 'CHAT_PRESENCE_WINDOW', 2.0)
+ANNOUNCED_TIMEOUT = 24 * 60 * 60
+# Durée de vie du verrou d'index (libéré même si le worker meurt) et attente maximale
+LOCK_TIMEOUT = 5
+
+# Tâches de diffusion en attente (référence gardée jusqu'à la fin de la tâche)
+_pending = set()
+
+
+def _key(ticket_id, *parts):
+    return ':'.join(['chat_presence', str(ticket_id), *parts])
+
+
+def member(user):
+    return {
+        'user_id': str(user.id),
+        'user_name': f"{user.first_name} {user.last_name}",
+        'user_type': getattr(user, 'userType', 'client'),
+    }
+
+
+# ---------- ÉTAT ----------
+@contextmanager
+def _index_lock(ticket_id):
+    """
+    Verrou de l'index du salon. Si le cache ne répond pas (IGNORE_EXCEPTIONS en
+    production), on continue sans verrou après LOCK_TIMEOUT plutôt que de bloquer.
+    """
+    key, token = _key(ticket_id, 'lock'), uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    acquired = cache.add(key, token, LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.005)
+        acquired = cache.add(key, token, LOCK_TIMEOUT)
+    if not acquired:
+        logger.warning(f"Verrou de présence du ticket {ticket_id} non obtenu, mise à jour sans verrou")
+    try:
+        yield
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def _touch(ticket_id, channel_name, user):
+    cache.set(_key(ticket_id, 'conn', channel_name), member(user), PRESENCE_TTL)
+    # Cas courant (ping) : déjà indexée, aucune écriture donc pas de verrou
+    if channel_name in (cache.get(_key(ticket_id, 'index')) or set()):
+        return
+    with _index_lock(ticket_id):
+        index = cache.get(_key(ticket_id, 'index')) or set()
+        cache.set(_key(ticket_id, 'index'), index | {channel_name}, ANNOUNCED_TIMEOUT)
+
+
+def _leave(ticket_id, channel_name):
+    cache.delete(_key(ticket_id, 'conn', channel_name))
+    with _index_lock(ticket_id):
+        index = cache.get(_key(ticket_id, 'index')) or set()
+        if channel_name in index:
+            cache.set(_key(ticket_id, 'index'), index - {channel_name}, ANNOUNCED_TIMEOUT)
+
+
+def _present(ticket_id):
+    """Utilisateurs présents {user_id: membre}, index nettoyé des connexions expirées."""
+    index = cache.get(_key(ticket_id, 'index')) or set()
+    if not index:
+        return {}
+    entries = cache.get_many([_key(ticket_id, 'conn', channel_name) for channel_name in index])
+    expired = {channel_name for channel_name in index if _key(ticket_id, 'conn', channel_name) not in entries}
+    if expired:
+        # Relu sous verrou : ne retire que les expirées, sans perdre une connexion ajoutée entre-temps
+        with _index_lock(ticket_id):
+            current = cache.get(_key(ticket_id, 'index')) or set()
+            cache.set(_key(ticket_id, 'index'), current - expired, ANNOUNCED_TIMEOUT)
+    return {entry['user_id']: entry for entry in entries.values()}
+
+
+# Hors du thread partagé des appels ORM : une attente de verrou ne bloque pas la base
+touch = sync_to_async(_touch, thread_sensitive=False)
+leave = sync_to_async(_leave, thread_sensitive=False)
+
+
+@sync_to_async(thread_sensitive=False)
+def snapshot(ticket_id):
+    return list(_present(ticket_id).values())
+
+
+# ---------- DIFFUSION REGROUPÉE ----------
+def _claim_broadcast(ticket_id):
+    # Verrou plus long que la fenêtre : s'il n'est pas libéré (worker tué), il expire
+    return cache.add(_key(ticket_id, 'broadcast'), True, int(COALESCE_WINDOW * 2) + 1)
+
+
+def _changes(ticket_id):
+    """Différence entre les présents et le dernier état annoncé au salon."""
+    # Libéré avant la lecture : un changement postérieur programme sa propre diffusion
+    cache.delete(_key(ticket_id, 'broadcast'))
+    present = _present(ticket_id)
+    announced = cache.get(_key(ticket_id, 'announced')) or {}
+    joined = [entry for user_id, entry in present.items() if user_id not in announced]
+    left = [entry for user_id, entry in announced.items() if user_id not in present]
+    if joined or left:
+        cache.set(_key(ticket_id, 'announced'), present, ANNOUNCED_TIMEOUT)
+    return joined, left
+
+
+async def schedule_broadcast(channel_layer, ticket_id, group_name):
+    """Programme la diffusion des changements du salon, sauf si elle l'est déjà."""
+    if not await sync_to_async(_claim_broadcast, thread_sensitive=False)(ticket_id):
+        return
+    task = asyncio.get_running_loop().create_task(_broadcast(channel_layer, ticket_id, group_name))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def _broadcast(channel_layer, ticket_id, group_name):
+    await asyncio.sleep(COALESCE_WINDOW)
+    try:
+        joined, left = await sync_to_async(_changes, thread_sensitive=False)(ticket_id)
+        if joined or left:
+            await channel_layer.group_send(group_name, {
+                'type': 'presence_update',
+                'joined': joined,
+                'left': left,
+            })
+    except Exception as e:
+        logger.error(f"Diffusion de présence du ticket {ticket_id} échouée: {e}")
@@ -0,0 +1,215 @@
+# report_jobs.py
+"""
+File d'attente des rapports PDF, stockée en base (pas de broker externe).
+
+Les vues appellent enqueue() et répondent immédiatement ; le worker
+(`manage.py run_report_worker`) prend les tâches une à une avec claim_next_job(),
+rend le PDF hors des workers gunicorn et le range dans le stockage "reports".
+Rapports d'intervention et exports de plusieurs tickets (PDF unique ou archive zip).
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import ReportJob, Intervention, Ticket
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# Au-delà, une tâche "running" est considérée comme abandonnée (worker tué)
+STALE_AFTER = timedelta(minutes=10)
+
+
+INTERVENTION_TEMPLATE = 'reports/intervention_report.html'
+INTERVENTION_STYLESHEET = 'reports/intervention_report.css'
+TICKET_TEMPLATE = 'ticket_pdf_template.html'
+TICKET_STYLESHEET = 'ticket_pdf_template.css'
+
+
+# ---------- RÉVISIONS (clé de cache des PDF) ----------
+@lru_cache(maxsize=None)
+def template_hash(template_name):
+    """Empreinte du gabarit : modifier le HTML/CSS du rapport invalide tous les PDF en cache."""
+    with open(get_template(template_name).origin.name, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def intervention_revision(intervention):
+    """
+    Clé d'un rapport : intervention + dernière modification de l'intervention et de son
+    ticket + gabarit et feuille de style. Toute modification produit une nouvelle clé, donc un nouveau PDF.
+    Matériels, dépenses et images modifient updated_at (signals.touch_intervention).
+    """
+    raw = "|".join([
+        str(intervention.id),
+        intervention.updated_at.isoformat(),
+        intervention.ticket.updated_at.isoformat(),
+        template_hash(INTERVENTION_TEMPLATE),
+        template_hash(INTERVENTION_STYLESHEET),
+    ])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def tickets_revision(kind, owner_id, tickets):
+    """
+    Clé d'un export de tickets : propriétaire, tickets exportés et leur dernière
+    modification, gabarit et feuille de style.
+    """
+    rows = tickets.order_by('created_at', 'id').values_list('id', 'updated_at')
+    raw = "|".join([
+        kind,
+        str(owner_id),
+        *(f"{ticket_id}:{updated_at.isoformat()}" for ticket_id, updated_at in rows),
+        template_hash(TICKET_TEMPLATE),
+        template_hash(TICKET_STYLESHEET),
+    ])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ---------- RENDU ----------
+def render_intervention_pdf(job):
+    from support.utils.pdf_utils import intervention_to_pdf_buffer
+
+    intervention = Intervention.objects.select_related(
+        'ticket__client__user', 'technician__user'
+    ).get(pk=job.object_id)
+    buffer = intervention_to_pdf_buffer(intervention)
+    # Nom adressé par le contenu : une révision = un fichier
+    return f"intervention_report_{intervention.id}_{job.cache_key[:12]}.pdf", buffer.getvalue()
+
+
+def render_tickets_pdf(job):
+    from support.utils import export_utils
+
+    # Les tickets retenus à la demande, dans l'ordre de l'export
+    tickets = Ticket.objects.filter(pk__in=job.params['ticket_ids']).order_by('created_at')
+    if job.kind == 'tickets_pdf_zip':
+        # Un PDF par ticket, rendus en parallèle dans le pool de ce worker
+        with export_utils.export_tickets_pdf_zip(tickets) as archive:
+            return f"tickets_pdf_{job.cache_key[:12]}.zip", archive.read()
+    return f"tickets_report_{job.cache_key[:12]}.pdf", export_utils.export_tickets_pdf(tickets).getvalue()
+
+
+RENDERERS = {
+    'intervention_pdf': render_intervention_pdf,
+    'tickets_pdf': render_tickets_pdf,
+    'tickets_pdf_zip': render_tickets_pdf,
+}
+
+
+# ---------- FILE D'ATTENTE ----------
+def enqueue(kind, object_id, user=None, params=None, cache_key=''):
+    """Crée une tâche, ou renvoie celle déjà en attente / en cours pour la même révision."""
+    pending = ReportJob.objects.filter(
+        kind=kind, object_id=object_id, cache_key=cache_key,
+        status__in=[ReportJob.STATUS_QUEUED, ReportJob.STATUS_RUNNING],
+    ).first()
+    if pending:
+        return pending
+    return ReportJob.objects.create(
+        kind=kind, object_id=object_id, requested_by=user, params=params or {}, cache_key=cache_key
+    )
+
+
+def cached_report(kind, cache_key):
+    """Rapport déjà rendu pour cette révision, s'il existe."""
+    return ReportJob.objects.filter(
+        kind=kind, cache_key=cache_key, status=ReportJob.STATUS_DONE
+    ).order_by('-finished_at').first()
+
+
+def prune_superseded(job):
+    """Supprime les PDF des révisions précédentes du même objet."""
+    superseded = ReportJob.objects.filter(
+        kind=job.kind, object_id=job.object_id, status=ReportJob.STATUS_DONE
+    ).exclude(cache_key=job.cache_key)
+    delete_report_files(superseded)
+
+
+def delete_report_files(jobs):
+    for old in jobs:
+        if old.file:
+            try:
+                old.file.delete(save=False)
+            except Exception as e:
+                logger.warning(f"Suppression du rapport {old.id} impossible: {e}")
+    jobs.delete()
+
+
+def requeue_stale_jobs():
+    """
+    Tâches "running" abandonnées (worker tué : OOM, plantage de WeasyPrint). La tentative
+    a déjà été comptée par claim_next_job : au-delà de MAX_ATTEMPTS la tâche échoue, sinon
+    un rapport qui tue le worker serait repris indéfiniment.
+    """
+    stale = ReportJob.objects.filter(
+        status=ReportJob.STATUS_RUNNING, started_at__lt=timezone.now() - STALE_AFTER
+    )
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ReportJob.STATUS_FAILED, finished_at=timezone.now(),
+        error="Worker interrompu pendant le rendu (nombre maximal de tentatives atteint)",
+    )
+    return stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=ReportJob.STATUS_QUEUED)
+
+
+def claim_next_job():
+    """
+    Prend la plus ancienne tâche en attente. Le passage queued -> running est un
+    UPDATE conditionnel : si un autre worker l'a prise entre-temps, on passe à la suivante.
+    """
+    candidates = ReportJob.objects.filter(status=ReportJob.STATUS_QUEUED).order_by('created_at')
+    for job_id in candidates.values_list('id', flat=True)[:10]:
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.STATUS_QUEUED).update(
+            status=ReportJob.STATUS_RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    try:
+        filename, content = RENDERERS[job.kind](job)
+    except (ImportError, OSError) as e:
+        # WeasyPrint ou ses bibliothèques système absents : inutile de réessayer
+        return _fail(job, e, retry=False)
+    except Exception as e:
+        return _fail(job, e)
+
+    try:
+        job.file.save(filename, ContentFile(content), save=False)
+    except Exception as e:
+        return _fail(job, e)
+
+    job.status = ReportJob.STATUS_DONE
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'error', 'finished_at'])
+    if job.cache_key:
+        prune_superseded(job)
+    return job
+
+
+def _fail(job, error, retry=True):
+    logger.error(f"Rapport {job.kind} {job.object_id} échoué (tentative {job.attempts}): {error}")
+    job.error = str(error) or type(error).__name__
+    if retry and job.attempts < MAX_ATTEMPTS:
+        job.status = ReportJob.STATUS_QUEUED
+    else:
+        job.status = ReportJob.STATUS_FAILED
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def process_next_job():
+    job = claim_next_job()
+    if job is None:
+        return None
+    return run_job(job)
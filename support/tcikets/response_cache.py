@@ -0,0 +1,92 @@
+# response_cache.py
+"""
+Cache de réponses rendues pour les endpoints de liste.
+
+On stocke le JSON déjà sérialisé (octets) et son ETag : un hit ne touche ni la base
+ni les sérialiseurs. Les clés embarquent la version de chaque namespace dont dépend
+la vue ; `invalidate('procedures')` incrémente la version et rend toutes les entrées
+précédentes inaccessibles (elles expirent d'elles-mêmes), sans parcourir les clés.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+VERSION_KEY = "response_cache_version:{}"
+
+
+def get_versions(namespaces):
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    return [found.get(key, 1) for key in keys]
+
+
+def invalidate(*namespaces):
+    """Invalide toutes les réponses en cache des namespaces donnés."""
+    for namespace in namespaces:
+        key = VERSION_KEY.format(namespace)
+        # add() initialise la version sans écraser une valeur concurrente
+        if not cache.add(key, 2, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 2, None)
+
+
+def _etag(body):
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    candidates = {value.strip().removeprefix('W/') for value in header.split(',')}
+    return etag in candidates or '*' in candidates
+
+
+class CachedResponseMixin:
+    """
+    À placer avant la vue générique DRF : met en cache le `list()` (GET) complet.
+
+    - cache_namespaces : namespaces invalidés par les signaux (cf. cache_registry.py) ;
+      get_cache_namespaces() permet de les restreindre à l'utilisateur courant.
+    - get_cache_scope() : part de la clé propre à l'utilisateur (visibilité par rôle).
+    """
+    cache_namespaces = ()
+    # Long : l'invalidation passe par cache_registry, pas par l'expiration
+    cache_timeout = 60 * 60
+
+    def get_cache_namespaces(self):
+        return self.cache_namespaces
+
+    def get_cache_scope(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return "anon"
+        return f"{getattr(user, 'userType', 'user')}:{user.pk}"
+
+    def get_cache_key(self):
+        namespaces = list(self.get_cache_namespaces())
+        versions = get_versions(namespaces)
+        params = "&".join(f"{key}={value}" for key, value in sorted(self.request.query_params.lists()))
+        raw = f"{self.__class__.__name__}|{self.get_cache_scope()}|{params}|" + ",".join(
+            f"{namespace}:{version}" for namespace, version in zip(namespaces, versions)
+        )
+        return f"response_cache:{hashlib.md5(raw.encode()).hexdigest()}"
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_cache_key()
+        entry = cache.get(cache_key)
+        if entry is not None:
+            body, etag = entry
+            if _etag_matches(request, etag):
+                return HttpResponse(status=304, headers={'ETag': etag})
+            return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            body = JSONRenderer().render(response.data)
+            etag = _etag(body)
+            cache.set(cache_key, (body, etag), self.cache_timeout)
+            response['ETag'] = etag
+        return response
@@ -0,0 +1,74 @@
+# search_backends.py
+"""
+Moteurs de recherche utilisés par search_views.py.
+
+- PostgresSearchBackend : colonnes search_vector (index GIN) classées par SearchRank,
+  plus préfixes sur les codes / identifiants (index trigram sur UPPER(col)).
+- SimpleSearchBackend : icontains, pour le développement local sous SQLite.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import SEARCH_CONFIG
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+class SimpleSearchBackend:
+    """Fallback icontains : séquentiel, mais suffisant pour une base de dev."""
+
+    def search(self, queryset, query, text_fields=(), prefix_fields=(), limit=DEFAULT_LIMIT):
+        condition = Q()
+        for field in (*text_fields, *prefix_fields):
+            condition |= Q(**{f"{field}__icontains": query})
+        if not condition:
+            return queryset.none()
+        return queryset.filter(condition)[:limit]
+
+
+class PostgresSearchBackend:
+    """
+    Plein texte sur search_vector (mots, stemming français) + préfixe sur les champs courts.
+    Le tri combine SearchRank et la similarité trigram des champs préfixés.
+    """
+
+    def search(self, queryset, query, text_fields=(), prefix_fields=(), limit=DEFAULT_LIMIT):
+        condition = Q()
+        rank = Value(0.0, output_field=FloatField())
+
+        if text_fields:
+            search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+            condition |= Q(search_vector=search_query)
+            rank = Coalesce(SearchRank(F('search_vector'), search_query), rank)
+
+        if prefix_fields:
+            for field in prefix_fields:
+                condition |= Q(**{f"{field}__istartswith": query})
+            similarities = [TrigramSimilarity(field, query) for field in prefix_fields]
+            similarity = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+            rank = Greatest(rank, similarity) if text_fields else similarity
+
+        if not condition:
+            return queryset.none()
+
+        queryset = queryset.filter(condition).annotate(search_rank=rank)
+        if text_fields:
+            # Inutile de rapatrier le tsvector dans les résultats
+            queryset = queryset.defer('search_vector')
+        return queryset.order_by('-search_rank')[:limit]
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    try:
+        return max(1, min(int(value), MAX_LIMIT))
+    except (TypeError, ValueError):
+        return default
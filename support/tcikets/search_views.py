@@ -1,9 +1,41 @@
 # support/search_views.py
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Q
 from .models import User,Ticket,Intervention,Procedure
 from .serializers import UserSerializer,TicketSerializer,ProcedureSerializer,InterventionSerializer
+from .search_backends import get_search_backend, parse_limit, MAX_LIMIT
+from .views import visible_tickets
+from .extend_views import visible_procedures
+
+# Champs interrogés : plein texte (search_vector) / préfixe (index trigram)
+TICKET_SEARCH = {'text_fields': ('title', 'description'), 'prefix_fields': ('code',)}
+PROCEDURE_SEARCH = {'text_fields': ('title', 'description')}
+INTERVENTION_SEARCH = {'prefix_fields': ('code',)}
+USER_SEARCH = {'prefix_fields': ('username', 'email')}
+
+
+def search_tickets(query, limit):
+    queryset = Ticket.objects.select_related('client__user', 'technician__user')
+    return get_search_backend().search(queryset, query, limit=limit, **TICKET_SEARCH)
+
+
+def search_procedures(query, limit):
+    queryset = Procedure.objects.select_related('author')
+    return get_search_backend().search(queryset, query, limit=limit, **PROCEDURE_SEARCH)
+
+
+def search_interventions(query, limit):
+    return get_search_backend().search(Intervention.objects.all(), query, limit=limit, **INTERVENTION_SEARCH)
+
+
+def search_users(query, limit):
+    return get_search_backend().search(User.objects.all(), query, limit=limit, **USER_SEARCH)
 
 
 class GlobalSearchView(APIView):
@@ -12,65 +44,156 @@ class GlobalSearchView(APIView):
         if not query:
             return Response({"error": "Missing query"}, status=400)
 
-        procedures = Procedure.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )[:10]
-
-        tickets = Ticket.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query) | Q(code__icontains=query)
-        )[:10]
-
-        interventions = Intervention.objects.filter(
-             Q(code__icontains=query)
-        )[:10]
-
-        users = User.objects.filter(
-            Q(username__icontains=query) | Q(email__icontains=query)
-        )[:10]
+        limit = parse_limit(request.GET.get("limit"))
 
         return Response({
-            "procedures": ProcedureSerializer(procedures, many=True).data,
-            "tickets": TicketSerializer(tickets, many=True).data,
-            "interventions": InterventionSerializer(interventions, many=True).data,
-            "users": UserSerializer(users, many=True).data,
+            "procedures": ProcedureSerializer(search_procedures(query, limit), many=True).data,
+            "tickets": TicketSerializer(search_tickets(query, limit), many=True).data,
+            "interventions": InterventionSerializer(search_interventions(query, limit), many=True).data,
+            "users": UserSerializer(search_users(query, limit), many=True).data,
         })
 
 
 class TicketSearchView(APIView):
     def get(self, request):
         query = request.GET.get("q", "").strip()
-        tickets = Ticket.objects.filter(
-            tickets = Ticket.objects.filter(
-                    Q(title__icontains=query) | 
-                    Q(description__icontains=query) |
-                    Q(code__icontains=query)
-                )
-        )
+        if not query:
+            return Response([])
+        tickets = search_tickets(query, parse_limit(request.GET.get("limit"), MAX_LIMIT))
         return Response(TicketSerializer(tickets, many=True).data)
 
 
 class ProcedureSearchView(APIView):
     def get(self, request):
         query = request.GET.get("q", "").strip()
-        procedures = Procedure.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
+        if not query:
+            return Response([])
+        procedures = search_procedures(query, parse_limit(request.GET.get("limit"), MAX_LIMIT))
         return Response(ProcedureSerializer(procedures, many=True).data)
 
 
 class InterventionSearchView(APIView):
     def get(self, request):
         query = request.GET.get("q", "").strip()
-        interventions = Intervention.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
+        if not query:
+            return Response([])
+        interventions = search_interventions(query, parse_limit(request.GET.get("limit"), MAX_LIMIT))
         return Response(InterventionSerializer(interventions, many=True).data)
 
 
 class UserSearchView(APIView):
     def get(self, request):
         query = request.GET.get("q", "").strip()
-        users = User.objects.filter(
-            Q(username__icontains=query) | Q(email__icontains=query)
-        )
+        if not query:
+            return Response([])
+        users = search_users(query, parse_limit(request.GET.get("limit"), MAX_LIMIT))
         return Response(UserSerializer(users, many=True).data)
+
+
+# ---------- SEARCH-AS-YOU-TYPE ----------
+SUGGEST_MIN_LENGTH = 2
+SUGGEST_LIMIT = 8
+SUGGEST_TTL = 30  # secondes : le temps d'une saisie
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def _matches(item, query):
+    return any(query in (item.get(field) or "").lower() for field in item["match"])
+
+
+class SearchSuggestView(APIView):
+    """
+    Typeahead : ids, titres, codes et type, sans sérialiseur complet.
+
+    Les réponses sont mises en cache par (utilisateur, requête normalisée) pendant
+    SUGGEST_TTL. Si un préfixe déjà en cache n'a pas été tronqué pour un type, ses
+    résultats suffisent : "route" est répondu en filtrant localement ceux de "rout".
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = normalize_query(request.GET.get("q", ""))
+        if len(query) < SUGGEST_MIN_LENGTH:
+            return Response({"query": query, "results": []})
+
+        user = request.user
+        keys = {
+            prefix: self.cache_key(user, prefix)
+            for prefix in (query[:end] for end in range(SUGGEST_MIN_LENGTH, len(query) + 1))
+        }
+        cached = cache.get_many(list(keys.values()))
+
+        entry = cached.get(keys[query])
+        if entry is None:
+            entry = self.build_entry(user, query, self.longest_cached_prefix(keys, cached, query))
+            cache.set(keys[query], entry, SUGGEST_TTL)
+
+        results = [
+            {k: v for k, v in item.items() if k != "match"}
+            for bucket in entry.values() for item in bucket["items"]
+        ]
+        return Response({"query": query, "results": results})
+
+    @staticmethod
+    def cache_key(user, query):
+        digest = hashlib.md5(query.encode()).hexdigest()
+        return f"search_suggest_{user.userType}_{user.id}_{digest}"
+
+    @staticmethod
+    def longest_cached_prefix(keys, cached, query):
+        for prefix in sorted(keys, key=len, reverse=True):
+            if prefix != query and keys[prefix] in cached:
+                return cached[keys[prefix]]
+        return None
+
+    def build_entry(self, user, query, prefix_entry):
+        entry = {}
+        for kind, fetch in (
+            ("ticket", self.fetch_tickets),
+            ("procedure", self.fetch_procedures),
+            ("intervention", self.fetch_interventions),
+        ):
+            bucket = (prefix_entry or {}).get(kind)
+            if bucket and bucket["complete"]:
+                items = [item for item in bucket["items"] if _matches(item, query)]
+            else:
+                items = fetch(user, query)
+            entry[kind] = {
+                "items": items[:SUGGEST_LIMIT],
+                "complete": len(items) <= SUGGEST_LIMIT,
+            }
+        return entry
+
+    # Une ligne de plus que la limite pour savoir si le résultat est tronqué
+    def fetch_tickets(self, user, query):
+        rows = visible_tickets(user).filter(
+            Q(title__icontains=query) | Q(code__icontains=query)
+        ).values("id", "title", "code")[:SUGGEST_LIMIT + 1]
+        return [
+            {"type": "ticket", "id": str(row["id"]), "title": row["title"], "code": row["code"],
+             "match": ("title", "code")}
+            for row in rows
+        ]
+
+    def fetch_procedures(self, user, query):
+        rows = visible_procedures(user).filter(
+            title__icontains=query
+        ).values("id", "title")[:SUGGEST_LIMIT + 1]
+        return [
+            {"type": "procedure", "id": str(row["id"]), "title": row["title"], "code": None,
+             "match": ("title",)}
+            for row in rows
+        ]
+
+    def fetch_interventions(self, user, query):
+        rows = Intervention.objects.filter(
+            ticket__in=visible_tickets(user), code__icontains=query
+        ).values("id", "code", "ticket__title")[:SUGGEST_LIMIT + 1]
+        return [
+            {"type": "intervention", "id": str(row["id"]), "title": row["ticket__title"], "code": row["code"],
+             "match": ("code",)}
+            for row in rows
+        ]
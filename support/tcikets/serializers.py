@@ -3,13 +3,14 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils.timesince import timesince
 from django.utils import timezone
+from django.urls import reverse
 
 from cloudinary import CloudinaryImage
 from .models import (
     Client, Technician, Ticket, TicketImage,
     Intervention, InterventionMaterial, InterventionImage,
-    TechnicianRating, ClientRating, Message, Notification,
-    Procedure, ProcedureImage, ProcedureAttachment, ProcedureTag
+    TechnicianRating, ClientRating, Message, ChatAttachment, Notification,
+    Procedure, ProcedureImage, ProcedureAttachment, ProcedureTag, ReportJob
 )
 
 User = get_user_model()
@@ -55,11 +56,10 @@ class ClientSerializer(serializers.ModelSerializer):
                   'average_rating', 'total_ratings']
 
     def get_average_rating(self, obj):
-        ratings = obj.ratings.all()
-        return sum(r.rating for r in ratings) / ratings.count() if ratings else 0
+        return obj.average_rating()
 
     def get_total_ratings(self, obj):
-        return obj.ratings.count()
+        return obj.rating_count
 
 
 class ClientCreateSerializer(serializers.ModelSerializer):
@@ -138,11 +138,10 @@ class TechnicianSerializer(serializers.ModelSerializer):
                   'average_rating', 'total_ratings']
 
     def get_average_rating(self, obj):
-        ratings = obj.ratings.all()
-        return sum(r.rating for r in ratings) / ratings.count() if ratings else 0
+        return obj.average_rating()
 
     def get_total_ratings(self, obj):
-        return obj.ratings.count()
+        return obj.rating_count
 
 
 class TechnicianCreateSerializer(serializers.ModelSerializer):
@@ -223,21 +222,32 @@ class TicketSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ticket
-        fields = '__all__'
+        exclude = ['search_vector']
 
 
 
 # Dans MessageSerializer
+class ChatAttachmentSerializer(serializers.ModelSerializer):
+    image_url = serializers.ReadOnlyField()
+    thumbnail_url = serializers.ReadOnlyField()
+
+    class Meta:
+        model = ChatAttachment
+        fields = ['id', 'image_url', 'thumbnail_url', 'content_type', 'width', 'height', 'file_size', 'uploaded_at']
+        read_only_fields = fields
+
+
 class MessageSerializer(serializers.ModelSerializer):
     user_name = serializers.SerializerMethodField()
     user_type = serializers.SerializerMethodField()
     is_own_message = serializers.SerializerMethodField()
+    attachments = ChatAttachmentSerializer(many=True, read_only=True)
     
     class Meta:
         model = Message
         fields = [
             'id', 'ticket', 'user', 'user_name', 'user_type', 
-            'content', 'image', 'timestamp', 'is_whatsapp', 
+            'content', 'image', 'attachments', 'timestamp', 'is_whatsapp', 
             'whatsapp_status', 'whatsapp_sid', 'is_own_message'
         ]
         read_only_fields = ['id', 'timestamp', 'user']
@@ -266,9 +276,39 @@ class TicketSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Ticket
-        fields = '__all__'
-        
-   
+        exclude = ['search_vector']
+
+
+class TicketListSerializer(serializers.ModelSerializer):
+    """
+    Représentation compacte pour les listes de tickets : pas de fil de messages,
+    pas de profils imbriqués. Suppose un queryset avec select_related
+    client__user / technician__user, images préchargées et message_count annoté.
+    """
+    client_name = serializers.SerializerMethodField()
+    technician_name = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    message_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Ticket
+        fields = ['id', 'code', 'title', 'status', 'priority', 'created_at', 'updated_at',
+                  'client_name', 'technician_name', 'thumbnail_url', 'message_count']
+        read_only_fields = fields
+
+    def get_client_name(self, obj):
+        return obj.client.user.get_full_name() if obj.client_id else None
+
+    def get_technician_name(self, obj):
+        return obj.technician.user.get_full_name() if obj.technician_id else None
+
+    def get_thumbnail_url(self, obj):
+        images = obj.images.all()
+        return images[0].thumbnail_url if images else None
+
+    def get_message_count(self, obj):
+        count = getattr(obj, 'message_count', None)
+        return count if count is not None else obj.messages.count()
     
 
 
@@ -501,7 +541,40 @@ class ProcedureRelatedSerializer(serializers.ModelSerializer):
         model = Procedure
         fields = ['id', 'title', 'images','category', 'views', 'reading_time',  'description']
         
-        
+
+
+class ProcedureListSerializer(serializers.ModelSerializer):
+    """
+    Représentation allégée pour la liste des procédures : ni contenu HTML,
+    ni pièces jointes, ni procédures liées ; seulement l'image de couverture et des compteurs.
+    Le détail complet reste servi par ProcedureSerializer (procedures/<id>/).
+    """
+    author = UserSerializer(read_only=True)
+    tags = ProcedureTagSerializer(many=True, read_only=True)
+    cover_image = serializers.SerializerMethodField()
+    images_count = serializers.IntegerField(read_only=True)
+    attachments_count = serializers.IntegerField(read_only=True)
+    reading_time = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Procedure
+        fields = ['id', 'title', 'slug', 'description', 'meta_description', 'category', 'difficulty',
+                  'estimated_time', 'status', 'is_active', 'featured', 'views', 'likes', 'bookmarks',
+                  'created_at', 'updated_at', 'author', 'tags', 'content_preview', 'word_count',
+                  'reading_time', 'cover_image', 'images_count', 'attachments_count']
+        read_only_fields = fields
+
+    def get_cover_image(self, obj):
+        # Prefetch tronqué à une image (to_attr='cover_images')
+        covers = getattr(obj, 'cover_images', None)
+        if covers is None:
+            covers = list(obj.images.order_by('order', 'uploaded_at')[:1])
+        return ProcedureImageSerializer(covers[0], context=self.context).data if covers else None
+
+    def get_reading_time(self, obj):
+        return f"{obj.reading_time_minutes} min"
+
+
 class ProcedureSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     tags = ProcedureTagSerializer(many=True, read_only=True)
@@ -518,45 +591,19 @@ class ProcedureSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
-    content_preview = serializers.SerializerMethodField()
     reading_time = serializers.SerializerMethodField()
     
     class Meta:
         model = Procedure
-        fields = '__all__'
+        exclude = ['search_vector', 'plain_text']
         read_only_fields = [
             'id', 'author', 'created_at', 'updated_at', 'views', 
             'likes', 'bookmarks'
         ]
 
-    def get_content_preview(self, obj):
-        """Generate a plain text preview of the content"""
-        if not obj.content:
-            return ""
-        
-        # Remove HTML tags for preview
-        import re
-        clean = re.compile('<.*?>')
-        plain_text = re.sub(clean, '', obj.content)
-        
-        # Return first 200 characters
-        return plain_text[:200] + "..." if len(plain_text) > 200 else plain_text
-    
     def get_reading_time(self, obj):
-        """Calculate estimated reading time"""
-        if not obj.content:
-            return "0 min"
-        
-        # Remove HTML tags
-        import re
-        clean = re.compile('<.*?>')
-        plain_text = re.sub(clean, '', obj.content)
-        
-        # Calculate reading time (average 200 words per minute)
-        word_count = len(plain_text.split())
-        reading_time = max(1, round(word_count / 200))
-        
-        return f"{reading_time} min"
+        """Temps de lecture précalculé à l'enregistrement (Procedure.refresh_text_fields)"""
+        return f"{obj.reading_time_minutes} min"
 
     def create(self, validated_data):
         tag_names = validated_data.pop('tag_names', [])
@@ -712,3 +759,27 @@ class MeSerializer(serializers.ModelSerializer):
 
         return None
 
+
+# ------------------------------------------------------------------
+# RAPPORTS (file d'attente)
+# ------------------------------------------------------------------
+class ReportJobSerializer(serializers.ModelSerializer):
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'kind', 'object_id', 'status', 'attempts', 'error',
+                  'created_at', 'started_at', 'finished_at', 'status_url', 'download_url']
+        read_only_fields = fields
+
+    def _absolute(self, path):
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+
+    def get_status_url(self, obj):
+        return self._absolute(reverse('report-job-detail', args=[obj.id]))
+
+    def get_download_url(self, obj):
+        # Toujours renseignée : répond 202 tant que le rapport n'est pas prêt
+        return self._absolute(reverse('report-job-download', args=[obj.id]))
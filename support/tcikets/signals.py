@@ -1,42 +1,67 @@
 # signals.py
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
-from .models import Ticket, Notification, Client, Technician
+from .models import (
+    Ticket, Notification, Client, Technician, TechnicianRating, ClientRating, Intervention, ReportJob, OutboxMessage,
+    InterventionMaterial, InterventionExpense, InterventionImage
+)
+from . import outbox
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from support.utils.whatsapp_service import WhatsAppService
-from django.db.models import Q
+from django.db.models import Q, F
+from django.utils import timezone
 
 
-from support.utils.callmebot import send_whatsapp_free
+import logging
 import os
 
 User = get_user_model()
 CMB_KEY = os.getenv("CALLMEBOT_APIKEY")   # à ajouter dans .env
 
 @receiver(post_save, sender=Ticket)
-def notify_admins_callmebot(sender, instance, created, **kwargs):
-    if not created or not CMB_KEY:
+def queue_ticket_creation_messages(sender, instance, created, **kwargs):
+    """
+    WhatsApp aux admins (CallMeBot et Twilio) : écrits dans la boîte d'envoi, dans la
+    transaction de création du ticket, et envoyés par `manage.py drain_outbox`.
+    """
+    if not created:
         return
 
-    admins = User.objects.filter(
+    phones = list(User.objects.filter(
         Q(userType='admin') | Q(is_staff=True)
-    ).exclude(phone__isnull=True).exclude(phone='')
+    ).exclude(phone__isnull=True).exclude(phone='').values_list('phone', flat=True))
+    if not phones:
+        return
 
-    msg = (
-        f"🔔 *Nouveau ticket* {instance.code}\n"
-        f"Titre : {instance.title}\n"
-        f"Client : {instance.client.user.get_full_name()}\n"
-        f"https://ton-site.com/admin/ticket/{instance.id}/change/"
-    )[:500]  # limite 500 car
+    client_name = instance.client.user.get_full_name()
+    messages = []
+    if CMB_KEY:
+        callmebot_msg = (
+            f"🔔 *Nouveau ticket* {instance.code}\n"
+            f"Titre : {instance.title}\n"
+            f"Client : {client_name}\n"
+            f"https://ton-site.com/admin/ticket/{instance.id}/change/"
+        )[:500]  # limite 500 car
+        messages += [
+            OutboxMessage(channel=OutboxMessage.CHANNEL_CALLMEBOT, recipient=phone, body=callmebot_msg, ticket=instance)
+            for phone in phones
+        ]
 
-    for admin in admins:
-        send_whatsapp_free(admin.phone, msg, CMB_KEY)
+    twilio_msg = (
+        f"🔔 Nouveau ticket *{instance.code}*\n"
+        f"Titre : {instance.title}\n"
+        f"Client : {client_name}"
+    )
+    messages += [
+        OutboxMessage(channel=OutboxMessage.CHANNEL_TWILIO_WHATSAPP, recipient=phone, body=twilio_msg, ticket=instance)
+        for phone in phones
+    ]
+    outbox.enqueue(messages)
 
 @receiver(user_logged_in)
 def create_login_notifications(sender, request, user, **kwargs):
@@ -140,22 +165,112 @@ def force_admin_usertype(sender, instance, **kwargs):
 
 
 User = get_user_model()
-whatsapp = WhatsAppService()
+
+
+# ------------------------------------------------------------------
+# AGRÉGATS DE NOTES (rating_sum / rating_count sur Technician et Client)
+# ------------------------------------------------------------------
+# Note -> (modèle du profil noté, nom du champ FK vers ce profil)
+RATED_PROFILES = {
+    TechnicianRating: (Technician, 'technician_id'),
+    ClientRating: (Client, 'client_id'),
+}
+
+
+def _apply_rating_delta(rating_model, profile_id, sum_delta, count_delta):
+    """Met à jour les agrégats du profil noté en un seul UPDATE atomique (F-expressions)."""
+    profile_model, _ = RATED_PROFILES[rating_model]
+    if profile_id is None or (not sum_delta and not count_delta):
+        return
+    profile_model.objects.filter(pk=profile_id).update(
+        rating_sum=F('rating_sum') + sum_delta,
+        rating_count=F('rating_count') + count_delta,
+    )
+
+
+def _rated_profile_id(rating_model, instance):
+    return getattr(instance, RATED_PROFILES[rating_model][1])
+
+
+@receiver(pre_save, sender=TechnicianRating)
+@receiver(pre_save, sender=ClientRating)
+def remember_previous_rating(sender, instance, **kwargs):
+    """Mémorise l'ancienne note et le profil noté, pour un delta ou un transfert."""
+    instance._previous_rating = None
+    if not instance._state.adding:
+        _, fk_name = RATED_PROFILES[sender]
+        previous = sender.objects.filter(pk=instance.pk).values_list('rating', fk_name).first()
+        if previous is not None:
+            instance._previous_rating, instance._previous_profile_id = previous
+
+
+@receiver(post_save, sender=TechnicianRating)
+@receiver(post_save, sender=ClientRating)
+def add_rating_to_aggregates(sender, instance, created, **kwargs):
+    profile_id = _rated_profile_id(sender, instance)
+    if created:
+        _apply_rating_delta(sender, profile_id, instance.rating, 1)
+    elif getattr(instance, '_previous_rating', None) is not None:
+        if instance._previous_profile_id != profile_id:
+            # Note déplacée vers un autre profil : retirée de l'ancien, ajoutée au nouveau
+            _apply_rating_delta(sender, instance._previous_profile_id, -instance._previous_rating, -1)
+            _apply_rating_delta(sender, profile_id, instance.rating, 1)
+        else:
+            _apply_rating_delta(sender, profile_id, instance.rating - instance._previous_rating, 0)
+
+
+@receiver(post_delete, sender=TechnicianRating)
+@receiver(post_delete, sender=ClientRating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    _apply_rating_delta(sender, _rated_profile_id(sender, instance), -instance.rating, -1)
+
+
+@receiver(post_delete, sender=Intervention)
+def delete_intervention_reports(sender, instance, **kwargs):
+    """Les PDF en cache d'une intervention supprimée ne seront plus jamais servis."""
+    from .report_jobs import delete_report_files
+
+    jobs = ReportJob.objects.filter(kind='intervention_pdf', object_id=instance.pk)
+    transaction.on_commit(lambda: delete_report_files(jobs))
+
+
+@receiver(post_save, sender=InterventionMaterial)
+@receiver(post_save, sender=InterventionExpense)
+@receiver(post_save, sender=InterventionImage)
+@receiver(post_delete, sender=InterventionMaterial)
+@receiver(post_delete, sender=InterventionExpense)
+@receiver(post_delete, sender=InterventionImage)
+def touch_intervention(sender, instance, **kwargs):
+    """
+    Le rapport PDF affiche matériels, dépenses et images : les modifier change
+    updated_at de l'intervention, donc sa révision (report_jobs.intervention_revision).
+    """
+    Intervention.objects.filter(pk=instance.intervention_id).update(updated_at=timezone.now())
+
 
 @receiver(post_save, sender=Ticket)
-def notify_admins_on_ticket_creation(sender, instance, created, **kwargs):
-    if not created:
+def revalidate_chat_access(sender, instance, created, **kwargs):
+    """
+    Les sockets du chat gardent leur décision d'accès pour toute la connexion : après
+    une réassignation, chacune la revérifie (et se ferme si l'accès est perdu).
+    Ancien client / technicien mémorisés par cache_registry.remember_ticket_assignment.
+    """
+    if created or (
+        getattr(instance, '_previous_client_id', instance.client_id) == instance.client_id
+        and getattr(instance, '_previous_technician_id', instance.technician_id) == instance.technician_id
+    ):
         return
 
-    admins = User.objects.filter(
-        Q(userType='admin') | Q(is_staff=True)
-    ).exclude(phone__isnull=True).exclude(phone='')
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+    from .consumers import room_group_name
 
-    msg = (
-        f"🔔 Nouveau ticket *{instance.code}*\n"
-        f"Titre : {instance.title}\n"
-        f"Client : {instance.client.user.get_full_name()}"
-    )
+    def notify():
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                room_group_name(instance.pk), {'type': 'ticket_access_changed'}
+            )
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Revalidation du chat du ticket {instance.pk} échouée: {e}")
 
-    for admin in admins:
-        whatsapp.send_message(admin.phone, msg)
\ No newline at end of file
+    transaction.on_commit(notify)
@@ -1,3 +1,671 @@
-from django.test import TestCase
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image as PILImage
+from rest_framework.test import APIClient
+
+from .models import (
+    User, Client, Ticket, Message, Intervention, InterventionMaterial, ReportJob, Procedure, ProcedureTag,
+    ChatAttachment, OutboxMessage, Technician, TechnicianRating, ClientRating, TicketCodeSequence,
+)
+from . import outbox, presence, report_jobs, response_cache, routing, view_counter
+
+
+class TicketListQueryCountTests(TestCase):
+    """La liste des tickets doit coûter un nombre constant de requêtes, quelle que soit la taille de page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', userType='admin'
+        )
+        client_user = User.objects.create_user(
+            username='client', email='client@example.com', password='pass', userType='client'
+        )
+        client = Client.objects.get(user=client_user)
+        for i in range(30):
+            ticket = Ticket.objects.create(title=f"Ticket {i}", description="desc", client=client)
+            Message.objects.create(ticket=ticket, user=client_user, content="Bonjour")
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def _count_queries(self, page_size):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get('/api/tickets/', {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.assertEqual(self._count_queries(5), self._count_queries(25))
+
+    def test_list_uses_compact_representation(self):
+        response = self.api.get('/api/tickets/', {'page_size': 1})
+        row = response.data['results'][0]
+        self.assertNotIn('messages', row)
+        self.assertEqual(row['message_count'], 1)
+        self.assertIn('client_name', row)
+
+
+class InterventionReportAccessTests(TestCase):
+    """Le rapport PDF d'une intervention n'est accessible qu'à ceux qui voient le ticket."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass', userType='client'
+        )
+        cls.stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='pass', userType='client'
+        )
+        ticket = Ticket.objects.create(title="Ticket", description="desc", client=Client.objects.get(user=cls.owner))
+        cls.intervention = Intervention.objects.create(ticket=ticket, report="Rapport")
+
+    def _get(self, user):
+        api = APIClient()
+        api.force_authenticate(user)
+        return api.get(f'/api/interventions/{self.intervention.id}/export/pdf/')
+
+    def test_unrelated_client_is_refused(self):
+        self.assertEqual(self._get(self.stranger).status_code, 403)
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_owner_gets_a_queued_job(self):
+        self.assertEqual(self._get(self.owner).status_code, 202)
+        self.assertEqual(ReportJob.objects.get().requested_by, self.owner)
+
+
+class ReportQueueTests(TestCase):
+    """File ReportJob : prise des tâches, reprises et tâches abandonnées."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='client', email='client@example.com', password='pass', userType='client')
+        ticket = Ticket.objects.create(title="Ticket", description="desc", client=Client.objects.get(user=user))
+        cls.intervention = Intervention.objects.create(ticket=ticket, report="Rapport")
+
+    def _enqueue(self, cache_key='rev'):
+        return report_jobs.enqueue('intervention_pdf', self.intervention.id, cache_key=cache_key)
+
+    def test_enqueue_reuses_pending_job_of_same_revision(self):
+        self.assertEqual(self._enqueue(), self._enqueue())
+        self.assertNotEqual(self._enqueue(), self._enqueue('other'))
+
+    def test_claim_marks_running_and_counts_attempt(self):
+        job = self._enqueue()
+        claimed = report_jobs.claim_next_job()
+        self.assertEqual(claimed, job)
+        self.assertEqual((claimed.status, claimed.attempts), (ReportJob.STATUS_RUNNING, 1))
+        self.assertIsNone(report_jobs.claim_next_job())
+
+    def test_failure_is_retried_until_max_attempts(self):
+        self._enqueue()
+        for attempt in range(1, report_jobs.MAX_ATTEMPTS + 1):
+            job = report_jobs._fail(report_jobs.claim_next_job(), ValueError("boom"))
+            expected = ReportJob.STATUS_FAILED if attempt == report_jobs.MAX_ATTEMPTS else ReportJob.STATUS_QUEUED
+            self.assertEqual(job.status, expected)
+
+    def test_revision_changes_with_materials(self):
+        before = report_jobs.intervention_revision(Intervention.objects.get(pk=self.intervention.pk))
+        material = InterventionMaterial.objects.create(
+            intervention=self.intervention, name="Câble", quantity=2, unit_cost=1000
+        )
+        after_add = report_jobs.intervention_revision(Intervention.objects.get(pk=self.intervention.pk))
+        self.assertNotEqual(before, after_add)
+        material.delete()
+        self.assertNotEqual(after_add, report_jobs.intervention_revision(Intervention.objects.get(pk=self.intervention.pk)))
+
+    def test_stale_running_job_is_requeued_then_failed(self):
+        job = self._enqueue()
+        report_jobs.claim_next_job()
+        ReportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - report_jobs.STALE_AFTER - timedelta(minutes=1))
+        self.assertEqual(report_jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, ReportJob.STATUS_QUEUED)
+
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.STATUS_RUNNING, attempts=report_jobs.MAX_ATTEMPTS,
+            started_at=timezone.now() - report_jobs.STALE_AFTER - timedelta(minutes=1),
+        )
+        self.assertEqual(report_jobs.requeue_stale_jobs(), 0)
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, ReportJob.STATUS_FAILED)
+
+
+class TicketListInvalidationTests(TestCase):
+    """Les listes de tickets en cache suivent le nom et le changement de client."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', userType='admin'
+        )
+        cls.client_user = User.objects.create_user(
+            username='client', email='client@example.com', password='pass', userType='client',
+            first_name='Awa', last_name='Diop',
+        )
+        Ticket.objects.create(title="Ticket", description="desc", client=Client.objects.get(user=cls.client_user))
+
+    def setUp(self):
+        cache.clear()
+
+    def _client_name(self, user):
+        api = APIClient()
+        api.force_authenticate(user)
+        return api.get('/api/tickets/').json()['results'][0]['client_name']
+
+    def test_rename_client_refreshes_cached_lists(self):
+        for user in (self.admin, self.client_user):
+            self.assertEqual(self._client_name(user), 'Awa Diop')
+
+        self.client_user.last_name = 'Ndiaye'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_user.save()
+
+        for user in (self.admin, self.client_user):
+            self.assertEqual(self._client_name(user), 'Awa Ndiaye')
+
+    def test_ticket_moved_to_another_client_leaves_previous_list(self):
+        other_user = User.objects.create_user(
+            username='other', email='other@example.com', password='pass', userType='client'
+        )
+        self.assertEqual(self._client_name(self.client_user), 'Awa Diop')
+
+        ticket = Ticket.objects.get()
+        ticket.client = Client.objects.get(user=other_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.save()
+
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        self.assertEqual(api.get('/api/tickets/').json()['results'], [])
+
+    def test_login_does_not_invalidate_lists(self):
+        self._client_name(self.admin)
+        self.client_user.last_login = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client_user.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+        # Sans update_fields : comparaison avec la base, rien d'affiché n'a changé
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            User.objects.get(pk=self.client_user.pk).save()
+        self.assertEqual(callbacks, [])
+
+
+class ResponseCacheTests(TestCase):
+    """Listes en cache : ETag, et invalidation par le registre à chaque écriture concernée."""
+
+    def setUp(self):
+        cache.clear()
+        self.procedure = Procedure.objects.create(
+            title="Réinitialiser le routeur", description="...", estimated_time="5 min", status='published'
+        )
+        self.api = APIClient()
+
+    def _titles(self):
+        return [row['title'] for row in self.api.get('/api/procedures/').json()]
+
+    def test_unchanged_list_answers_304(self):
+        etag = self.api.get('/api/procedures/')['ETag']
+        self.assertEqual(self.api.get('/api/procedures/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_procedure_save_refreshes_list(self):
+        self.assertEqual(self._titles(), ["Réinitialiser le routeur"])
+        self.procedure.title = "Redémarrer le routeur"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.procedure.save()
+        self.assertEqual(self._titles(), ["Redémarrer le routeur"])
+
+    def test_tag_change_refreshes_list(self):
+        self._titles()
+        tag = ProcedureTag.objects.create(name="réseau")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.procedure.tags.add(tag)
+        tags = self.api.get('/api/procedures/').json()[0]['tags']
+        self.assertEqual([tag['name'] for tag in tags], ["réseau"])
+
+    def test_nothing_invalidated_when_transaction_rolls_back(self):
+        before = response_cache.get_versions(['procedures'])
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.procedure.save()
+                raise RuntimeError
+        self.assertEqual(response_cache.get_versions(['procedures']), before)
+
+
+class UserListInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.technician_user = User.objects.create_user(
+            username='tech', email='tech@example.com', password='pass', userType='technician'
+        )
+        self.client_user = User.objects.create_user(
+            username='client', email='client@example.com', password='pass', userType='client'
+        )
+
+    def _versions(self):
+        return response_cache.get_versions(['users'])
+
+    def test_profile_edit_refreshes_user_lists(self):
+        for profile in (Technician.objects.get(user=self.technician_user), Client.objects.get(user=self.client_user)):
+            before = self._versions()
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.save()
+            self.assertNotEqual(self._versions(), before)
+
+
+class PresenceTests(TestCase):
+    """Présence des salons de chat (cache partagé entre workers)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass', userType='client', first_name='Alice'
+        )
+        cls.bob = User.objects.create_user(
+            username='bob', email='bob@example.com', password='pass', userType='technician', first_name='Bob'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _present_ids(self):
+        return set(presence._present('room'))
+
+    def test_concurrent_joins_keep_every_connection(self):
+        channels = [f"channel-{i}" for i in range(20)]
+        real_set = LocMemCache.set
+
+        def slow_index_write(backend, key, *args, **kwargs):
+            # Élargit la fenêtre entre lecture et écriture de l'index, comme deux workers
+            if key.endswith(':index'):
+                time.sleep(0.01)
+            return real_set(backend, key, *args, **kwargs)
+
+        # Sur la classe : chaque thread a sa propre instance du cache
+        with mock.patch.object(LocMemCache, 'set', autospec=True, side_effect=slow_index_write):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(lambda name: presence._touch('room', name, self.alice), channels))
+        self.assertEqual(cache.get(presence._key('room', 'index')), set(channels))
+
+    def test_user_counted_once_until_last_connection_leaves(self):
+        presence._touch('room', 'tab-1', self.alice)
+        presence._touch('room', 'tab-2', self.alice)
+        presence._leave('room', 'tab-1')
+        self.assertEqual(self._present_ids(), {str(self.alice.id)})
+        presence._leave('room', 'tab-2')
+        self.assertEqual(self._present_ids(), set())
+
+    def test_expired_connection_is_dropped_from_index(self):
+        presence._touch('room', 'alice-1', self.alice)
+        presence._touch('room', 'bob-1', self.bob)
+        cache.delete(presence._key('room', 'conn', 'bob-1'))  # TTL écoulé sans ping
+        self.assertEqual(self._present_ids(), {str(self.alice.id)})
+        self.assertEqual(cache.get(presence._key('room', 'index')), {'alice-1'})
+
+    def test_changes_report_only_the_difference(self):
+        presence._touch('room', 'alice-1', self.alice)
+        joined, left = presence._changes('room')
+        self.assertEqual([m['user_id'] for m in joined], [str(self.alice.id)])
+        self.assertEqual(left, [])
+
+        # Reconnexion rapide dans la fenêtre : rien à annoncer
+        presence._leave('room', 'alice-1')
+        presence._touch('room', 'alice-2', self.alice)
+        self.assertEqual(presence._changes('room'), ([], []))
+
+        presence._leave('room', 'alice-2')
+        joined, left = presence._changes('room')
+        self.assertEqual((joined, [m['user_id'] for m in left]), ([], [str(self.alice.id)]))
+
+    def test_one_broadcast_claim_per_window(self):
+        self.assertTrue(presence._claim_broadcast('room'))
+        self.assertFalse(presence._claim_broadcast('room'))
+        presence._changes('room')
+        self.assertTrue(presence._claim_broadcast('room'))
+
+    def test_lock_gives_up_when_cache_is_unavailable(self):
+        with mock.patch.object(presence, 'LOCK_TIMEOUT', 0.05), mock.patch.object(LocMemCache, 'add', return_value=False):
+            presence._touch('room', 'alice-1', self.alice)
+        self.assertEqual(self._present_ids(), {str(self.alice.id)})
+
+
+class ProcedureViewCounterTests(TestCase):
+    def setUp(self):
+        self.procedure = Procedure.objects.create(title="Procédure", description="...", estimated_time="5 min")
+        patcher = mock.patch.object(view_counter, '_buffer', view_counter.LocalViewBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_displayed_count_survives_flush(self):
+        loaded = Procedure.objects.get(pk=self.procedure.pk).views
+        self.assertEqual(loaded + view_counter.record_view(self.procedure.pk), 1)
+
+        loaded = Procedure.objects.get(pk=self.procedure.pk).views
+        with mock.patch.object(view_counter, 'FLUSH_INTERVAL', 0), self.captureOnCommitCallbacks(execute=True):
+            displayed = loaded + view_counter.record_view(self.procedure.pk)
+        self.assertEqual(displayed, 2)
+        self.assertEqual(Procedure.objects.get(pk=self.procedure.pk).views, 2)
+
+    def test_flush_invalidates_procedure_lists(self):
+        view_counter.record_view(self.procedure.pk)
+        before = response_cache.get_versions(['procedures'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(view_counter.flush(), 1)
+        self.assertNotEqual(response_cache.get_versions(['procedures']), before)
+
+        # Tampon vide : aucune écriture, aucune invalidation
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(view_counter.flush(), 0)
+        self.assertEqual(callbacks, [])
+
+
+class ChatConsumerTests(TransactionTestCase):
+    """Connexion au chat d'un ticket (WebSocket)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='client', email='client@example.com', password='pass', userType='client'
+        )
+        self.ticket = Ticket.objects.create(title="Ticket", description="desc", client=Client.objects.get(user=self.user))
+        self.app = URLRouter(routing.websocket_urlpatterns)
+
+    def _socket(self, query=''):
+        socket = WebsocketCommunicator(self.app, f'/ws/ticket/{self.ticket.id}/chat/?{query}')
+        socket.scope['user'] = self.user
+        return socket
+
+    def _history_after_connect(self, query=''):
+        """Première trame d'historique reçue après la présence."""
+        async def run():
+            socket = self._socket(query)
+            connected, _ = await socket.connect()
+            self.assertTrue(connected)
+            self.assertEqual((await socket.receive_json_from())['type'], 'presence')
+            frame = await socket.receive_json_from()
+            await socket.disconnect()
+            return frame
+        return async_to_sync(run)()
+
+    def test_impossible_since_date_asks_for_reset(self):
+        frame = self._history_after_connect('since=2026-13-45T00:00:00')
+        self.assertEqual((frame['type'], frame['messages'], frame['reset']), ('history', [], True))
+
+    def test_malformed_since_id_asks_for_reset(self):
+        frame = self._history_after_connect('since=2026-01-01T00:00:00&since_id=abc')
+        self.assertTrue(frame['reset'])
+
+    def test_unavailable_attachment_is_reported_to_sender(self):
+        sent = ChatAttachment.objects.create(
+            ticket=self.ticket, uploaded_by=self.user, image='chat_attachments/a.png',
+            message=Message.objects.create(ticket=self.ticket, user=self.user, content="déjà envoyée"),
+        )
+
+        async def run():
+            socket = self._socket()
+            await socket.connect()
+            await socket.receive_json_from()
+            frames = []
+            for attachment_id in (str(sent.id), 'abc'):
+                await socket.send_json_to({'type': 'chat', 'id': str(uuid.uuid4()), 'message': "Voir photo", 'attachment_id': attachment_id})
+                frames.append(await socket.receive_json_from())
+            await socket.disconnect()
+            return frames
+
+        for frame in async_to_sync(run)():
+            self.assertEqual(frame['type'], 'error')
+            self.assertEqual(frame['error'], "Attachment not found or already sent")
+        self.assertEqual(Message.objects.count(), 1)
+
+
+class ChatAttachmentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='client', email='client@example.com', password='pass', userType='client'
+        )
+        self.ticket = Ticket.objects.create(title="Ticket", description="desc", client=Client.objects.get(user=self.user))
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.url = f'/api/tickets/{self.ticket.id}/chat-attachments/'
+
+    def test_upload_must_really_be_an_image(self):
+        fake = SimpleUploadedFile('photo.png', b'<html>pas une image</html>', content_type='image/png')
+        response = self.api.post(self.url, {'file': fake}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ChatAttachment.objects.exists())
+
+    def test_valid_image_is_stored_with_its_size(self):
+        buffer = BytesIO()
+        PILImage.new('RGB', (40, 30)).save(buffer, 'PNG')
+        png = SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+        response = self.api.post(self.url, {'file': png}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['width'], response.json()['height']), (40, 30))
+
+    def test_purge_removes_only_old_unsent_attachments(self):
+        old, recent, sent = (
+            ChatAttachment.objects.create(ticket=self.ticket, uploaded_by=self.user, image=f'chat_attachments/{name}.png')
+            for name in ('old', 'recent', 'sent')
+        )
+        sent.message = Message.objects.create(ticket=self.ticket, user=self.user, content="photo")
+        sent.save(update_fields=['message'])
+        ChatAttachment.objects.filter(pk__in=[old.pk, sent.pk]).update(uploaded_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_chat_attachments', stdout=StringIO())
+        self.assertEqual(set(ChatAttachment.objects.values_list('pk', flat=True)), {recent.pk, sent.pk})
+
+
+class TicketPDFExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='client', email='client@example.com', password='pass', userType='client'
+        )
+        client = Client.objects.get(user=self.user)
+        for i in range(2):
+            Ticket.objects.create(title=f"Ticket {i}", description="desc", client=client)
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def _export(self, **params):
+        return self.api.get('/api/tickets/export/pdf/', params)
+
+    def test_multi_ticket_export_is_queued_once(self):
+        response = self._export()
+        self.assertEqual(response.status_code, 202)
+        job = ReportJob.objects.get(pk=response.data['id'])
+        self.assertEqual((job.kind, job.object_id, len(job.params['ticket_ids'])), ('tickets_pdf', self.user.id, 2))
+        self.assertEqual(self._export().data['id'], response.data['id'])
+
+    def test_zip_export_is_rendered_by_the_worker(self):
+        job_id = self._export(bundle='zip').data['id']
+        archive = tempfile.TemporaryFile()
+        archive.write(b'PK')
+        archive.seek(0)
+        with mock.patch('support.utils.export_utils.export_tickets_pdf_zip', return_value=archive):
+            self.assertEqual(report_jobs.process_next_job().status, ReportJob.STATUS_DONE)
+
+        response = self._export(bundle='zip')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ReportJob.objects.get(pk=job_id).file.read(), b'PK')
+
+    def test_crashed_render_process_is_retried(self):
+        job_id = self._export(bundle='zip').data['id']
+        with mock.patch('support.utils.export_utils.export_tickets_pdf_zip', side_effect=BrokenProcessPool):
+            job = report_jobs.process_next_job()
+        self.assertEqual((str(job.id), job.status), (job_id, ReportJob.STATUS_QUEUED))
+
+    def test_export_job_is_private(self):
+        job_id = self._export().data['id']
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass', userType='client')
+        self.api.force_authenticate(other)
+        self.assertEqual(self.api.get(f'/api/reports/{job_id}/').status_code, 403)
+
+class OutboxTests(TestCase):
+    """Boîte d'envoi WhatsApp : prise des messages, reprises et abandon."""
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client', email='client@example.com', password='pass', userType='client'
+        )
+        self.client_profile = Client.objects.get(user=self.client_user)
+
+    def _message(self, **fields):
+        fields = {'channel': OutboxMessage.CHANNEL_TWILIO_WHATSAPP, 'recipient': '+242000', 'body': "Bonjour", **fields}
+        return OutboxMessage.objects.create(**fields)
+
+    def test_ticket_creation_queues_message_for_admins(self):
+        User.objects.create_user(username='admin', email='admin@example.com', password='pass', userType='admin', phone='+242000')
+        Ticket.objects.create(title="Panne", description="desc", client=self.client_profile)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.recipient, message.status), ('+242000', OutboxMessage.STATUS_PENDING))
+        self.assertIn("Panne", message.body)
+
+    def test_no_message_when_ticket_transaction_rolls_back(self):
+        User.objects.create_user(username='admin', email='admin@example.com', password='pass', userType='admin', phone='+242000')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Ticket.objects.create(title="Panne", description="desc", client=self.client_profile)
+            raise RuntimeError
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_claim_takes_only_due_pending_messages_once(self):
+        due = self._message()
+        self._message(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self._message(status=OutboxMessage.STATUS_SENT)
+
+        claimed = outbox.claim_batch()
+        self.assertEqual([m.pk for m in claimed], [due.pk])
+        self.assertEqual(claimed[0].status, OutboxMessage.STATUS_SENDING)
+        self.assertIsNotNone(claimed[0].locked_at)
+        self.assertEqual(outbox.claim_batch(), [])
+
+    def test_failure_is_rescheduled_with_growing_delay(self):
+        message = self._message(status=OutboxMessage.STATUS_SENDING, locked_at=timezone.now())
+        delays = []
+        for _ in range(3):
+            before = timezone.now()
+            outbox.record_result(message, outbox.DeliveryError("indisponible"))
+            message.refresh_from_db()
+            self.assertEqual(message.status, OutboxMessage.STATUS_PENDING)
+            self.assertIsNone(message.locked_at)
+            delays.append((message.next_attempt_at - before).total_seconds())
+        self.assertEqual(message.attempts, 3)
+        self.assertEqual(message.last_error, "indisponible")
+        # 30 s, 60 s, 120 s à ±20 % près
+        for delay, expected in zip(delays, (30, 60, 120)):
+            self.assertAlmostEqual(delay, expected, delta=expected * 0.2 + 1)
+
+    def test_backoff_is_capped(self):
+        with mock.patch('tcikets.outbox.random.uniform', return_value=1):
+            self.assertEqual(outbox.backoff_delay(30), timedelta(seconds=outbox.BACKOFF_MAX_SECONDS))
+
+    def test_message_fails_after_max_attempts(self):
+        message = self._message(status=OutboxMessage.STATUS_SENDING, attempts=outbox.MAX_ATTEMPTS - 1)
+        outbox.record_result(message, outbox.DeliveryError("indisponible"))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.STATUS_FAILED, outbox.MAX_ATTEMPTS))
+
+    def test_success_marks_sent(self):
+        message = self._message(status=OutboxMessage.STATUS_SENDING, last_error="indisponible")
+        outbox.record_result(message, None)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.last_error), (OutboxMessage.STATUS_SENT, ''))
+        self.assertIsNotNone(message.sent_at)
+
+    def test_stale_sending_message_is_requeued(self):
+        stale = self._message(status=OutboxMessage.STATUS_SENDING, locked_at=timezone.now() - outbox.STALE_AFTER * 2)
+        fresh = self._message(status=OutboxMessage.STATUS_SENDING, locked_at=timezone.now())
+
+        self.assertEqual(outbox.requeue_stale_messages(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, fresh.status), (OutboxMessage.STATUS_PENDING, OutboxMessage.STATUS_SENDING))
+
+    def test_drain_sends_and_records_each_result(self):
+        ok, ko = self._message(recipient='+242001'), self._message(recipient='+242002')
+
+        def send(message):
+            if message.recipient == ko.recipient:
+                raise outbox.DeliveryError("refusé")
+
+        with mock.patch.dict(outbox.SENDERS, {OutboxMessage.CHANNEL_TWILIO_WHATSAPP: send}):
+            self.assertEqual(len(outbox.drain(workers=2)), 2)
+        ok.refresh_from_db()
+        ko.refresh_from_db()
+        self.assertEqual((ok.status, ko.status, ko.attempts), (OutboxMessage.STATUS_SENT, OutboxMessage.STATUS_PENDING, 1))
+
+
+class RatingAggregateTests(TestCase):
+    """rating_sum / rating_count des profils suivent les notes créées, modifiées, déplacées, supprimées."""
+
+    def setUp(self):
+        self.clients = [
+            Client.objects.get(user=User.objects.create_user(
+                username=f'client{i}', email=f'client{i}@example.com', password='pass', userType='client'
+            ))
+            for i in range(2)
+        ]
+        self.technicians = [
+            Technician.objects.get(user=User.objects.create_user(
+                username=f'tech{i}', email=f'tech{i}@example.com', password='pass', userType='technician'
+            ))
+            for i in range(2)
+        ]
+
+    def _aggregates(self, profiles):
+        return [
+            tuple(type(profile).objects.filter(pk=profile.pk).values_list('rating_sum', 'rating_count').get())
+            for profile in profiles
+        ]
+
+    def test_rating_changes_update_aggregates(self):
+        rating = TechnicianRating.objects.create(technician=self.technicians[0], client=self.clients[0], rating=4)
+        self.assertEqual(self._aggregates(self.technicians), [(4, 1), (0, 0)])
+        rating.rating = 2
+        rating.save()
+        self.assertEqual(self._aggregates(self.technicians), [(2, 1), (0, 0)])
+        rating.delete()
+        self.assertEqual(self._aggregates(self.technicians), [(0, 0), (0, 0)])
+
+    def test_moved_technician_rating_leaves_previous_profile(self):
+        rating = TechnicianRating.objects.create(technician=self.technicians[0], client=self.clients[0], rating=4)
+        rating.technician = self.technicians[1]
+        rating.rating = 5
+        rating.save()
+        self.assertEqual(self._aggregates(self.technicians), [(0, 0), (5, 1)])
+
+    def test_moved_client_rating_leaves_previous_profile(self):
+        rating = ClientRating.objects.create(client=self.clients[0], technician=self.technicians[0], rating=3)
+        rating.client = self.clients[1]
+        rating.save()
+        self.assertEqual(self._aggregates(self.clients), [(0, 0), (3, 1)])
+
+
+class TicketCodeSequenceTests(TestCase):
+    def test_reserve_is_a_single_query_and_never_reuses_numbers(self):
+        with self.assertNumQueries(1):
+            first = TicketCodeSequence.reserve(2030)
+        with self.assertNumQueries(1):
+            block = TicketCodeSequence.reserve(2030, 3)
+        self.assertEqual((list(first), list(block)), ([1], [2, 3, 4]))
+        self.assertEqual(Ticket.reserve_codes(2, year=2031), [Ticket.format_code(1, 2031), Ticket.format_code(2, 2031)])
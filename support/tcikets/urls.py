@@ -6,7 +6,8 @@ from .search_views import (
     TicketSearchView,
     ProcedureSearchView,
     InterventionSearchView,
-    UserSearchView
+    UserSearchView,
+    SearchSuggestView,
 )
 urlpatterns = [
   path(
@@ -22,11 +23,15 @@ urlpatterns = [
 
 
     # Tickets
-    path("tickets/export/excel/", views.ExportTicketPDFView.as_view(), name='export-tickets'),
+    # ?format= est réservé à DRF (choix du renderer) : le format vient de l'URL
+    path("tickets/export/excel/", views.ExportTicketPDFView.as_view(), {'file_format': 'xlsx'}, name='export-tickets'),
       path("tickets/export/pdf/", views.ExportTicketPDFView.as_view(), name='export-tickets'),
+    path('tickets/export/csv/', views.TicketCSVExportView.as_view(), name='export-tickets-csv'),
 
     path('tickets/', views.TicketListCreateView.as_view(), name='ticket-list'),
     path('tickets/<uuid:id>/', views.TicketRetrieveUpdateDestroyView.as_view(), name='ticket-detail'),
+    # Avant ticket-actions, qui capture tickets/<id>/<action>/
+    path('tickets/<uuid:ticket_id>/chat-attachments/', views.ChatAttachmentUploadView.as_view(), name='chat-attachment-upload'),
     path('tickets/<uuid:pk>/<str:action>/', views.TicketActionsView.as_view(), name='ticket-actions'),
     path('tickets/<uuid:ticket_id>/interventions/', views.InterventionByTicketView.as_view(), name='ticket-interventions'),
 
@@ -34,7 +39,10 @@ urlpatterns = [
     path('interventions/', views.InterventionListView.as_view(), name='intervention-list-create'),
     path('interventions/<uuid:pk>/', views.InterventionRetrieveUpdateDestroyView.as_view(), name='intervention-detail'),
     path('interventions/<uuid:intervention_id>/export/pdf/', views.download_intervention_report, name='intervention-pdf-report'),
+    path('reports/<uuid:job_id>/', views.ReportJobDetailView.as_view(), name='report-job-detail'),
+    path('reports/<uuid:job_id>/download/', views.ReportJobDownloadView.as_view(), name='report-job-download'),
     path('interventions/monthly-report/excel/', views.MonthlyReportExcelView.as_view(), name='monthly-excel-report'),
+    path('interventions/export/parquet/', views.InterventionParquetExportView.as_view(), name='export-interventions-parquet'),
 
     # Profil utilisateur
     path('profile/', views.UserProfileView.as_view(), name='user-profile'),
@@ -97,6 +105,7 @@ urlpatterns = [
     #serach section
     
     path("search/", GlobalSearchView.as_view(), name="global-search"),
+    path("search/suggest/", SearchSuggestView.as_view(), name="search-suggest"),
     path("search/tickets/", TicketSearchView.as_view(), name="search-tickets"),
     path("search/procedures/", ProcedureSearchView.as_view(), name="search-procedures"),
     path("search/interventions/", InterventionSearchView.as_view(), name="search-interventions"),
@@ -0,0 +1,187 @@
+# view_counter.py
+"""
+Compteur de vues des procédures, tamponné hors de la base.
+
+Chaque lecture incrémente un tampon (hash Redis si le cache est django_redis,
+dictionnaire en mémoire sinon) ; les incréments sont reportés dans Procedure.views
+par un seul UPDATE ... CASE, au plus une fois par PROCEDURE_VIEWS_FLUSH_INTERVAL,
+via `manage.py flush_procedure_views`, et à l'arrêt du processus. Un report invalide
+la liste des procédures en cache (namespace "procedures"), qui affiche les vues.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, When
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'PROCEDURE_VIEWS_FLUSH_INTERVAL', 60)  # secondes
+DEDUP_WINDOW = getattr(settings, 'PROCEDURE_VIEWS_DEDUP_SECONDS', 0)  # 0 = pas de dédoublonnage
+
+REDIS_KEY = 'tcikets:procedure_views'
+FLUSH_LOCK_KEY = 'procedure_views_flush_lock'
+
+
+class LocalViewBuffer:
+    """Tampon propre au processus (dev, ou cache sans Redis)."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def incr(self, pk):
+        with self._lock:
+            self._counts[pk] = self._counts.get(pk, 0) + 1
+            return self._counts[pk]
+
+    def pending(self, pk):
+        return self._counts.get(pk, 0)
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._last_flush = time.monotonic()
+        return counts
+
+    def restore(self, counts):
+        with self._lock:
+            for pk, count in counts.items():
+                self._counts[pk] = self._counts.get(pk, 0) + count
+
+    def flush_due(self):
+        return time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+
+
+class RedisViewBuffer:
+    """Tampon partagé par tous les workers : HINCRBY sur un hash Redis."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def incr(self, pk):
+        return self.client.hincrby(REDIS_KEY, str(pk), 1)
+
+    def pending(self, pk):
+        return int(self.client.hget(REDIS_KEY, str(pk)) or 0)
+
+    def drain(self):
+        # RENAME est atomique : les vues arrivant pendant le flush vont dans un nouveau hash
+        flushing_key = f"{REDIS_KEY}:flushing:{uuid.uuid4().hex}"
+        try:
+            self.client.rename(REDIS_KEY, flushing_key)
+        except Exception:
+            # Clé absente : rien à reporter
+            return {}
+        pipe = self.client.pipeline()
+        pipe.hgetall(flushing_key)
+        pipe.delete(flushing_key)
+        raw, _ = pipe.execute()
+        return {_decode(pk): int(count) for pk, count in raw.items()}
+
+    def restore(self, counts):
+        pipe = self.client.pipeline()
+        for pk, count in counts.items():
+            pipe.hincrby(REDIS_KEY, str(pk), count)
+        pipe.execute()
+
+    def flush_due(self):
+        # Un seul worker gagne le verrou par intervalle
+        return cache.add(FLUSH_LOCK_KEY, 1, FLUSH_INTERVAL)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = _build_buffer()
+    return _buffer
+
+
+def _build_buffer():
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.startswith('django_redis'):
+        try:
+            from django_redis import get_redis_connection
+            return RedisViewBuffer(get_redis_connection('default'))
+        except Exception as e:
+            logger.warning(f"Redis indisponible pour le compteur de vues, tampon local : {e}")
+    buffer = LocalViewBuffer()
+    atexit.register(flush)
+    return buffer
+
+
+def _viewer_id(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    ip = forwarded.split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+    return f"ip:{ip}"
+
+
+def record_view(procedure_pk, request=None):
+    """
+    Comptabilise une vue et renvoie le nombre de vues absentes de `procedure.views`
+    tel que chargé par l'appelant (en tampon, ou reportées par ce même appel), à
+    ajouter pour afficher le total courant.
+    """
+    buffer = get_buffer()
+    try:
+        if request is not None and DEDUP_WINDOW:
+            viewer = hashlib.md5(_viewer_id(request).encode()).hexdigest()
+            if not cache.add(f"procedure_view_seen_{procedure_pk}_{viewer}", 1, DEDUP_WINDOW):
+                return buffer.pending(procedure_pk)
+        pending = buffer.incr(procedure_pk)
+        if buffer.flush_due():
+            # Les vues reportées ne sont pas dans `procedure.views` déjà chargé par l'appelant
+            flushed = _flush_counts()
+            pending = flushed.get(str(procedure_pk), 0) + buffer.pending(procedure_pk)
+        return pending
+    except Exception as e:
+        # Le compteur ne doit jamais faire échouer la lecture d'une procédure
+        logger.warning(f"Compteur de vues indisponible : {e}")
+        return 0
+
+
+def flush():
+    """Reporte le tampon dans Procedure.views en un seul UPDATE. Renvoie le nombre de vues reportées."""
+    return sum(_flush_counts().values())
+
+
+def _flush_counts():
+    """Reporte le tampon ; renvoie les vues reportées par procédure {str(pk): nombre}."""
+    from .cache_registry import invalidate_on_commit
+    from .models import Procedure
+
+    buffer = get_buffer()
+    counts = buffer.drain()
+    if not counts:
+        return {}
+    try:
+        updated = Procedure.objects.filter(pk__in=list(counts)).update(views=Case(
+            *[When(pk=pk, then=F('views') + count) for pk, count in counts.items()],
+            default=F('views'),
+            output_field=IntegerField(),
+        ))
+    except Exception:
+        buffer.restore(counts)
+        raise
+    # update() n'envoie pas de signal : le registre du cache ne voit pas ce report
+    if updated:
+        invalidate_on_commit('procedures')
+    return {str(pk): count for pk, count in counts.items()}
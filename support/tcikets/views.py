@@ -1,13 +1,19 @@
+from django.db import transaction
 from django.db.models import Prefetch, Count, Q, F
 import logging
+import os
 import uuid
 import calendar
+from datetime import date
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, parse_http_date_safe
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.core.cache import cache
+from PIL import Image as PILImage
 
 from rest_framework import permissions, status, serializers
 from rest_framework.permissions import IsAuthenticated
@@ -26,19 +32,23 @@ from rest_framework.exceptions import ValidationError, PermissionDenied
 # from support.utils.report_utils import export_intervention_pdf, export_monthly_report_excel
 # from support.utils.pdf_utils import intervention_to_pdf_buffer
 
-from .permissions import IsAdminOrOwner
+from .permissions import IsAdminOrOwner, IsAdminType
+from .pagination import TicketCursorPagination, InterventionCursorPagination
+from .response_cache import CachedResponseMixin
+from .cache_registry import ticket_scope_namespace
 from .models import (
     User, Client, Technician, Ticket, Intervention, TicketImage, TechnicianRating, ClientRating,
-    Message, PendingConfirmation
+    Message, ChatAttachment, PendingConfirmation, ReportJob
 )
 from .serializers import (
     ClientSerializer, ClientCreateSerializer,
     TechnicianSerializer, TechnicianCreateSerializer,
-    TicketSerializer, TicketCreateSerializer,
+    TicketSerializer, TicketCreateSerializer, TicketListSerializer,
     InterventionSerializer, InterventionCreateSerializer,
     UserSerializer, TechnicianRatingSerializer,
-    ClientRatingSerializer, MessageSerializer
+    ClientRatingSerializer, MessageSerializer, ChatAttachmentSerializer, ReportJobSerializer
 )
+from . import report_jobs
 from support.utils.whatsapp_service import WhatsAppService
 
 logger = logging.getLogger(__name__)
@@ -64,15 +74,60 @@ def check_ticket_permission(user, ticket):
         return ticket.technician and ticket.technician.user == user
     return False
 
-def generate_intervention_pdf(intervention):
-    """Generate PDF for intervention - placeholder function"""
-    try:
-        from support.utils.pdf_utils import intervention_to_pdf_buffer
-        buffer = intervention_to_pdf_buffer(intervention)
-        return f"/media/interventions/{intervention.id}.pdf"
-    except (ImportError, OSError) as e:
-        logger.error(f"Erreur génération PDF intervention: {str(e)}")
-        return None
+def enqueue_intervention_report(intervention, request):
+    """
+    Rapport PDF d'une intervention via la file ReportJob (rendu par run_report_worker).
+    Renvoie le PDF déjà rendu pour la révision courante (intervention, ticket, gabarit),
+    sinon une tâche en attente.
+    """
+    revision = report_jobs.intervention_revision(intervention)
+    job = report_jobs.cached_report('intervention_pdf', revision)
+    if job is None:
+        job = report_jobs.enqueue('intervention_pdf', intervention.id, user=request.user, cache_key=revision)
+    return job
+
+
+def enqueue_tickets_export(tickets, request):
+    """
+    Export PDF de plusieurs tickets via la file ReportJob : un seul PDF, ou une archive
+    d'un PDF par ticket (?bundle=zip). Réutilise l'export déjà rendu pour ces tickets.
+    """
+    kind = 'tickets_pdf_zip' if request.GET.get('bundle') == 'zip' else 'tickets_pdf'
+    revision = report_jobs.tickets_revision(kind, request.user.id, tickets)
+    job = report_jobs.cached_report(kind, revision)
+    if job is None:
+        ticket_ids = [str(ticket_id) for ticket_id in tickets.order_by('created_at').values_list('id', flat=True)]
+        job = report_jobs.enqueue(
+            kind, request.user.id, user=request.user, params={'ticket_ids': ticket_ids}, cache_key=revision
+        )
+    return job
+
+
+def report_response(request, job):
+    """
+    Rapport terminé : redirection vers le fichier avec ETag (révision) et Last-Modified,
+    304 si le client a déjà cette révision. Sinon 202 (en cours) ou 503 (échec).
+    """
+    if job.status == ReportJob.STATUS_DONE:
+        etag = f'"{job.cache_key or job.id}"'
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if (if_none_match and etag in if_none_match) or (
+            not if_none_match and if_modified_since and int(job.finished_at.timestamp()) <= if_modified_since
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponseRedirect(job.file.url)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(job.finished_at.timestamp())
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response
+    if job.status == ReportJob.STATUS_FAILED:
+        return Response(
+            {'error': f"Génération du rapport échouée: {job.error}"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return Response(ReportJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
 
 class ClientRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -93,54 +148,44 @@ class TechnicianRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
         return TechnicianSerializer
 
 # ---------- TICKETS ----------
-class TicketListCreateView(ListCreateAPIView):
+def visible_tickets(user, queryset=None):
+    """
+    Tickets visibles selon le rôle : le client voit les siens, le technicien ceux
+    qui lui sont assignés, l'admin tout. Réutilisé par la recherche (search_views).
+    """
+    queryset = Ticket.objects.all() if queryset is None else queryset
+    if user.userType == "client":
+        return queryset.filter(client__user=user)
+    if user.userType == "technician":
+        return queryset.filter(technician__user=user)
+    return queryset
+
+
+class TicketListCreateView(CachedResponseMixin, ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = TicketCursorPagination
 
-    def get_queryset(self):
-        user = self.request.user
-        cache_key = f"tickets_user_{user.id}_{user.userType}_ids"
-        cached_ids = cache.get(cache_key)
-        if cached_ids is not None:
-            return Ticket.objects.filter(id__in=cached_ids).select_related(
-                'client__user', 'technician__user'
-            ).prefetch_related(
-                Prefetch('images', queryset=TicketImage.objects.only('id', 'image', 'ticket_id')),
-                Prefetch('interventions', queryset=Intervention.objects.select_related(
-                    'technician__user'
-                ).only('id', 'ticket_id', 'status', 'intervention_date', 'technician_id'))
-            )
+    def get_cache_namespaces(self):
+        # Une génération par périmètre : un ticket modifié n'invalide que
+        # l'admin, son client et ses techniciens (cf. cache_registry.ticket_namespaces)
+        return (ticket_scope_namespace(self.request.user),)
 
+    def get_queryset(self):
         base_qs = Ticket.objects.select_related(
             'client__user', 'technician__user'
         ).prefetch_related(
-            Prefetch('images', queryset=TicketImage.objects.only('id', 'image', 'ticket_id')),
-            Prefetch('interventions', queryset=Intervention.objects.select_related(
-                'technician__user'
-            ).only('id', 'ticket_id', 'status', 'intervention_date', 'technician_id'))
-        )
-
-        if user.userType == "client":
-            try:
-                profile = Client.objects.get(user=user)
-                qs = base_qs.filter(client=profile)
-            except Client.DoesNotExist:
-                qs = Ticket.objects.none()
-        elif user.userType == "technician":
-            try:
-                profile = Technician.objects.get(user=user)
-                qs = base_qs.filter(technician=profile)
-            except Technician.DoesNotExist:
-                qs = Ticket.objects.none()
-        else:
-            qs = base_qs
+            Prefetch('images', queryset=TicketImage.objects.only(
+                'id', 'image', 'file_extension', 'ticket_id'
+            ).order_by('uploaded_at'))
+        ).annotate(message_count=Count('messages', distinct=True))
 
-        ids = list(qs.values_list('id', flat=True))
-        cache.set(cache_key, ids, 300)
-        return qs
+        return visible_tickets(self.request.user, base_qs)
 
     def get_serializer_class(self):
-        return TicketCreateSerializer if self.request.method == "POST" else TicketSerializer
+        return TicketCreateSerializer if self.request.method == "POST" else TicketListSerializer
 
+    # Ticket, notifications et boîte d'envoi (cf. signals) validés ensemble
+    @transaction.atomic
     def perform_create(self, serializer):
         user = self.request.user
         if user.userType == "client":
@@ -155,8 +200,6 @@ class TicketListCreateView(ListCreateAPIView):
         else:
             raise ValidationError("Only clients or admins can create tickets")
 
-        cache_key = f"tickets_user_{user.id}_{user.userType}_ids"
-        cache.delete(cache_key)
         return ticket
 
 
@@ -260,18 +303,14 @@ class TicketActionsView(APIView):
         ticket.save()
         return Response({'status': 'diagnostic started'})
 
-class InterventionListView(ListCreateAPIView):
+class InterventionListView(CachedResponseMixin, ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = InterventionSerializer
+    pagination_class = InterventionCursorPagination
+    cache_namespaces = ('interventions',)
 
     def get_queryset(self):
         ticket_id = self.request.query_params.get('ticket')
-        cache_key = f"interventions_ticket_{ticket_id or 'all'}"
-
-        cached_qs = cache.get(cache_key)
-        if cached_qs is not None:
-            return cached_qs
-
         queryset = Intervention.objects.select_related(
             'ticket__client__user', 'ticket__technician__user', 'technician__user'
         ).prefetch_related('images', 'materials', 'expenses')
@@ -279,21 +318,12 @@ class InterventionListView(ListCreateAPIView):
         if ticket_id:
             queryset = queryset.filter(ticket_id=ticket_id)
 
-        cache.set(cache_key, queryset, 300)
         return queryset
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return InterventionCreateSerializer
         return InterventionSerializer
-            
-    def perform_create(self, serializer):
-        intervention = super().perform_create(serializer)
-        # Invalider le cache lié
-        ticket_id = str(intervention.ticket.id)
-        cache.delete(f"interventions_ticket_{ticket_id}")
-        cache.delete(f"interventions_ticket_all")
-        return interventio
 
 class InterventionRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -330,18 +360,13 @@ class InterventionByTicketView(ListAPIView):
         ticket_id = self.kwargs['ticket_id']
         return Intervention.objects.filter(ticket_id=ticket_id)
 
-class UserListView(ListCreateAPIView):
+class UserListView(CachedResponseMixin, ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
+    cache_namespaces = ('users',)
 
     def get_queryset(self):
         user = self.request.user
-        cache_key = f"users_list_{user.id}_{user.userType}"
-
-        cached_qs = cache.get(cache_key)
-        if cached_qs is not None:
-            return cached_qs
-
         queryset = User.objects.only(
             'id', 'username', 'first_name', 'last_name',
             'email', 'userType', 'phone', 'avatar'
@@ -350,16 +375,7 @@ class UserListView(ListCreateAPIView):
         if user.userType not in ['admin', 'staff']:
             queryset = queryset.filter(id=user.id)
 
-        cache.set(cache_key, queryset, 300)
         return queryset
-
-    def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        if response.status_code == 201:
-            # Invalider le cache après création
-            user = request.user
-            cache.delete(f"users_list_{user.id}_{user.userType}")
-        return response
     
     
 class UserDetailView(RetrieveUpdateDestroyAPIView):
@@ -491,31 +507,27 @@ class UserRatingsView(APIView):
 
         if user.userType == "technician":
             technician = user.technician_profile
-            ratings = TechnicianRating.objects.filter(technician=technician)
+            ratings = TechnicianRating.objects.filter(
+                technician=technician
+            ).select_related('client__user')
 
             response_data["technician_ratings"] = TechnicianRatingSerializer(
                 ratings, many=True
             ).data
-            response_data["average_rating"] = (
-                sum([r.rating for r in ratings]) / ratings.count()
-                if ratings.exists()
-                else 0
-            )
-            response_data["total_ratings"] = ratings.count()
+            response_data["average_rating"] = technician.average_rating()
+            response_data["total_ratings"] = technician.rating_count
 
         elif user.userType == "client":
             client = user.client_profile
-            ratings = ClientRating.objects.filter(client=client)
+            ratings = ClientRating.objects.filter(
+                client=client
+            ).select_related('technician__user')
 
             response_data["client_ratings"] = ClientRatingSerializer(
                 ratings, many=True
             ).data
-            response_data["average_rating"] = (
-                sum([r.rating for r in ratings]) / ratings.count()
-                if ratings.exists()
-                else 0
-            )
-            response_data["total_ratings"] = ratings.count()
+            response_data["average_rating"] = client.average_rating()
+            response_data["total_ratings"] = client.rating_count
 
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -572,7 +584,7 @@ class ExportTicketPDFView(APIView):
     def get(self, request, *args, **kwargs):
         user = request.user
         ticket_id = request.GET.get('ticket_id')
-        file_format = request.GET.get('format', 'pdf').lower()
+        file_format = request.GET.get('format', kwargs.get('file_format', 'pdf')).lower()
 
         if ticket_id:
             tickets = Ticket.objects.filter(id=ticket_id, client__user=user)
@@ -583,14 +595,23 @@ class ExportTicketPDFView(APIView):
             return HttpResponse("No tickets found", status=404)
 
         if file_format == 'pdf':
+            count = tickets.count()
+            max_tickets = getattr(settings, 'PDF_EXPORT_MAX_TICKETS', 200)
+            if count > max_tickets:
+                return HttpResponse(
+                    f"Trop de tickets pour un export PDF ({count} > {max_tickets}) : utilisez l'export Excel ou CSV.",
+                    status=400
+                )
+            if count > 1:
+                # Plusieurs tickets : rendu par run_report_worker, pas dans la requête
+                return report_response(request, enqueue_tickets_export(tickets, request))
             try:
                 # Import lazy
-                from support.utils.export_utils import export_ticket_pdf
-                
-                ticket = tickets.first()
-                buffer = export_ticket_pdf(ticket)
-                response = HttpResponse(buffer, content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="ticket_{ticket.id}.pdf"'
+                from support.utils import export_utils
+
+                ticket = export_utils.ticket_pdf_queryset(tickets).get()
+                response = HttpResponse(export_utils.export_ticket_pdf(ticket), content_type='application/pdf')
+                response['Content-Disposition'] = f'attachment; filename="{export_utils.ticket_pdf_filename(ticket)}"'
                 return response
             except (ImportError, OSError) as e:
                 return HttpResponse(
@@ -602,14 +623,9 @@ class ExportTicketPDFView(APIView):
             try:
                 # Import lazy
                 from support.utils.export_utils import export_tickets_excel
-                
-                buffer = export_tickets_excel(tickets)
-                response = HttpResponse(
-                    buffer,
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
-                response['Content-Disposition'] = 'attachment; filename="tickets_report.xlsx"'
-                return response
+                from support.utils.excel_stream import excel_response
+
+                return excel_response(export_tickets_excel(tickets), "tickets_report.xlsx")
             except (ImportError, OSError) as e:
                 return HttpResponse(f"Export Excel échoué: {str(e)}", status=500)
 
@@ -627,19 +643,8 @@ class InterventionPDFReportView(APIView):
 
         self.check_object_permissions(request, intervention)
 
-        try:
-            # Import lazy
-            from support.utils.report_utils import export_intervention_pdf
-            
-            buffer = export_intervention_pdf(intervention)
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="intervention_report_{intervention.id}.pdf"'
-            return response
-        except (ImportError, OSError) as e:
-            return HttpResponse(
-                f"Export PDF non disponible: {str(e)}",
-                status=503
-            )
+        # Rendu asynchrone (file ReportJob), comme download_intervention_report
+        return report_response(request, enqueue_intervention_report(intervention, request))
 
 
 
@@ -690,10 +695,12 @@ class MonthlyReportExcelView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # Bornes de dates plutôt que __month (EXTRACT) : la requête reste sur l'index intervention_date
+        first_day = date(year, month, 1)
+        next_month = date(year + month // 12, month % 12 + 1, 1)
         interventions = Intervention.objects.filter(
-            intervention_date__year=year,
-            intervention_date__month=month
-        ).select_related('ticket', 'ticket__client', 'technician', 'technician__user'
+            intervention_date__gte=first_day,
+            intervention_date__lt=next_month
         ).order_by('intervention_date', 'start_time')
         
         if not interventions.exists():
@@ -705,8 +712,9 @@ class MonthlyReportExcelView(APIView):
         try:
             # Import lazy
             from support.utils.report_utils import export_monthly_report_excel
+            from support.utils.excel_stream import excel_response
             
-            buffer = export_monthly_report_excel(interventions, month, year)
+            report_file = export_monthly_report_excel(interventions, month, year)
         except Exception as e:
             return Response(
                 {'error': f'Error generating Excel report: {str(e)}'},
@@ -716,29 +724,162 @@ class MonthlyReportExcelView(APIView):
         month_name = calendar.month_name[month]
         filename = f"monthly_intervention_report_{month_name}_{year}.xlsx"
         
-        response = HttpResponse(
-            buffer.getvalue(), 
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return excel_response(report_file, filename)
+
+# ---------- EXPORTS EN MASSE (BI) ----------
+TICKET_CSV_COLUMNS = [
+    ('code', 'code'),
+    ('id', 'id'),
+    ('titre', 'title'),
+    ('statut', 'status'),
+    ('priorite', 'priority'),
+    ('type_probleme', 'problem_type'),
+    ('client', 'client__company'),
+    ('client_username', 'client__user__username'),
+    ('technicien_username', 'technician__user__username'),
+    ('cree_le', 'created_at'),
+    ('modifie_le', 'updated_at'),
+]
+
+
+def intervention_parquet_columns():
+    """(nom, lookup, type pyarrow, conversion) : types explicites, identiques d'un row group à l'autre."""
+    import pyarrow as pa
+
+    return [
+        ('code', 'code', pa.string(), None),
+        ('id', 'id', pa.string(), str),
+        ('ticket_code', 'ticket__code', pa.string(), None),
+        ('ticket_id', 'ticket_id', pa.string(), str),
+        ('technicien_username', 'technician__user__username', pa.string(), None),
+        ('date', 'intervention_date', pa.date32(), None),
+        ('heure_debut', 'start_time', pa.time64('us'), None),
+        ('heure_fin', 'end_time', pa.time64('us'), None),
+        ('statut', 'status', pa.string(), None),
+        ('heures_travaillees', 'hours_worked', pa.decimal128(5, 2), None),
+        ('temps_deplacement', 'travel_time', pa.decimal128(5, 2), None),
+        ('frais_transport', 'transport_cost', pa.decimal128(10, 2), None),
+        ('frais_supplementaires', 'additional_costs', pa.decimal128(10, 2), None),
+        ('cout_total', 'total_cost', pa.decimal128(10, 2), None),
+        ('note_client', 'customer_rating', pa.int8(), None),
+    ]
+
+
+def bulk_export_filters(request, queryset, date_lookup, status_choices):
+    """
+    Filtres communs des exports : ?date_from=AAAA-MM-JJ&date_to=AAAA-MM-JJ&status=a,b
+    (bornes de dates incluses).
+    """
+    for param, suffix in (('date_from', 'gte'), ('date_to', 'lte')):
+        value = request.query_params.get(param)
+        if value:
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValidationError({param: "Date invalide, format attendu AAAA-MM-JJ"})
+            queryset = queryset.filter(**{f"{date_lookup}__{suffix}": day})
+
+    statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+    if statuses:
+        allowed = {value for value, _ in status_choices}
+        unknown = set(statuses) - allowed
+        if unknown:
+            raise ValidationError({'status': f"Statut(s) inconnu(s): {', '.join(sorted(unknown))}"})
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+class TicketCSVExportView(APIView):
+    """Tickets en CSV, envoyés lot par lot pendant la lecture en base."""
+    permission_classes = [IsAuthenticated, IsAdminType]
+
+    def get(self, request):
+        from support.utils.bulk_export import iter_csv
+
+        tickets = bulk_export_filters(
+            request, Ticket.objects.order_by('created_at'), 'created_at__date', Ticket.STATUS_CHOICES
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
+        response = StreamingHttpResponse(iter_csv(tickets, TICKET_CSV_COLUMNS), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="tickets_{timezone.localdate():%Y%m%d}.csv"'
         return response
 
-def download_intervention_report(request, intervention_id):
-    intervention = get_object_or_404(Intervention, id=intervention_id)
-    
-    try:
-        # Import lazy
-        from support.utils.pdf_utils import intervention_to_pdf_buffer
-        
-        pdf_buffer = intervention_to_pdf_buffer(intervention)
-        
-        response = HttpResponse(pdf_buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="intervention_report_{intervention_id}.pdf"'
-        
+
+class InterventionParquetExportView(APIView):
+    """Interventions en Parquet (colonnes typées, un row group par lot)."""
+    permission_classes = [IsAuthenticated, IsAdminType]
+
+    def get(self, request):
+        from support.utils.bulk_export import parquet_available, write_parquet
+        from support.utils.excel_stream import iter_file
+
+        if not parquet_available():
+            return Response(
+                {'error': "Export Parquet non disponible: installez pyarrow."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        interventions = bulk_export_filters(
+            request, Intervention.objects.order_by('intervention_date', 'start_time'),
+            'intervention_date', Intervention.INTERVENTION_STATUS
+        )
+        parquet_file = write_parquet(interventions, intervention_parquet_columns())
+        response = StreamingHttpResponse(iter_file(parquet_file), content_type='application/vnd.apache.parquet')
+        response['Content-Length'] = os.fstat(parquet_file.fileno()).st_size
+        response['Content-Disposition'] = f'attachment; filename="interventions_{timezone.localdate():%Y%m%d}.parquet"'
         return response
-    except (ImportError, OSError) as e:
-        return HttpResponse(f"PDF generation failed: {str(e)}", status=503)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_intervention_report(request, intervention_id):
+    """
+    Le PDF n'est plus rendu dans la requête : redirection vers le rapport s'il est prêt
+    pour la révision courante, sinon 202 avec la tâche à suivre (reports/<id>/).
+    """
+    intervention = get_object_or_404(
+        Intervention.objects.select_related('ticket__client__user', 'ticket__technician__user'), id=intervention_id
+    )
+    if not check_ticket_permission(request.user, intervention.ticket):
+        return Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+    return report_response(request, enqueue_intervention_report(intervention, request))
+
+
+def _can_access_report(user, job):
+    if user.userType == 'admin' or user.is_staff or job.requested_by_id == user.id:
+        return True
+    if job.kind in ('tickets_pdf', 'tickets_pdf_zip'):
+        return job.object_id == user.id
+    # Un PDF en cache est partagé par tous ceux qui ont accès à l'intervention
+    if job.kind == 'intervention_pdf':
+        intervention = Intervention.objects.select_related(
+            'ticket__client__user', 'ticket__technician__user'
+        ).filter(id=job.object_id).first()
+        return bool(intervention) and bool(check_ticket_permission(user, intervention.ticket))
+    return False
+
+
+class ReportJobDetailView(APIView):
+    """Statut d'une tâche de rapport."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id)
+        if not _can_access_report(request.user, job):
+            return Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+
+class ReportJobDownloadView(APIView):
+    """Téléchargement : redirection vers le fichier stocké, 202 tant que le rendu n'est pas terminé."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id)
+        if not _can_access_report(request.user, job):
+            return Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+        return report_response(request, job)
 # WhatsApp Views
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -786,7 +927,7 @@ def ticket_whatsapp_messages(request, ticket_id):
         if not has_permission:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        messages = Message.objects.filter(ticket=ticket, is_whatsapp=True).order_by('timestamp')
+        messages = Message.objects.filter(ticket=ticket, is_whatsapp=True).select_related('user').prefetch_related('attachments').order_by('timestamp')
         serializer = MessageSerializer(messages, many=True, context={'request': request})
         
         return Response(serializer.data)
@@ -926,7 +1067,7 @@ class CompleteInterventionView(APIView):
     
     def post(self, request, intervention_id):
         try:
-            intervention = Intervention.objects.get(id=intervention_id)
+            intervention = Intervention.objects.select_related('ticket').get(id=intervention_id)
             
             user = request.user
             if not (user.userType == 'admin' or 
@@ -939,15 +1080,14 @@ class CompleteInterventionView(APIView):
             intervention.status = 'completed'
             intervention.save()
             
-            pdf_url = generate_intervention_pdf(intervention)
-            
-            whatsapp_service = WhatsAppService()
-            # Cette méthode doit être définie dans votre WhatsAppService
-            # whatsapp_service.send_intervention_completed_notification(intervention, pdf_url)
+            # Rendu par le worker : on renvoie l'URL de téléchargement de la tâche
+            job = enqueue_intervention_report(intervention, request)
+            report = ReportJobSerializer(job, context={'request': request}).data
             
             return Response({
                 'status': 'intervention completed',
-                'pdf_url': pdf_url
+                'pdf_url': report['download_url'],
+                'report': report
             })
             
         except Intervention.DoesNotExist:
@@ -984,7 +1124,7 @@ def ticket_messages(request, ticket_id):
         if not has_permission:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        messages = Message.objects.filter(ticket=ticket).order_by('timestamp')
+        messages = Message.objects.filter(ticket=ticket).select_related('user').prefetch_related('attachments').order_by('timestamp')
         serializer = MessageSerializer(messages, many=True, context={'request': request})
         
         return Response(serializer.data)
@@ -1006,6 +1146,44 @@ def create_message(request):
         logger.error(f"Erreur dans create_message: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+class ChatAttachmentUploadView(APIView):
+    """
+    Téléversement d'une image du chat (multipart, champ `file`). Renvoie l'id à placer
+    dans le message WebSocket (`attachment_id`) : le fichier ne transite plus par le socket.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, ticket_id):
+        ticket = get_object_or_404(Ticket.objects.select_related('client__user', 'technician__user'), id=ticket_id)
+        if not check_ticket_permission(request.user, ticket):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (upload.content_type or '').startswith('image/'):
+            return Response({'error': 'Only images are accepted'}, status=status.HTTP_400_BAD_REQUEST)
+        max_size = getattr(settings, 'CHAT_ATTACHMENT_MAX_SIZE', 5 * 1024 * 1024)
+        if upload.size > max_size:
+            return Response(
+                {'error': f'File too large (max {max_size // (1024 * 1024)} MB)'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        # Le type annoncé vient du client : on vérifie que le contenu est bien une image
+        try:
+            PILImage.open(upload).verify()
+        except Exception:
+            return Response({'error': 'Invalid image file'}, status=status.HTTP_400_BAD_REQUEST)
+        upload.seek(0)
+
+        attachment = ChatAttachment.objects.create(
+            ticket=ticket, uploaded_by=request.user, image=upload, content_type=upload.content_type
+        )
+        return Response(ChatAttachmentSerializer(attachment).data, status=status.HTTP_201_CREATED)
+
 @csrf_exempt
 def whatsapp_webhook(request):
     if request.method != 'POST':